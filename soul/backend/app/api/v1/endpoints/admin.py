@@ -0,0 +1,73 @@
+import asyncio
+import secrets
+import threading
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.engine.faculty_digest import digest_measurements
+from app.models.schemas import DigestReportResponse, LoopStallResponse, LoopStatusResponse
+from app.services.config_store import config_store
+from app.services.loop_monitor import loop_monitor
+from app.services.profiler import ProfilerBusy, profiler
+
+
+def require_admin(x_admin_token: str | None = Header(None)) -> None:
+    # Closed unless a token is configured: these expose stacks and run the profiler
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not secrets.compare_digest(x_admin_token or "", settings.admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.get("/loop", response_model=LoopStatusResponse)
+async def loop_status():
+    """Worst event-loop lag seen and the most recent stalls with their stacks."""
+    return LoopStatusResponse(
+        enabled=settings.loop_monitor_enabled,
+        max_lag_ms=round(loop_monitor.max_lag_s * 1000, 1),
+        stalls=[
+            LoopStallResponse(
+                started_at=stall.started_at,
+                duration_ms=stall.duration_ms,
+                detected_after_ms=stall.detected_after_ms,
+                stack=stall.stack,
+            )
+            for stall in reversed(loop_monitor.stalls)
+        ],
+    )
+
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(5.0, gt=0),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    thread: str = Query("all", pattern="^(all|loop)$"),
+):
+    """Sample the live process and return collapsed stacks for a flame graph."""
+    if seconds > settings.profile_max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {settings.profile_max_seconds}")
+    thread_ids = {threading.get_ident()} if thread == "loop" else None
+    try:
+        result = await asyncio.to_thread(profiler.run, seconds, interval_ms / 1000, thread_ids)
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        result.collapsed(),
+        headers={"X-Profile-Samples": str(result.samples), "X-Profile-Seconds": str(result.seconds)},
+    )
+
+
+@router.get("/synthesis-digest", response_model=DigestReportResponse)
+async def synthesis_digest_report():
+    """Input-token savings and answer drift of the digest prompt, from measurement mode."""
+    config = config_store.current()
+    return DigestReportResponse(
+        prompt_format=config.synthesis_prompt_format,
+        measure_rate=config.synthesis_digest_measure_rate,
+        **digest_measurements.report(),
+    )
@@ -1,10 +1,43 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, HTTPException, Response
 from app.models.schemas import ChatRequest, ChatResponse
 from app.engine.soul_engine import soul_engine
+from app.services.admission import admission_controller
+from app.services.idempotency import IdempotencyConflict, fingerprint, idempotency_store
+from app.services.token_budget import budget_policy
+from app.services.turn_context import TurnContext
 
 router = APIRouter()
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    return await soul_engine.process(request.message)
+async def chat(
+    request: ChatRequest,
+    response: Response,
+    x_soul_priority: str | None = Header(None),
+    x_client_key: str = Header("anonymous"),
+    idempotency_key: str | None = Header(None, max_length=255),
+):
+    lane = "batch" if x_soul_priority == "batch" else "chat"
+
+    async def run_turn() -> ChatResponse:
+        degradation = budget_policy.check(x_client_key)
+        async with admission_controller.admit(lane) as ticket:
+            turn = TurnContext(
+                client_key=x_client_key,
+                lane=lane,
+                queue_ms=ticket.queue_ms,
+                degradation=degradation,
+            )
+            return await soul_engine.process(request.message, turn)
+
+    if not idempotency_key:
+        return await run_turn()
+    try:
+        result, replayed = await idempotency_store.run(
+            "chat", idempotency_key, x_client_key, fingerprint(request.message), run_turn,
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
@@ -3,16 +3,53 @@ Server-Sent Events streaming endpoint for Soul AI.
 Inspired by opensoulai's streaming architecture — streams module results
 progressively so the UI can render each faculty as it completes.
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, Header, HTTPException
 from fastapi.responses import StreamingResponse
+from app.config import settings
 from app.models.schemas import ChatRequest
 from app.engine.streaming_engine import streaming_soul_engine
+from app.services.admission import AdmissionRejected, admission_controller
+from app.services.idempotency import IdempotencyConflict, fingerprint, idempotency_store
+from app.services.metrics import admission_rejected
+from app.services.stream_replay import InvalidEventId, ReplayFull, parse_event_id, stream_replay
+from app.services.token_budget import budget_policy
+from app.services.turn_context import TurnContext
 
 router = APIRouter()
 
 
+def _sse_response(frames, stream_id: str, replayed: bool = False) -> StreamingResponse:
+    headers = {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+        "X-Soul-Stream-Id": stream_id,
+    }
+    if replayed:
+        headers["Idempotent-Replayed"] = "true"
+    return StreamingResponse(frames, media_type="text/event-stream", headers=headers)
+
+
+def _resume(last_event_id: str) -> StreamingResponse:
+    try:
+        stream_id, seq = parse_event_id(last_event_id)
+    except InvalidEventId as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    stream = stream_replay.get(stream_id)
+    if stream is None:
+        raise HTTPException(
+            status_code=410,
+            detail="Stream is no longer resumable; resend the message without Last-Event-ID",
+        )
+    return _sse_response(stream.follow(after=seq), stream_id)
+
+
 @router.post("/chat/stream")
-async def chat_stream(request: ChatRequest):
+async def chat_stream(
+    request: ChatRequest,
+    x_client_key: str = Header("anonymous"),
+    last_event_id: str | None = Header(None),
+    idempotency_key: str | None = Header(None, max_length=255),
+):
     """
     Stream soul responses as Server-Sent Events.
 
@@ -26,12 +63,45 @@ async def chat_stream(request: ChatRequest):
       needs_trainer — trainer consultation needed (learning mode)
       done        — stream complete
       error       — on processing error
+
+    Admission is decided before the stream opens, so an overloaded soul
+    answers 503 with Retry-After instead of a stalled event stream.
+
+    The turn runs independently of this response. Reconnecting with
+    `Last-Event-ID` resumes from the replay buffer after that event
+    instead of rerunning the pipeline. Repeating a request with the same
+    `Idempotency-Key` follows the original turn's stream from the start.
     """
-    return StreamingResponse(
-        streaming_soul_engine.stream(request.message),
-        media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",
-        },
-    )
+    if last_event_id:
+        return _resume(last_event_id)
+
+    async def start_turn():
+        degradation = budget_policy.check(x_client_key)
+        ticket = await admission_controller.acquire("stream")
+        turn = TurnContext(
+            client_key=x_client_key,
+            lane="stream",
+            queue_ms=ticket.queue_ms,
+            degradation=degradation,
+        )
+        try:
+            return stream_replay.start(streaming_soul_engine.stream(request.message, turn), on_done=ticket.release)
+        except ReplayFull as e:
+            # Shed rather than drop a running turn's buffer
+            ticket.release()
+            admission_rejected.inc(lane="stream", reason="replay buffers full")
+            raise AdmissionRejected("stream", "replay buffers full", retry_after=1) from e
+
+    if not idempotency_key:
+        stream = await start_turn()
+        return _sse_response(stream.follow(), stream.stream_id)
+    try:
+        # The entry pins the frame buffer, so it lasts no longer than replay keeps it
+        stream, replayed = await idempotency_store.run(
+            "stream", idempotency_key, x_client_key, fingerprint(request.message), start_turn,
+            ttl_s=min(settings.idempotency_ttl_s, settings.stream_replay_ttl_s),
+            done=lambda stream: stream.wait_done(),
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return _sse_response(stream.follow(), stream.stream_id, replayed)
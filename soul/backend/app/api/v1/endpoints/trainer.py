@@ -1,16 +1,39 @@
-from fastapi import APIRouter, HTTPException
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.models.database import get_tenant
 from app.models.schemas import (
     LearningResponse,
+    TrainerBatchRequest,
     TrainerGuidanceRequest,
+    TrainerInboxResponse,
     TrainerLearningCreate,
     TrainerLearningUpdate,
 )
-from app.services.learning_service import learning_service
+from app.services.learning_service import BatchRejected, learning_service
+from app.services.admission import admission_controller
+from app.services.metrics import Counter, registry
+from app.services.trainer_inbox import InboxDelta, trainer_inbox
 
-router = APIRouter(prefix="/trainer")
+batch_items = registry.register(Counter(
+    "soul_trainer_batch_items_total",
+    "Learnings changed through POST /trainer/respond, by action",
+    ("action",),
+))
 
 
-def _to_response(learning) -> LearningResponse:
+async def _trainer_lane():
+    """Trainer tools share turn capacity at the lowest priority."""
+    async with admission_controller.admit("trainer"):
+        yield
+
+
+router = APIRouter(prefix="/trainer", dependencies=[Depends(_trainer_lane)])
+# Inbox waits are long and mostly idle, so they hold no admission slot
+inbox_router = APIRouter(prefix="/trainer")
+
+
+def _to_response(learning, mention_count: int = 0) -> LearningResponse:
     return LearningResponse(
         id=learning.id,
         trigger_summary=learning.trigger_summary,
@@ -22,6 +45,7 @@ def _to_response(learning) -> LearningResponse:
         confidence_boost=learning.confidence_boost,
         times_applied=learning.times_applied,
         status=learning.status,
+        mention_count=mention_count,
     )
 
 
@@ -29,13 +53,70 @@ def _to_response(learning) -> LearningResponse:
 async def list_pending():
     """List all questions awaiting trainer guidance."""
     learnings = await learning_service.get_pending()
-    return [_to_response(l) for l in learnings]
+    counts = await learning_service.mention_counts([l.id for l in learnings])
+    return [_to_response(l, counts.get(l.id, 0)) for l in learnings]
+
+
+def _inbox_response(delta: InboxDelta) -> TrainerInboxResponse:
+    return TrainerInboxResponse(
+        cursor=delta.cursor,
+        reset=delta.reset,
+        items=[_to_response(l, delta.mention_counts.get(l.id, 0)) for l in delta.pending],
+        removed=delta.removed,
+    )
+
+
+def _sse_event(event: str, data: dict, event_id: str | None = None) -> bytes:
+    frame = b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+    return b"id: " + event_id.encode() + b"\n" + frame if event_id else frame
+
+
+@inbox_router.get("/inbox", response_model=TrainerInboxResponse)
+async def poll_inbox(cursor: str | None = None, wait: float = Query(0.0, ge=0.0)):
+    """Long-poll the pending inbox: changes after `cursor`, waiting up to `wait` seconds for one.
+
+    Without a usable cursor, returns every pending learning with `reset: true`.
+    """
+    return _inbox_response(await trainer_inbox.poll(get_tenant(), cursor, wait))
+
+
+@inbox_router.get("/inbox/stream")
+async def stream_inbox(last_event_id: str | None = Header(None)):
+    """
+    Push the pending inbox as Server-Sent Events.
+
+    Events emitted:
+      snapshot  — every pending learning (on connect, or when a resync is needed)
+      learning  — a new or changed pending learning
+      removed   — a learning that is no longer pending
+    """
+    tenant = get_tenant()
+
+    async def frames():
+        async for delta in trainer_inbox.follow(tenant, last_event_id):
+            if delta is None:
+                yield b": keepalive\n\n"
+                continue
+            body = _inbox_response(delta)
+            if delta.reset:
+                yield _sse_event("snapshot", {"items": [i.model_dump() for i in body.items]}, body.cursor)
+                continue
+            events = [("learning", i.model_dump()) for i in body.items]
+            events += [("removed", {"id": learning_id}) for learning_id in body.removed]
+            for n, (event, data) in enumerate(events, 1):
+                yield _sse_event(event, data, body.cursor if n == len(events) else None)
+
+    return StreamingResponse(
+        frames(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/learnings", response_model=list[LearningResponse])
-async def list_active_learnings():
-    """List all active learnings."""
-    learnings = await learning_service.get_all_active()
+async def list_active_learnings(module: str | None = Query(None, pattern="^(manas|buddhi|sanskaras)$")):
+    """List active learnings, optionally only those informing one faculty."""
+    learnings = await learning_service.get_all_active(module)
     return [_to_response(l) for l in learnings]
 
 
@@ -58,6 +139,22 @@ async def respond_to_pending(learning_id: int, data: TrainerGuidanceRequest):
     return _to_response(updated)
 
 
+@router.post("/respond", response_model=list[LearningResponse])
+async def respond_batch(data: TrainerBatchRequest):
+    """Activate, update or supersede many learnings in one transaction.
+
+    All or nothing: if any item fails, nothing is applied and the 400
+    response lists each failing id.
+    """
+    try:
+        learnings = await learning_service.apply_batch(data.items)
+    except BatchRejected as e:
+        raise HTTPException(status_code=400, detail=e.errors)
+    for item in data.items:
+        batch_items.inc(action=item.action)
+    return [_to_response(l) for l in learnings]
+
+
 @router.post("/learnings", response_model=LearningResponse, status_code=201)
 async def create_learning(data: TrainerLearningCreate):
     """Proactively teach the soul something."""
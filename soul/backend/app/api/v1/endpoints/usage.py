@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Query
+from app.config import settings
+from app.models.database import get_tenant
+from app.models.schemas import UsageEntryResponse, UsageResponse
+from app.services.usage_ledger import usage_ledger, utc_today
+
+router = APIRouter()
+
+
+@router.get("/usage", response_model=UsageResponse)
+async def get_usage(day: str | None = Query(None, pattern=r"^\d{4}-\d{2}-\d{2}$")):
+    """The tenant's token usage for a day (default today) by client key, model and stage."""
+    day = day or utc_today()
+    entries = await usage_ledger.entries(day)
+    return UsageResponse(
+        day=day,
+        spent_today=usage_ledger.spent_today(tenant=get_tenant()),
+        budget_daily=settings.token_budget_daily,
+        entries=[
+            UsageEntryResponse(
+                day=e.day,
+                client_key=e.client_key,
+                model=e.model,
+                stage=e.stage,
+                calls=e.calls,
+                input_tokens=e.input_tokens,
+                output_tokens=e.output_tokens,
+                cache_read_input_tokens=e.cache_read_input_tokens,
+                cache_creation_input_tokens=e.cache_creation_input_tokens,
+            )
+            for e in entries
+        ],
+    )
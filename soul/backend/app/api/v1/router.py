@@ -1,8 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
 
-from app.api.v1.endpoints import health, chat, habits, config, trainer, stream
+from app.api.v1.endpoints import health, chat, habits, config, trainer, stream, usage, admin
+from app.services.tenancy import tenant_scope
 
-api_router = APIRouter()
+# Every endpoint runs against the soul named by X-Soul-Tenant
+api_router = APIRouter(dependencies=[Depends(tenant_scope)])
 
 api_router.include_router(health.router, tags=["health"])
 api_router.include_router(chat.router, tags=["chat"])
@@ -10,3 +12,6 @@ api_router.include_router(stream.router, tags=["stream"])
 api_router.include_router(habits.router, tags=["habits"])
 api_router.include_router(config.router, tags=["config"])
 api_router.include_router(trainer.router, tags=["trainer"])
+api_router.include_router(trainer.inbox_router, tags=["trainer"])
+api_router.include_router(usage.router, tags=["usage"])
+api_router.include_router(admin.router, tags=["admin"])
@@ -4,6 +4,7 @@ from pydantic import Field
 
 class Settings(BaseSettings):
     anthropic_api_key: str = Field(default="", description="Anthropic API key")
+    anthropic_base_url: str = Field(default="", description="Override the Messages API URL (e.g. a local fake server)")
     claude_model: str = Field(default="claude-sonnet-4-5-20250929", description="Claude model to use")
     database_url: str = Field(default="sqlite+aiosqlite:///./soul.db", description="Database URL")
 
@@ -27,10 +28,154 @@ class Settings(BaseSettings):
     # Combined mode (single call replaces 3 faculty calls)
     combined_mode: bool = Field(default=False, description="Use single combined call for all faculties")
 
+    # Per-faculty mode: "llm" calls Claude, "deterministic" builds the output locally from retrieval
+    sanskaras_mode: str = Field(default="llm", description="Sanskaras faculty mode (llm or deterministic)")
+
+    # Adaptive faculty mode (picks combined vs parallel per turn from live load)
+    adaptive_mode_enabled: bool = Field(default=False, description="Let the mode controller override combined_mode")
+    adaptive_mode_enter_pressure: float = Field(default=0.75, description="Pressure at which to switch to combined mode")
+    adaptive_mode_exit_pressure: float = Field(default=0.5, description="Pressure at which to return to parallel mode")
+    adaptive_mode_min_dwell_s: float = Field(default=30.0, description="Minimum seconds between mode switches")
+    adaptive_mode_latency_window: int = Field(default=200, description="Recent faculty-phase latencies kept per mode")
+    adaptive_mode_min_samples: int = Field(default=20, description="Samples per mode before latency is used as a signal")
+    adaptive_mode_latency_max_age_s: float = Field(default=300.0, description="Age after which a faculty-phase latency sample no longer counts")
+
+    # Shared runtime config (PUT /config writes a new version every worker polls for)
+    config_poll_interval_s: float = Field(default=1.0, description="Seconds between runtime config version checks")
+
     # Learning mode
     learning_mode_enabled: bool = Field(default=False, description="Enable trainer learning mode")
     confidence_threshold: float = Field(default=0.4, description="Below this, soul asks for trainer help")
 
+    # Admission control (lanes listed highest priority first)
+    admission_max_in_flight: int = Field(default=32, description="Max soul turns processed concurrently")
+    admission_queue_limits: dict[str, int] = Field(
+        default={"stream": 64, "chat": 64, "batch": 16, "trainer": 16},
+        description="Max queued requests per priority lane",
+    )
+    admission_queue_slo_ms: dict[str, int] = Field(
+        default={"stream": 2000, "chat": 3000, "batch": 15000, "trainer": 5000},
+        description="Max queue wait per lane before a request is shed with 503",
+    )
+
+    # Resumable SSE streams
+    stream_replay_ttl_s: float = Field(default=60.0, description="Seconds a finished stream stays resumable")
+    stream_replay_max_streams: int = Field(default=1000, description="Most stream replay buffers kept at once")
+
+    # Idempotency-Key handling for /chat and /chat/stream
+    idempotency_ttl_s: float = Field(default=3600.0, description="Seconds a finished turn is replayed for a repeated key")
+    idempotency_max_entries: int = Field(default=1000, description="Most idempotency keys remembered at once")
+
+    # Tracing (OTLP/JSON lines written to a local file)
+    tracing_enabled: bool = Field(default=False, description="Record spans for soul turns")
+    trace_sample_rate: float = Field(default=0.1, description="Fraction of turns whose traces are exported")
+    trace_slow_turn_ms: int = Field(default=5000, description="Always export turns slower than this (0 disables)")
+    trace_export_path: str = Field(default="./traces.jsonl", description="File that receives exported traces")
+    trace_export_queue_size: int = Field(default=1000, ge=1, description="Most traces waiting to be written; further traces are dropped")
+
+    # Token usage ledger and daily budgets (0 = unlimited)
+    usage_flush_interval_s: float = Field(default=10.0, description="Seconds between usage ledger flushes")
+    token_budget_daily: int = Field(default=0, description="Daily input+output token budget across all clients")
+    token_budget_daily_per_client: int = Field(default=0, description="Daily input+output token budget per client key")
+    token_budget_daily_per_tenant: int = Field(default=0, description="Daily input+output token budget per tenant")
+    budget_degradation_thresholds: dict[str, float] = Field(
+        default={"combined_mode": 0.6, "faculty_synthesis": 0.75, "reduced_tokens": 0.9, "refused": 1.0},
+        description="Budget fraction at which each degradation step starts",
+    )
+    budget_reduced_max_tokens_factor: float = Field(default=0.5, description="max_tokens multiplier once reduced_tokens applies")
+
+    # Fold near-identical uncertain messages into one pending learning (0 disables)
+    trainer_dedup_threshold: float = Field(default=0.6, description="Shingle similarity at which a message joins a pending learning")
+    trainer_dedup_candidates: int = Field(default=200, description="Newest pending learnings compared against an uncertain message")
+
+    # Background trainer question generation
+    trainer_queue_size: int = Field(default=200, description="Most trainer question jobs waiting at once")
+    trainer_queue_workers: int = Field(default=2, description="Concurrent trainer question workers")
+    trainer_queue_max_attempts: int = Field(default=3, ge=1, description="Attempts per trainer question before keeping the provisional one")
+    trainer_queue_retry_backoff_s: float = Field(default=1.0, description="Backoff before the first retry, doubled after each")
+    trainer_queue_drain_s: float = Field(default=10.0, description="Seconds shutdown waits for queued trainer questions")
+
+    # Push delivery of the trainer inbox (SSE and long-poll)
+    trainer_inbox_log_size: int = Field(default=1000, description="Recent inbox changes kept per tenant for cursors to resume from")
+    trainer_inbox_max_wait_s: float = Field(default=30.0, description="Longest a long-poll waits for an inbox change")
+    trainer_inbox_keepalive_s: float = Field(default=15.0, description="Seconds between keepalive comments on an idle inbox stream")
+
+    # Engine-level cache of faculty outputs and synthesized responses
+    response_cache_enabled: bool = Field(default=False, description="Reuse faculty and synthesis results for repeated questions")
+    response_cache_ttl_s: float = Field(default=900.0, description="Seconds a cached result stays reusable")
+    response_cache_faculty_entries: int = Field(default=5000, description="Most cached faculty outputs")
+    response_cache_entries: int = Field(default=2000, description="Most cached synthesized responses")
+
+    # Retrieved context (habits, learnings) added to each faculty prompt, in estimated tokens
+    context_token_budget: dict[str, int] = Field(
+        default={"manas": 300, "buddhi": 300, "sanskaras": 500, "default": 400},
+        description="Token budget for retrieved context per faculty",
+    )
+    context_item_max_tokens: int = Field(default=120, description="Cap on a single habit or learning line")
+
+    # Synthesis prompt format ("full" Markdown or compact "digest") and its measurement
+    synthesis_prompt_format: str = Field(default="full", description="Synthesis prompt format: full or digest")
+    synthesis_digest_tokens: dict[str, int] = Field(
+        default={"manas": 60, "buddhi": 80, "sanskaras": 50, "default": 60},
+        description="Token cap per faculty line in the synthesis digest",
+    )
+    synthesis_digest_reasoning_steps: int = Field(default=3, description="Buddhi reasoning steps kept in the digest")
+    synthesis_digest_dedup_threshold: float = Field(default=0.6, description="Similarity at which a repeated point is dropped")
+    synthesis_digest_measure_rate: float = Field(default=0.0, description="Fraction of syntheses also run in the other format to measure savings and drift")
+
+    # Record/replay cassette for Claude calls ("" = live, "record", "replay")
+    cassette_mode: str = Field(default="", description="Record Claude calls to, or replay them from, a cassette")
+    cassette_path: str = Field(default="./cassette.jsonl", description="Cassette file (JSON lines)")
+    cassette_replay_latency: bool = Field(default=False, description="Sleep for each call's recorded latency on replay")
+
+    # Cross-worker invalidation of cached habits and learnings
+    invalidation_poll_interval_s: float = Field(default=0.5, description="Seconds between invalidation log polls")
+    invalidation_retention_s: float = Field(default=600.0, description="Seconds invalidation events are kept")
+
+    # Claude call resilience: retries, per-model circuit breakers, model fallback
+    claude_max_retries: int = Field(default=3, description="Retries per Claude call on transient errors")
+    claude_retry_base_delay_s: float = Field(default=0.5, description="Backoff cap for the first retry (doubles per retry, full jitter)")
+    claude_retry_max_delay_s: float = Field(default=8.0, description="Longest wait before a retry")
+    claude_retry_budget_ratio: float = Field(default=0.2, description="Retries allowed per call, averaged across all calls")
+    claude_retry_budget_min: int = Field(default=10, description="Retries always available in the budget (and its cap)")
+    breaker_window_s: float = Field(default=30.0, description="Seconds of call outcomes a circuit breaker looks at")
+    breaker_min_requests: int = Field(default=10, description="Calls in the window before a breaker may open")
+    breaker_error_rate: float = Field(default=0.5, description="Error rate over the window that opens a breaker")
+    breaker_open_s: float = Field(default=15.0, description="Seconds a breaker stays open before probing")
+    breaker_half_open_probes: int = Field(default=1, description="Successful probe calls needed to close a breaker")
+    model_fallbacks: dict[str, list[str]] = Field(
+        default={"synthesis_model": ["faculty_model"], "claude_model": ["faculty_model"]},
+        description="Models (config roles or ids) to try, in order, when a model's breaker is open or it keeps failing",
+    )
+
+    # Web UI static files
+    static_compress_min_bytes: int = Field(default=1024, description="Smallest web UI file given gzip/brotli variants")
+    static_memory_file_max_bytes: int = Field(default=65536, description="Largest web UI file (or variant) held in memory")
+    static_memory_max_bytes: int = Field(default=16 * 1024 * 1024, description="Memory cap for held web UI files")
+
+    # Learning archival and SQLite compaction
+    maintenance_interval_s: float = Field(default=3600.0, description="Seconds between maintenance runs (0 disables)")
+    learning_archive_superseded_after_s: float = Field(default=86400.0, description="Age at which superseded learnings are archived")
+    learning_pending_expiry_s: float = Field(default=30 * 86400.0, description="Age at which unanswered pending learnings are archived")
+    learning_archive_batch_size: int = Field(default=500, description="Learnings archived per transaction")
+    db_analyze_interval_s: float = Field(default=6 * 3600.0, description="Seconds between ANALYZE runs per database")
+    db_vacuum_interval_s: float = Field(default=7 * 86400.0, description="Seconds between VACUUM runs per database")
+    db_vacuum_min_free_ratio: float = Field(default=0.2, description="Free-page fraction below which VACUUM is skipped")
+
+    # Event-loop monitoring and the admin profiler
+    loop_monitor_enabled: bool = Field(default=True, description="Run the event-loop lag probe and stall watchdog")
+    loop_lag_interval_s: float = Field(default=0.1, description="Seconds between event-loop lag probes")
+    loop_stall_threshold_ms: float = Field(default=100.0, description="Blocking time after which the loop's stack is captured")
+    loop_stall_history: int = Field(default=20, description="Captured stalls kept for GET /admin/loop")
+    profile_max_seconds: float = Field(default=60.0, description="Longest sampling profile GET /admin/profile may run")
+    admin_token: str = Field(default="", description="Enables /admin endpoints, which then require it in X-Admin-Token")
+
+    # Multi-tenant souls (selected per request by the X-Soul-Tenant header)
+    tenant_database_dir: str = Field(default="./tenants", description="Directory holding one SQLite file per non-default tenant")
+    tenant_max_open_databases: int = Field(default=256, description="Tenant database engines kept open (LRU)")
+    tenant_cache_max_bytes: int = Field(default=256 * 1024 * 1024, description="Memory cap for tenants' cached habits and learnings")
+    tenant_max_in_flight: int = Field(default=0, description="Turns one tenant may have admitted or queued (0 = unlimited)")
+
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8"}
 
 
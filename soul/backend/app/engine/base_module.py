@@ -1,15 +1,20 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
 
+from app.engine.context_packer import ContextItem, ContextSection, PackedContext, pack_context
+from app.engine.response_cache import cache_key, dependencies, response_cache
+from app.models.learning_model import Learning
 from app.services.claude_client import claude_client, TokenUsageData
 from app.services.learning_service import learning_service
-from app.config import settings
+from app.services.tracing import tracer
+from app.services.turn_context import get_turn
 
 
 class BaseModule(ABC):
     def __init__(self, prompt_file: str):
         prompt_path = Path(__file__).parent / "prompts" / prompt_file
         self.system_prompt = prompt_path.read_text()
+        self.prompt_digest = cache_key(self.system_prompt)
 
     @abstractmethod
     async def process(self, user_message: str, **kwargs) -> dict:
@@ -17,11 +22,25 @@ class BaseModule(ABC):
 
     async def call_claude_json(self, user_message: str) -> tuple[dict, TokenUsageData]:
         """Return (parsed_json, token_usage) using faculty model and token limits."""
+        config = get_turn().config
         return await claude_client.complete_json(
             system_prompt=self.system_prompt,
             user_message=user_message,
-            model=settings.faculty_model,
-            max_tokens=settings.faculty_max_tokens,
+            model=config.faculty_model,
+            max_tokens=config.faculty_max_tokens,
+        )
+
+    async def call_faculty_json(
+        self, faculty: str, message: str, packed: PackedContext
+    ) -> tuple[dict, TokenUsageData]:
+        """call_claude_json on the message plus its packed context, through the faculty cache."""
+        config = get_turn().config
+        key = response_cache.faculty_key(
+            faculty, message, packed.text, self.prompt_digest, config.faculty_max_tokens
+        )
+        return await response_cache.faculty_json(
+            faculty, key, dependencies(packed.included),
+            lambda: self.call_claude_json(message + packed.text),
         )
 
     async def call_claude(self, user_message: str, model: str | None = None, max_tokens: int | None = None):
@@ -33,15 +52,34 @@ class BaseModule(ABC):
             max_tokens=max_tokens,
         )
 
-    async def build_learnings_context(self, message: str, module_name: str) -> str:
-        """Retrieve relevant active learnings and format as prompt context."""
+    async def learnings_section(self, message: str, module_name: str) -> ContextSection:
+        """Relevant active learnings for this faculty, best first."""
         learnings = await learning_service.find_relevant_learnings(message, modules=module_name)
-        if not learnings:
-            return ""
+        return ContextSection(
+            name="learnings",
+            heading="Guidance from trainer (apply these learnings):",
+            items=[
+                ContextItem(
+                    text=f"- [{l.trigger_summary}]: {l.application_note}",
+                    brief=f"- [{l.trigger_summary}]",
+                    ref=l,
+                )
+                for l in learnings
+            ],
+            noun="learnings",
+        )
 
-        lines = []
-        for l in learnings:
-            lines.append(f"- [{l.trigger_summary}]: {l.application_note}")
-            await learning_service.increment_applied(l.id)
+    async def pack_context(self, module_name: str, *sections: ContextSection) -> PackedContext:
+        """Pack sections into the faculty's token budget and count applied learnings."""
+        with tracer.span("context.pack", faculty=module_name) as span:
+            packed = pack_context(module_name, *sections)
+            span.set(**{f"context.{name}.tokens": r.tokens for name, r in packed.sections.items()})
+        for ref in packed.included:
+            if isinstance(ref, Learning):
+                await learning_service.increment_applied(ref.id)
+        return packed
 
-        return "\n\nGuidance from trainer (apply these learnings):\n" + "\n".join(lines)
+    async def build_learnings_context(self, message: str, module_name: str) -> str:
+        """Retrieve relevant active learnings and format them as budgeted prompt context."""
+        section = await self.learnings_section(message, module_name)
+        return (await self.pack_context(module_name, section)).text
@@ -1,6 +1,7 @@
 from app.engine.base_module import BaseModule
 from app.models.schemas import BuddhiOutput
 from app.services.claude_client import TokenUsageData
+from app.services.metrics import faculty_errors
 
 
 class BuddhiModule(BaseModule):
@@ -9,15 +10,16 @@ class BuddhiModule(BaseModule):
 
     async def process(self, user_message: str, **kwargs) -> tuple[BuddhiOutput, TokenUsageData]:
         try:
-            learnings_ctx = await self.build_learnings_context(user_message, "buddhi")
-            augmented = user_message + learnings_ctx
-            data, usage = await self.call_claude_json(augmented)
+            section = await self.learnings_section(user_message, "buddhi")
+            packed = await self.pack_context("buddhi", section)
+            data, usage = await self.call_faculty_json("buddhi", user_message, packed)
             return BuddhiOutput(
                 response=data.get("response", ""),
                 confidence=max(0.0, min(1.0, data.get("confidence", 0.5))),
                 reasoning_chain=data.get("reasoning_chain", []),
             ), usage
         except Exception as e:
+            faculty_errors.inc(faculty="buddhi")
             return BuddhiOutput(
                 response=f"Buddhi encountered confusion: {e}",
                 confidence=0.1,
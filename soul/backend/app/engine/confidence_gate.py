@@ -0,0 +1,140 @@
+"""
+Early decisions on the confidence gate.
+
+In learning mode a turn whose weighted faculty confidence falls below
+`confidence_threshold` goes to the trainer instead of synthesis. Every
+faculty's confidence lies in [0, 1], so once some faculties have reported,
+the weighted score is bounded: the known part, plus between nothing and
+the full weight of each faculty still running. The gate re-evaluates those
+bounds as each faculty finishes:
+
+  - upper bound below the threshold: the turn goes to the trainer whatever
+    the others say, so the faculties still running are cancelled. Their
+    outputs come back as placeholders with `metadata.cancelled` set.
+  - lower bound at or above the threshold: synthesis is certain. Synthesis
+    reads every faculty's output, so nothing is cancelled, but the decision
+    and how many faculties it took are still recorded.
+
+Decisions are counted in `soul_confidence_gate_decisions_total` by outcome
+and by the number of faculties that had reported when it was made.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable
+
+from app.models.schemas import BuddhiOutput, ManaOutput, ModuleOutput, SanskaraOutput
+from app.services.metrics import Counter, registry, timed
+from app.services.turn_context import get_turn
+
+FACULTIES = ("manas", "buddhi", "sanskaras")
+_OUTPUT_TYPES = {"manas": ManaOutput, "buddhi": BuddhiOutput, "sanskaras": SanskaraOutput}
+
+gate_decisions = registry.register(Counter(
+    "soul_confidence_gate_decisions_total",
+    "Learning-mode confidence gate decisions, by outcome and faculties reported when decided",
+    ("decision", "faculties"),
+))
+faculties_cancelled = registry.register(Counter(
+    "soul_faculties_cancelled_total",
+    "Faculty calls cancelled because the confidence gate had already decided",
+    ("faculty",),
+))
+
+
+class FacultyFailed(Exception):
+    def __init__(self, faculty: str, error: Exception):
+        super().__init__(str(error))
+        self.faculty = faculty
+
+
+def cancelled_output(faculty: str) -> ModuleOutput:
+    """Placeholder for a faculty whose call was cancelled by the gate."""
+    return _OUTPUT_TYPES[faculty](response="", confidence=0.0, metadata={"cancelled": True})
+
+
+@dataclass
+class ConfidenceGate:
+    weights: dict[str, float]
+    threshold: float
+    learning_mode: bool
+    confidences: dict[str, float] = field(default_factory=dict)
+    decided_after: int | None = None  # faculties reported when the decision became certain
+    cancelled: list[str] = field(default_factory=list)
+
+    @classmethod
+    def for_turn(cls) -> "ConfidenceGate":
+        config = get_turn().config
+        return cls(
+            weights={
+                "manas": config.weight_manas,
+                "buddhi": config.weight_buddhi,
+                "sanskaras": config.weight_sanskaras,
+            },
+            threshold=config.confidence_threshold,
+            learning_mode=config.learning_mode_enabled,
+        )
+
+    @property
+    def bounds(self) -> tuple[float, float]:
+        """Lowest and highest weighted confidence still possible."""
+        low = high = sum(self.weights[name] * c for name, c in self.confidences.items())
+        for name, weight in self.weights.items():
+            if name not in self.confidences:
+                low += min(0.0, weight)
+                high += max(0.0, weight)
+        return low, high
+
+    @property
+    def weighted(self) -> float:
+        """Weighted confidence of the faculties that reported (cancelled ones count as zero)."""
+        return sum(self.weights[name] * c for name, c in self.confidences.items())
+
+    @property
+    def decision(self) -> str | None:
+        """The certain outcome ("trainer" or "synthesis"), or None while it is still open."""
+        if not self.learning_mode:
+            return "synthesis"
+        low, high = self.bounds
+        if high < self.threshold:
+            return "trainer"
+        if low >= self.threshold:
+            return "synthesis"
+        return None
+
+    def record(self, faculty: str, confidence: float) -> str | None:
+        self.confidences[faculty] = confidence
+        decision = self.decision
+        if decision is not None and self.decided_after is None and self.learning_mode:
+            self.decided_after = len(self.confidences)
+            gate_decisions.inc(decision=decision, faculties=str(self.decided_after))
+        return decision
+
+    async def run(self, calls: dict[str, Awaitable[tuple[Any, Any]]]) -> AsyncIterator[tuple[str, Any, Any]]:
+        """Yield (faculty, output, usage) as faculties finish.
+
+        Once the gate has decided on the trainer, the faculties still running
+        are cancelled and listed in `cancelled`.
+        """
+        tasks = {asyncio.create_task(timed(name, call)): name for name, call in calls.items()}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = tasks[task]
+                    try:
+                        output, usage = task.result()
+                    except Exception as e:
+                        raise FacultyFailed(name, e) from e
+                    self.record(name, output.confidence)
+                    yield name, output, usage
+                if pending and self.decision == "trainer":
+                    self.cancelled = sorted((tasks[task] for task in pending), key=FACULTIES.index)
+                    for name in self.cancelled:
+                        faculties_cancelled.inc(faculty=name)
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
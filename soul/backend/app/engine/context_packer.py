@@ -0,0 +1,156 @@
+"""
+Token-budgeted packing of retrieved context into faculty prompts.
+
+Retrieval returns up to five habits and five learnings per faculty, but a
+trainer's `application_note` can be any length. The packer keeps each
+faculty's added context inside `context_token_budget[faculty]`:
+
+  - every item is first capped at `context_item_max_tokens`
+  - items from all sections are taken greedily by score (reciprocal rank
+    within their section, so the best habit and the best learning compete
+    on equal terms)
+  - an item that no longer fits falls back to its brief form (a learning's
+    trigger summary, a habit's name), then to a truncated prefix, and is
+    dropped if even that would be too small to be useful
+  - a section that lost items ends with a one-line count of what was left out
+
+Token counts come from a local estimator (roughly one token per four
+characters of each word or punctuation mark), which tracks the Claude
+tokenizer closely enough to bound cost without a network round trip. Tokens
+spent and items dropped are counted per faculty and section.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+from app.config import settings
+from app.services.metrics import Counter, registry
+
+_PIECES = re.compile(r"\w+|[^\w\s]")
+ELLIPSIS = "…"
+
+context_tokens = registry.register(Counter(
+    "soul_context_tokens_total",
+    "Estimated prompt tokens spent on retrieved context, by faculty and section",
+    ("faculty", "section"),
+))
+context_items = registry.register(Counter(
+    "soul_context_items_total",
+    "Retrieved context items by how they were packed (full, brief, truncated, dropped)",
+    ("faculty", "section", "outcome"),
+))
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate Claude token count: about four characters per token, per word."""
+    return sum(-(-len(piece) // 4) for piece in _PIECES.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of `text` within `max_tokens` (ellipsis included), cut at a word."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    spent, end = estimate_tokens(ELLIPSIS), 0
+    for match in _PIECES.finditer(text):
+        spent += -(-len(match.group()) // 4)
+        if spent > max_tokens:
+            break
+        end = match.end()
+    return text[:end].rstrip() + ELLIPSIS if end else ""
+
+
+@dataclass
+class ContextItem:
+    text: str
+    brief: str = ""       # shorter fallback used when the full text no longer fits
+    ref: Any = None       # the habit or learning this line came from
+
+
+@dataclass
+class ContextSection:
+    name: str             # metrics label: "habits", "learnings"
+    heading: str
+    items: list[ContextItem]
+    noun: str = "items"
+
+
+@dataclass
+class SectionReport:
+    tokens: int = 0
+    full: int = 0
+    brief: int = 0
+    truncated: int = 0
+    dropped: int = 0
+
+
+@dataclass
+class PackedContext:
+    text: str = ""
+    included: list[Any] = field(default_factory=list)   # refs of items that made it in
+    sections: dict[str, SectionReport] = field(default_factory=dict)
+
+    @property
+    def tokens(self) -> int:
+        return sum(s.tokens for s in self.sections.values())
+
+
+def pack_context(faculty: str, *sections: ContextSection, budget: int | None = None) -> PackedContext:
+    """Fit `sections` into the faculty's token budget; see module docstring."""
+    if budget is None:
+        budget = settings.context_token_budget.get(faculty, settings.context_token_budget.get("default", 400))
+    item_cap = settings.context_item_max_tokens
+    min_useful = max(8, item_cap // 8)
+
+    candidates = sorted(
+        ((1 / (rank + 1), index, rank, item) for index, section in enumerate(sections)
+         for rank, item in enumerate(section.items)),
+        key=lambda c: (-c[0], c[1], c[2]),
+    )
+
+    remaining = budget
+    chosen: dict[int, list[tuple[int, str, ContextItem]]] = {}
+    reports = {section.name: SectionReport() for section in sections}
+    for _, index, rank, item in candidates:
+        section, report = sections[index], reports[sections[index].name]
+        # The section heading is paid for by its first item
+        overhead = 0 if index in chosen else estimate_tokens(section.heading)
+        room = remaining - overhead
+        text = truncate_tokens(item.text, item_cap)
+        outcome = "truncated" if text != item.text else "full"
+        cost = estimate_tokens(text)
+        if cost > room and item.brief and estimate_tokens(item.brief) <= room:
+            text, outcome, cost = item.brief, "brief", estimate_tokens(item.brief)
+        elif cost > room:
+            text = truncate_tokens(item.text, room) if room >= min_useful else ""
+            outcome, cost = ("truncated", estimate_tokens(text)) if text else ("dropped", 0)
+        setattr(report, outcome, getattr(report, outcome) + 1)
+        if outcome == "dropped":
+            continue
+        chosen.setdefault(index, []).append((rank, text, item))
+        report.tokens += overhead + cost
+        remaining -= overhead + cost
+
+    packed = PackedContext(sections=reports)
+    blocks = []
+    for index, section in enumerate(sections):
+        lines = sorted(chosen.get(index, []), key=lambda c: c[0])
+        if not lines:
+            continue
+        body = [text for _, text, _ in lines]
+        packed.included.extend(item.ref for _, _, item in lines)
+        report = reports[section.name]
+        if report.dropped:
+            note = f"- (+{report.dropped} more {section.noun} omitted)"
+            if estimate_tokens(note) <= remaining:
+                body.append(note)
+                report.tokens += estimate_tokens(note)
+                remaining -= estimate_tokens(note)
+        blocks.append(section.heading + "\n" + "\n".join(body))
+
+    for name, report in reports.items():
+        context_tokens.inc(report.tokens, faculty=faculty, section=name)
+        for outcome in ("full", "brief", "truncated", "dropped"):
+            if getattr(report, outcome):
+                context_items.inc(getattr(report, outcome), faculty=faculty, section=name, outcome=outcome)
+    packed.text = "".join("\n\n" + block for block in blocks)
+    return packed
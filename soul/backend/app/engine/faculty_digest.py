@@ -0,0 +1,189 @@
+"""
+Compact faculty digest for the synthesis prompt.
+
+Synthesis runs on the most expensive model in the pipeline, and the full
+prompt pastes all three faculty responses, Buddhi's reasoning chain and the
+activated habits into verbose Markdown. With `synthesis_prompt_format` set
+to `digest`, the synthesizer gets a terse, structured digest instead:
+
+  - one line per faculty, tagged with weight, confidence and valence in
+    short form (`[Manas w.35 c.80 v+.40]`).
+  - the faculty's response split into sentences. A sentence that repeats
+    one already kept from a heavier faculty (shingle similarity at or above
+    `synthesis_digest_dedup_threshold`) is dropped.
+  - Buddhi's reasoning cut to its first `synthesis_digest_reasoning_steps`
+    steps, and Sanskaras' habits reduced to their names.
+  - each faculty's line capped at `synthesis_digest_tokens[faculty]`
+    estimated tokens. Sentences are added in order while they fit, then a
+    truncated prefix of the next one.
+
+Measurement mode (`synthesis_digest_measure_rate` > 0) samples that
+fraction of synthesis calls. For each sample it also sends the other
+format in the background, and records both calls' input tokens and the
+lexical drift between the two answers (1 - shingle similarity). The
+shadow call costs a second synthesis and is attributed to the
+`synthesis_shadow` stage. Results are counted in
+`soul_synthesis_input_tokens_total{format}` and
+`soul_synthesis_digest_drift`, and summarized at `GET /admin/synthesis-digest`.
+"""
+import re
+from collections import deque
+from dataclasses import dataclass
+
+from app.config import settings
+from app.engine.context_packer import estimate_tokens, truncate_tokens
+from app.models.schemas import BuddhiOutput, ManaOutput, SanskaraOutput
+from app.services.learning_service import similarity
+from app.services.metrics import Counter, Histogram, registry
+
+FORMATS = ("full", "digest")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+DRIFT_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+synthesis_input_tokens = registry.register(Counter(
+    "soul_synthesis_input_tokens_total",
+    "Input tokens of measured synthesis calls, by prompt format (full, digest)",
+    ("format",),
+))
+digest_drift = registry.register(Histogram(
+    "soul_synthesis_digest_drift",
+    "Lexical drift between full-prompt and digest answers on measured turns (0 same, 1 disjoint)",
+    buckets=DRIFT_BUCKETS,
+))
+
+
+def _num(value: float) -> str:
+    """0.35 -> ".35", 1.0 -> "1.00"."""
+    text = f"{value:.2f}"
+    return text[1:] if text.startswith("0.") else text
+
+
+def _signed(value: float) -> str:
+    """0.4 -> "+.40", -0.25 -> "-.25"."""
+    text = f"{value:+.2f}"
+    return text[0] + text[2:] if text[1:].startswith("0.") else text
+
+
+def full_prompt(
+    user_message: str, manas: ManaOutput, buddhi: BuddhiOutput, sanskaras: SanskaraOutput, weights: dict[str, float],
+) -> str:
+    """The verbose Markdown synthesis prompt."""
+    return f"""The user said: "{user_message}"
+
+Here are the three faculty responses:
+
+**Manas (Mind)** [weight: {weights['manas']:.0%}, confidence: {manas.confidence:.2f}, valence: {manas.valence:+.2f}]:
+{manas.response}
+
+**Buddhi (Intellect)** [weight: {weights['buddhi']:.0%}, confidence: {buddhi.confidence:.2f}]:
+{buddhi.response}
+Reasoning: {' → '.join(buddhi.reasoning_chain) if buddhi.reasoning_chain else 'N/A'}
+
+**Sanskaras (Habits)** [weight: {weights['sanskaras']:.0%}, confidence: {sanskaras.confidence:.2f}]:
+{sanskaras.response}
+Activated habits: {', '.join(h.get('name', '') for h in sanskaras.activated_habits) if sanskaras.activated_habits else 'None'}
+
+Synthesize these into a unified, wise response. Honor all three voices proportional to their weights."""
+
+
+def _points(text: str, cap: int, kept: list[str]) -> str:
+    """Sentences of `text` not already in `kept`, within `cap` tokens; adds them to `kept`."""
+    threshold = settings.synthesis_digest_dedup_threshold
+    chosen, spent = [], 0
+    for sentence in _SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if threshold > 0 and any(similarity(sentence, other) >= threshold for other in kept):
+            continue
+        cost = estimate_tokens(sentence)
+        if spent + cost > cap:
+            rest = truncate_tokens(sentence, cap - spent) if cap - spent >= 8 else ""
+            if rest:
+                chosen.append(rest)
+                kept.append(sentence)
+            break
+        chosen.append(sentence)
+        kept.append(sentence)
+        spent += cost + 1
+    return " ".join(chosen)
+
+
+def digest_prompt(
+    user_message: str, manas: ManaOutput, buddhi: BuddhiOutput, sanskaras: SanskaraOutput, weights: dict[str, float],
+) -> str:
+    """The compact digest synthesis prompt (see module docstring)."""
+    caps = settings.synthesis_digest_tokens
+    outputs = {"manas": manas, "buddhi": buddhi, "sanskaras": sanskaras}
+    extras = {"manas": "", "buddhi": "", "sanskaras": ""}
+    steps = buddhi.reasoning_chain[:settings.synthesis_digest_reasoning_steps]
+    if steps:
+        extras["buddhi"] = "\n  why: " + " > ".join(truncate_tokens(step, 12) for step in steps)
+    habits = [h.get("name", "") for h in sanskaras.activated_habits if h.get("name")]
+    if habits:
+        extras["sanskaras"] = "\n  habits: " + ", ".join(habits[:5])
+
+    # Heavier faculties keep a shared point; lighter ones drop their copy
+    kept: list[str] = []
+    points = {}
+    for name in sorted(outputs, key=lambda n: -weights[n]):
+        cap = caps.get(name, caps.get("default", 60))
+        points[name] = _points(outputs[name].response, max(8, cap - estimate_tokens(extras[name])), kept)
+
+    tags = {
+        "manas": f"[Manas w{_num(weights['manas'])} c{_num(manas.confidence)} v{_signed(manas.valence)}]",
+        "buddhi": f"[Buddhi w{_num(weights['buddhi'])} c{_num(buddhi.confidence)}]",
+        "sanskaras": f"[Sanskaras w{_num(weights['sanskaras'])} c{_num(sanskaras.confidence)}]",
+    }
+    lines = [f"{tags[name]} {points[name] or '(repeats the above)'}{extras[name]}" for name in outputs]
+    return (
+        f'User: "{user_message}"\n'
+        "Faculty digest (w=weight, c=confidence, v=valence; points already made by a heavier faculty omitted):\n"
+        + "\n".join(lines)
+        + "\nSynthesize one unified, wise response, weighing each voice by w."
+    )
+
+
+PROMPTS = {"full": full_prompt, "digest": digest_prompt}
+
+
+@dataclass
+class Measurement:
+    served: str                # format whose answer the user got
+    input_tokens: dict[str, int]
+    drift: float
+
+
+class DigestMeasurements:
+    """Running totals of measured synthesis calls, for the admin report."""
+
+    def __init__(self):
+        self.count = 0
+        self.input_tokens = {name: 0 for name in FORMATS}
+        self.drift_total = 0.0
+        self.recent: deque[Measurement] = deque(maxlen=50)
+
+    def record(self, served: str, answers: dict[str, str], input_tokens: dict[str, int]) -> Measurement:
+        drift = round(1 - similarity(answers["full"], answers["digest"]), 3)
+        measurement = Measurement(served=served, input_tokens=input_tokens, drift=drift)
+        self.count += 1
+        self.drift_total += drift
+        for name, tokens in input_tokens.items():
+            self.input_tokens[name] += tokens
+            synthesis_input_tokens.inc(tokens, format=name)
+        digest_drift.observe(drift)
+        self.recent.append(measurement)
+        return measurement
+
+    def report(self) -> dict:
+        full = self.input_tokens["full"]
+        return {
+            "measured": self.count,
+            "input_tokens": dict(self.input_tokens),
+            "input_token_savings": round(1 - self.input_tokens["digest"] / full, 3) if full else None,
+            "mean_drift": round(self.drift_total / self.count, 3) if self.count else None,
+            "recent": [vars(m) for m in reversed(self.recent)],
+        }
+
+
+digest_measurements = DigestMeasurements()
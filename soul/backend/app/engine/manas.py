@@ -1,6 +1,7 @@
 from app.engine.base_module import BaseModule
 from app.models.schemas import ManaOutput
 from app.services.claude_client import TokenUsageData
+from app.services.metrics import faculty_errors
 
 
 class ManasModule(BaseModule):
@@ -9,15 +10,16 @@ class ManasModule(BaseModule):
 
     async def process(self, user_message: str, **kwargs) -> tuple[ManaOutput, TokenUsageData]:
         try:
-            learnings_ctx = await self.build_learnings_context(user_message, "manas")
-            augmented = user_message + learnings_ctx
-            data, usage = await self.call_claude_json(augmented)
+            section = await self.learnings_section(user_message, "manas")
+            packed = await self.pack_context("manas", section)
+            data, usage = await self.call_faculty_json("manas", user_message, packed)
             return ManaOutput(
                 response=data.get("response", ""),
                 confidence=max(0.0, min(1.0, data.get("confidence", 0.5))),
                 valence=max(-1.0, min(1.0, data.get("valence", 0.0))),
             ), usage
         except Exception as e:
+            faculty_errors.inc(faculty="manas")
             return ManaOutput(
                 response=f"Manas encountered turbulence: {e}",
                 confidence=0.1,
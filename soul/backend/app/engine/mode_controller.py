@@ -0,0 +1,143 @@
+"""
+Load-adaptive choice between combined and parallel faculty modes.
+
+Parallel mode (three faculty calls) has the lowest latency; combined mode
+(one call) spends fewer tokens and requests. The controller folds live
+signals into a single pressure score in [0, 1] and moves to combined mode
+when pressure crosses `adaptive_mode_enter_pressure`, back to parallel
+once it falls below `adaptive_mode_exit_pressure`, and never switches
+more often than `adaptive_mode_min_dwell_s` so the mode does not flap.
+Thresholds come from each turn's config snapshot, which requires the
+enter pressure to be above the exit pressure.
+
+Each tenant keeps its own mode, dwell timer and reason, judged against
+its own thresholds. The load, rate-limit and latency signals measure this
+worker and the shared API key, so they are common to every tenant. The
+budget signal also counts the tenant's share of
+`token_budget_daily_per_tenant`, so a tenant burning its own budget only
+moves itself to combined mode.
+
+Latencies are only measured in the mode a turn used, so while combined
+mode holds, no parallel samples arrive. Samples older than
+`adaptive_mode_latency_max_age_s` are therefore ignored, and the latency
+signal drops to 0 when either mode has too few recent ones. A switch made
+because of latency can then recover once the other signals allow it.
+"""
+import time
+from collections import deque
+
+from app.config import settings
+from app.models.database import get_tenant
+from app.services.admission import admission_controller
+from app.services.claude_client import claude_client
+from app.services.config_store import ConfigSnapshot
+from app.services.metrics import Counter, Gauge, registry
+from app.services.turn_context import TurnContext
+from app.services.usage_ledger import usage_ledger
+
+faculty_mode_total = registry.register(Counter(
+    "soul_faculty_mode_total",
+    "Turns by faculty mode and the reason it was chosen",
+    ("mode", "reason"),
+))
+
+
+def _percentile(samples, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class _TenantMode:
+    def __init__(self, combined: bool):
+        self.combined = combined  # seeded from the tenant's first adaptive turn
+        self.reason = "static"
+        self.switched_at = 0.0
+
+
+class ModeController:
+    def __init__(self):
+        self._modes: dict[str, _TenantMode] = {}
+        # (monotonic time, seconds) per mode
+        self._latencies: dict[str, deque[tuple[float, float]]] = {
+            "parallel": deque(maxlen=settings.adaptive_mode_latency_window),
+            "combined": deque(maxlen=settings.adaptive_mode_latency_window),
+        }
+
+    def record_latency(self, mode: str, seconds: float) -> None:
+        """Record how long the faculty phase of a turn took in `mode`."""
+        self._latencies[mode].append((time.monotonic(), seconds))
+
+    def latency_p95(self, mode: str) -> float | None:
+        """p95 of the mode's recent samples, or None if there are too few."""
+        cutoff = time.monotonic() - settings.adaptive_mode_latency_max_age_s
+        samples = [seconds for at, seconds in self._latencies[mode] if at >= cutoff]
+        if len(samples) < settings.adaptive_mode_min_samples:
+            return None
+        return _percentile(samples, 0.95)
+
+    def signals(self, tenant: str | None = None) -> dict[str, float]:
+        """Current pressure per signal, each in [0, 1]; `tenant` adds its own budget share."""
+        load = admission_controller.in_flight / max(1, settings.admission_max_in_flight)
+        rate_limit = 1.0 - claude_client.rate_limit_headroom
+        budget = 0.0
+        if settings.token_budget_daily > 0:
+            budget = usage_ledger.spent_today() / settings.token_budget_daily
+        if tenant is not None and settings.token_budget_daily_per_tenant > 0:
+            budget = max(budget, usage_ledger.spent_today(tenant=tenant) / settings.token_budget_daily_per_tenant)
+
+        # Parallel slower than combined (e.g. its three calls queue on rate
+        # limits) pushes towards combined; parity maps to 0.5.
+        latency = 0.0
+        parallel_p95 = self.latency_p95("parallel")
+        combined_p95 = self.latency_p95("combined")
+        if parallel_p95 and combined_p95:
+            latency = parallel_p95 / combined_p95 - 0.5
+
+        return {
+            name: max(0.0, min(1.0, value))
+            for name, value in (("load", load), ("rate_limit", rate_limit), ("budget", budget), ("latency", latency))
+        }
+
+    def choose(self, turn: TurnContext) -> tuple[bool, str]:
+        """Return (use_combined, reason) for a new turn and record it on `turn`."""
+        if turn.degraded_to("combined_mode"):
+            combined, reason = True, "budget_degradation"
+        elif not turn.config.adaptive_mode_enabled:
+            combined, reason = turn.config.combined_mode, "static"
+        else:
+            combined, reason = self._adapt(turn.config)
+
+        turn.faculty_mode = "combined" if combined else "parallel"
+        turn.mode_reason = reason
+        faculty_mode_total.inc(mode=turn.faculty_mode, reason=reason)
+        return combined, reason
+
+    def _adapt(self, config: ConfigSnapshot) -> tuple[bool, str]:
+        tenant = get_tenant()
+        state = self._modes.get(tenant)
+        if state is None:
+            state = self._modes[tenant] = _TenantMode(config.combined_mode)
+        now = time.monotonic()
+        if now - state.switched_at >= config.adaptive_mode_min_dwell_s:
+            name, pressure = max(self.signals(tenant).items(), key=lambda item: item[1])
+            if not state.combined and pressure >= config.adaptive_mode_enter_pressure:
+                state.combined, state.reason, state.switched_at = True, name, now
+            elif state.combined and pressure <= config.adaptive_mode_exit_pressure:
+                state.combined, state.reason, state.switched_at = False, "recovered", now
+            elif state.reason == "static":
+                state.reason = "steady"
+        return state.combined, state.reason
+
+    def evict(self, tenant: str) -> None:
+        """Eviction hook: the tenant's next turn starts again from its config."""
+        self._modes.pop(tenant, None)
+
+
+mode_controller = ModeController()
+
+registry.register(Gauge(
+    "soul_mode_pressure",
+    "Adaptive mode controller pressure by signal",
+    ("signal",),
+    collect=lambda: {(name,): value for name, value in mode_controller.signals().items()},
+))
@@ -0,0 +1,217 @@
+"""
+Two-level cache of faculty outputs and synthesized responses.
+
+Many users ask essentially the same questions. When nothing a call depends
+on has changed, the soul reuses the earlier result instead of calling Claude:
+
+  - faculty level: one entry per faculty output (and per combined-mode
+    call), keyed on the tenant, the normalized message, the packed
+    habit/learning context the faculty would see, its system prompt, and
+    the model settings of the turn's config snapshot. Retrieval still runs every turn, so a faculty
+    whose context changed misses while the others still hit.
+  - response level: one entry per synthesized answer, keyed on the three
+    faculty keys plus synthesis prompt, model and weights. A turn whose
+    faculties all hit and whose synthesis inputs are unchanged costs no
+    Claude calls at all.
+
+Because keys hash the context text itself, a changed habit or learning can
+never be served stale. Each entry also records the habit and learning ids
+it was built from. Invalidation-bus events for those rows, from this
+worker or any other, drop the entry right away rather than leaving it to
+age out. Both levels are LRU-bounded with a TTL.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from app.config import settings
+from app.models.database import get_tenant
+from app.models.habit_model import Habit
+from app.models.learning_model import Learning
+from app.services.claude_client import TokenUsageData
+from app.services.invalidation import invalidation_bus
+from app.services.metrics import Counter, Gauge, registry
+from app.services.resilience import fallback_served
+from app.services.turn_context import get_turn
+
+FACULTIES = ("manas", "buddhi", "sanskaras")
+
+Dependency = tuple[str, str, int]  # (topic, tenant, row id), e.g. ("habits", "default", 12)
+
+cache_lookups = registry.register(Counter(
+    "soul_response_cache_lookups_total",
+    "Response cache lookups by level (faculty, response) and result (hit, miss)",
+    ("level", "result"),
+))
+cache_evictions = registry.register(Counter(
+    "soul_response_cache_evictions_total",
+    "Response cache entries removed, by level and reason (lru, ttl, invalidated)",
+    ("level", "reason"),
+))
+
+
+def normalize_message(message: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a message."""
+    return " ".join(message.lower().split()).rstrip(" ?!.")
+
+
+def cache_key(*parts: Any) -> str:
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def dependencies(refs: list[Any]) -> frozenset[Dependency]:
+    """(topic, tenant, id) for the habits and learnings a prompt was built from."""
+    tenant = get_tenant()
+    deps = set()
+    for ref in refs:
+        if isinstance(ref, Habit):
+            deps.add(("habits", tenant, ref.id))
+        elif isinstance(ref, Learning):
+            deps.add(("learnings", tenant, ref.id))
+    return frozenset(deps)
+
+
+class LRUCache:
+    """OrderedDict LRU with per-entry expiry and a dependency index."""
+
+    def __init__(self, level: str, max_entries: int, ttl_s: float):
+        self.level = level
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[str, tuple[float, Any, frozenset[Dependency]]] = OrderedDict()
+        self._dependents: dict[Dependency, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] < time.monotonic():
+            self._remove(key, "ttl")
+            entry = None
+        if entry is None:
+            cache_lookups.inc(level=self.level, result="miss")
+            return None
+        self._entries.move_to_end(key)
+        cache_lookups.inc(level=self.level, result="hit")
+        return entry[1]
+
+    def put(self, key: str, value: Any, deps: frozenset[Dependency] = frozenset()) -> None:
+        if self.max_entries <= 0:
+            return
+        if key in self._entries:
+            self._remove(key, None)
+        self._entries[key] = (time.monotonic() + self.ttl_s, value, deps)
+        for dep in deps:
+            self._dependents.setdefault(dep, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)), "lru")
+
+    def invalidate(self, topic: str, tenant: str | None, row_id: int | None) -> None:
+        """Drop entries built from this row, or from any row of `topic` if row_id is None."""
+        if row_id is None:
+            doomed = {
+                key for (t, owner, _), keys in self._dependents.items()
+                if t == topic and tenant in (None, owner) for key in keys
+            }
+        else:
+            doomed = set(self._dependents.get((topic, tenant, row_id), ()))
+        for key in doomed:
+            self._remove(key, "invalidated")
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._dependents.clear()
+
+    def _remove(self, key: str, reason: str | None) -> None:
+        _, _, deps = self._entries.pop(key)
+        for dep in deps:
+            keys = self._dependents.get(dep)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._dependents[dep]
+        if reason:
+            cache_evictions.inc(level=self.level, reason=reason)
+
+
+class ResponseCache:
+    def __init__(self):
+        self.faculties = LRUCache("faculty", settings.response_cache_faculty_entries, settings.response_cache_ttl_s)
+        self.responses = LRUCache("response", settings.response_cache_entries, settings.response_cache_ttl_s)
+        for topic in ("habits", "learnings"):
+            invalidation_bus.subscribe(topic, lambda tenant, key, topic=topic: self.invalidate(topic, tenant, key))
+
+    @property
+    def enabled(self) -> bool:
+        return settings.response_cache_enabled
+
+    def faculty_key(self, name: str, message: str, context: str, prompt_digest: str, max_tokens: int) -> str:
+        """Key for a faculty (or combined) call on the current turn's config."""
+        turn = get_turn()
+        config = turn.config
+        return cache_key(
+            get_tenant(), name, normalize_message(message), context, prompt_digest,
+            config.faculty_model, max_tokens, config.temperature, turn.degraded_to("reduced_tokens"),
+        )
+
+    async def faculty_json(
+        self,
+        name: str,
+        key: str,
+        deps: frozenset[Dependency],
+        call: Callable[[], Awaitable[tuple[dict, TokenUsageData]]],
+    ) -> tuple[dict, TokenUsageData]:
+        """Cached parsed output of `call()`; records the key on the turn for the response level."""
+        data = self.faculties.get(key) if self.enabled else None
+        usage = TokenUsageData()
+        if data is None:
+            fallback_served.set(False)
+            data, usage = await call()
+            # A fallback model's answer stands in for this turn only
+            if self.enabled and not fallback_served.get():
+                self.faculties.put(key, data, deps)
+        self.record(name, key, deps)
+        return data, usage
+
+    def record(self, name: str, key: str, deps: frozenset[Dependency]) -> None:
+        """Note a faculty's key on the turn so the response level can be keyed on it."""
+        turn = get_turn()
+        for faculty in FACULTIES if name == "combined" else (name,):
+            turn.cache_keys[faculty] = (key, deps)
+
+    def response_key(self, *parts: Any) -> tuple[str, frozenset[Dependency]] | None:
+        """Key and dependencies for synthesis over this turn's faculty outputs.
+
+        None if any faculty fell back to an error output (it recorded no key),
+        so error-shaped syntheses are never cached.
+        """
+        recorded = get_turn().cache_keys
+        if not self.enabled or any(f not in recorded for f in FACULTIES):
+            return None
+        keys = [recorded[f][0] for f in FACULTIES]
+        deps = frozenset().union(*(recorded[f][1] for f in FACULTIES))
+        return cache_key(*keys, *parts), deps
+
+    def invalidate(self, topic: str, tenant: str | None, key: str | None) -> None:
+        row_id = int(key) if key is not None and key.isdigit() else None
+        self.faculties.invalidate(topic, tenant, row_id)
+        self.responses.invalidate(topic, tenant, row_id)
+
+    def clear(self) -> None:
+        self.faculties.clear()
+        self.responses.clear()
+
+
+response_cache = ResponseCache()
+
+registry.register(Gauge(
+    "soul_response_cache_entries",
+    "Entries held in the response cache, by level",
+    ("level",),
+    collect=lambda: {
+        ("faculty",): len(response_cache.faculties),
+        ("response",): len(response_cache.responses),
+    },
+))
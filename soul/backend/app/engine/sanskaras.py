@@ -1,7 +1,72 @@
+import math
+
 from app.engine.base_module import BaseModule
+from app.engine.context_packer import ContextItem, ContextSection
+from app.engine.response_cache import cache_key, dependencies, response_cache
 from app.models.schemas import SanskaraOutput
-from app.services.habit_service import habit_service
+from app.services.habit_service import HabitMatch, habit_service
 from app.services.claude_client import TokenUsageData
+from app.services.metrics import faculty_errors, faculty_local
+from app.services.tracing import tracer
+from app.services.turn_context import get_turn
+
+# Deterministic mode: confidence rises with the strongest match score and saturates
+NO_MATCH_CONFIDENCE = 0.2
+MIN_CONFIDENCE = 0.3
+MAX_CONFIDENCE = 0.9
+SCORE_SCALE = 3.0         # score at which confidence is ~63% of the way from min to max
+CONFLICT_PENALTY = 0.15   # strong habits of opposite valence
+CONFLICT_VALENCE = 0.3
+
+
+def _readable(habit_name: str) -> str:
+    return habit_name.replace("_", " ")
+
+
+def local_output(matches: list[HabitMatch]) -> SanskaraOutput:
+    """Sanskaras' output built from the habit matches alone, without a Claude call."""
+    if not matches:
+        return SanskaraOutput(
+            response="No familiar pattern stirs here; experience has little to say about this yet.",
+            confidence=NO_MATCH_CONFIDENCE,
+            activated_habits=[],
+            metadata={"mode": "deterministic"},
+        )
+
+    top = matches[0]
+    # Only habits close to the strongest one have a say
+    strong = [m for m in matches if m.score >= top.score / 2]
+    sentences = [f"The strongest impression here is {_readable(top.habit.name)}: {top.habit.description}."]
+    others = [_readable(m.habit.name) for m in strong[1:3]]
+    if others:
+        sentences.append(f"{' and '.join(others).capitalize()} {'stir' if len(others) > 1 else 'stirs'} as well.")
+    positive = [m for m in strong if m.habit.valence >= CONFLICT_VALENCE]
+    negative = [m for m in strong if m.habit.valence <= -CONFLICT_VALENCE]
+    conflict = bool(positive and negative)
+    if conflict:
+        sentences.append(
+            f"{_readable(positive[0].habit.name).capitalize()} pulls one way "
+            f"while {_readable(negative[0].habit.name)} pulls the other."
+        )
+
+    confidence = MIN_CONFIDENCE + (MAX_CONFIDENCE - MIN_CONFIDENCE) * (1 - math.exp(-top.score / SCORE_SCALE))
+    if conflict:
+        confidence -= CONFLICT_PENALTY
+    return SanskaraOutput(
+        response=" ".join(sentences),
+        confidence=round(max(0.0, min(1.0, confidence)), 3),
+        activated_habits=[
+            {
+                "name": m.habit.name,
+                "weight": round(m.habit.effective_weight, 2),
+                "influence": m.habit.description,
+                "score": round(m.score, 2),
+                "keywords": m.keywords,
+            }
+            for m in matches
+        ],
+        metadata={"mode": "deterministic"},
+    )
 
 
 class SanskarasModule(BaseModule):
@@ -9,26 +74,30 @@ class SanskarasModule(BaseModule):
         super().__init__("sanskaras.txt")
 
     async def process(self, user_message: str, **kwargs) -> tuple[SanskaraOutput, TokenUsageData]:
+        if get_turn().config.sanskaras_mode == "deterministic":
+            return await self.process_local(user_message)
         try:
-            # Retrieve relevant habits
+            # Retrieve relevant habits and learnings, packed into the token budget
             habits = await habit_service.find_relevant_habits(user_message, limit=5)
-
-            # Build context with activated habits
-            habits_context = ""
-            if habits:
-                habit_lines = []
-                for h in habits:
-                    habit_lines.append(
-                        f"- {h.name} (category: {h.category}, weight: {h.effective_weight:.1f}, "
-                        f"valence: {h.valence:+.1f}): {h.description}"
+            habits_section = ContextSection(
+                name="habits",
+                heading="Activated habits from experience:",
+                items=[
+                    ContextItem(
+                        text=(
+                            f"- {h.name} (category: {h.category}, weight: {h.effective_weight:.1f}, "
+                            f"valence: {h.valence:+.1f}): {h.description}"
+                        ),
+                        brief=f"- {h.name} (weight: {h.effective_weight:.1f}, valence: {h.valence:+.1f})",
+                        ref=h,
                     )
-                habits_context = (
-                    "\n\nActivated habits from experience:\n" + "\n".join(habit_lines)
-                )
-
-            learnings_ctx = await self.build_learnings_context(user_message, "sanskaras")
-            augmented_message = user_message + habits_context + learnings_ctx
-            data, usage = await self.call_claude_json(augmented_message)
+                    for h in habits
+                ],
+                noun="habits",
+            )
+            learnings_section = await self.learnings_section(user_message, "sanskaras")
+            packed = await self.pack_context("sanskaras", habits_section, learnings_section)
+            data, usage = await self.call_faculty_json("sanskaras", user_message, packed)
 
             return SanskaraOutput(
                 response=data.get("response", ""),
@@ -36,6 +105,30 @@ class SanskarasModule(BaseModule):
                 activated_habits=data.get("activated_habits", []),
             ), usage
         except Exception as e:
+            faculty_errors.inc(faculty="sanskaras")
+            return SanskaraOutput(
+                response=f"Sanskaras encountered static: {e}",
+                confidence=0.1,
+                activated_habits=[],
+            ), TokenUsageData()
+
+    async def process_local(self, user_message: str) -> tuple[SanskaraOutput, TokenUsageData]:
+        """Deterministic mode: templated phrasing of the top habit matches, no Claude call."""
+        try:
+            with tracer.span("sanskaras.local") as span:
+                matches = await habit_service.match_habits(user_message, limit=5)
+                output = local_output(matches)
+                span.set(habits=len(matches), confidence=output.confidence)
+            faculty_local.inc(faculty="sanskaras")
+            # Keyed on the output itself, so synthesis over it can still be cached
+            response_cache.record(
+                "sanskaras",
+                cache_key("sanskaras", "deterministic", output.model_dump_json()),
+                dependencies([m.habit for m in matches]),
+            )
+            return output, TokenUsageData()
+        except Exception as e:
+            faculty_errors.inc(faculty="sanskaras")
             return SanskaraOutput(
                 response=f"Sanskaras encountered static: {e}",
                 confidence=0.1,
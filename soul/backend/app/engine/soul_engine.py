@@ -1,18 +1,26 @@
-import asyncio
 import time
+from contextlib import aclosing
 from pathlib import Path
 
 from app.engine.manas import ManasModule
 from app.engine.buddhi import BuddhiModule
 from app.engine.sanskaras import SanskarasModule
 from app.engine.synthesizer import Synthesizer
+from app.engine.confidence_gate import FACULTIES, ConfidenceGate, cancelled_output
+from app.engine.mode_controller import mode_controller
+from app.engine.response_cache import cache_key, response_cache
 from app.models.schemas import (
     ChatResponse, ManaOutput, BuddhiOutput, SanskaraOutput,
     SynthesisOutput, TokenUsage, TrainerConsultationNeeded,
 )
-from app.config import settings
 from app.services.claude_client import claude_client, TokenUsageData
 from app.services.learning_service import learning_service
+from app.services.metrics import (
+    timed, trainer_deduplicated, turns_total, weighted_confidence as confidence_histogram,
+)
+from app.services.tracing import tracer
+from app.services.trainer_queue import trainer_queue
+from app.services.turn_context import TurnContext, get_turn, use_turn
 
 
 def _to_token_usage(data: TokenUsageData) -> TokenUsage:
@@ -32,51 +40,76 @@ class SoulEngine:
         self.buddhi = BuddhiModule()
         self.sanskaras = SanskarasModule()
         self.synthesizer = Synthesizer()
-        self._combined_prompt: str | None = None
-
-    @property
-    def combined_prompt(self) -> str:
-        if self._combined_prompt is None:
-            path = Path(__file__).parent / "prompts" / "combined.txt"
-            self._combined_prompt = path.read_text()
-        return self._combined_prompt
-
-    async def process(self, message: str) -> ChatResponse:
+        self._combined_prompts: dict[str, str] = {}
+
+    def combined_prompt(self, with_sanskaras: bool = True) -> str:
+        """All three faculties, or only Manas and Buddhi when Sanskaras is built locally."""
+        name = "combined.txt" if with_sanskaras else "combined_reasoning.txt"
+        if name not in self._combined_prompts:
+            self._combined_prompts[name] = (Path(__file__).parent / "prompts" / name).read_text()
+        return self._combined_prompts[name]
+
+    async def process(self, message: str, turn: TurnContext | None = None) -> ChatResponse:
+        turn = turn or TurnContext()
+        combined, mode_reason = mode_controller.choose(turn)
+        with use_turn(turn), tracer.span(
+            "soul.turn", streaming=False, combined_mode=combined, mode_reason=mode_reason,
+            degradation=turn.degradation,
+        ) as span:
+            response = await self._process(message, combined)
+            span.set(mode=response.mode, elapsed_ms=response.elapsed_ms)
+        response.trace_id = span.trace_id
+        response.queue_ms = turn.queue_ms
+        response.degradation = turn.degradation
+        response.faculty_mode = turn.faculty_mode
+        response.mode_reason = turn.mode_reason
+        response.config_version = turn.config.version
+        return response
+
+    async def _process(self, message: str, combined: bool) -> ChatResponse:
+        config = get_turn().config
         start = time.time()
         total_usage = TokenUsageData()
+        faculty_start = time.perf_counter()
+        gate = ConfidenceGate.for_turn()
 
-        if settings.combined_mode:
-            manas_out, buddhi_out, sanskaras_out, usage = await self._process_combined(message)
+        if combined:
+            manas_out, buddhi_out, sanskaras_out, usage = await timed(
+                "combined", self._process_combined(message)
+            )
             total_usage = total_usage + usage
+            for out in (manas_out, buddhi_out, sanskaras_out):
+                gate.record(out.module, out.confidence)
         else:
-            # Run all three modules in parallel
-            results = await asyncio.gather(
-                self.manas.process(message),
-                self.buddhi.process(message),
-                self.sanskaras.process(message),
-            )
-            manas_out, manas_usage = results[0]
-            buddhi_out, buddhi_usage = results[1]
-            sanskaras_out, sanskaras_usage = results[2]
-            total_usage = total_usage + manas_usage + buddhi_usage + sanskaras_usage
-
-        # Compute weighted aggregate confidence
-        weighted_confidence = (
-            settings.weight_manas * manas_out.confidence
-            + settings.weight_buddhi * buddhi_out.confidence
-            + settings.weight_sanskaras * sanskaras_out.confidence
+            # Run all three modules in parallel; the gate cancels any that can no longer matter
+            outputs = {}
+            async with aclosing(gate.run({
+                "manas": self.manas.process(message),
+                "buddhi": self.buddhi.process(message),
+                "sanskaras": self.sanskaras.process(message),
+            })) as finished:
+                async for name, out, usage in finished:
+                    outputs[name] = out
+                    total_usage = total_usage + usage
+            for name in gate.cancelled:
+                outputs[name] = cancelled_output(name)
+            manas_out, buddhi_out, sanskaras_out = (outputs[name] for name in FACULTIES)
+        mode_controller.record_latency(
+            "combined" if combined else "parallel", time.perf_counter() - faculty_start
         )
 
-        # If learning mode is on and confidence is below threshold, ask for trainer
-        if (
-            settings.learning_mode_enabled
-            and weighted_confidence < settings.confidence_threshold
-        ):
-            trainer_needed, trainer_usage = await self._create_trainer_consultation(
+        # Weighted aggregate confidence (only meaningful once every faculty reported)
+        if not gate.cancelled:
+            confidence_histogram.observe(gate.weighted)
+
+        # If learning mode is on and confidence is (certainly) below threshold, ask for trainer
+        if gate.decision == "trainer":
+            trainer_needed, trainer_usage = await timed("trainer", self._create_trainer_consultation(
                 message, manas_out, buddhi_out, sanskaras_out
-            )
+            ))
             total_usage = total_usage + trainer_usage
             elapsed_ms = int((time.time() - start) * 1000)
+            turns_total.inc(mode="needs_trainer")
 
             return ChatResponse(
                 manas=manas_out,
@@ -85,9 +118,9 @@ class SoulEngine:
                 synthesis=SynthesisOutput(
                     response="I'm not sure how to respond to this yet. I need guidance from my trainer.",
                     weights={
-                        "manas": settings.weight_manas,
-                        "buddhi": settings.weight_buddhi,
-                        "sanskaras": settings.weight_sanskaras,
+                        "manas": config.weight_manas,
+                        "buddhi": config.weight_buddhi,
+                        "sanskaras": config.weight_sanskaras,
                     },
                 ),
                 elapsed_ms=elapsed_ms,
@@ -97,15 +130,16 @@ class SoulEngine:
             )
 
         # Normal path: synthesize
-        synthesis_out, synthesis_usage = await self.synthesizer.process(
+        synthesis_out, synthesis_usage = await timed("synthesis", self.synthesizer.process(
             user_message=message,
             manas=manas_out,
             buddhi=buddhi_out,
             sanskaras=sanskaras_out,
-        )
+        ))
         total_usage = total_usage + synthesis_usage
 
         elapsed_ms = int((time.time() - start) * 1000)
+        turns_total.inc(mode="autonomous")
 
         return ChatResponse(
             manas=manas_out,
@@ -119,16 +153,21 @@ class SoulEngine:
 
     async def _process_combined(self, message: str):
         """Single API call for all three faculties."""
-        data, usage = await claude_client.complete_json(
-            system_prompt=self.combined_prompt,
+        config = get_turn().config
+        # In deterministic mode Sanskaras is built locally, so the call only answers for the other two
+        local_sanskaras = config.sanskaras_mode == "deterministic"
+        prompt = self.combined_prompt(with_sanskaras=not local_sanskaras)
+        max_tokens = 550 if local_sanskaras else 800  # Combined output for all the faculties it covers
+        key = response_cache.faculty_key("combined", message, "", cache_key(prompt), max_tokens)
+        data, usage = await response_cache.faculty_json("combined", key, frozenset(), lambda: claude_client.complete_json(
+            system_prompt=prompt,
             user_message=message,
-            model=settings.faculty_model,
-            max_tokens=800,  # Combined output for all 3 faculties
-        )
+            model=config.faculty_model,
+            max_tokens=max_tokens,
+        ))
 
         manas_data = data.get("manas", {})
         buddhi_data = data.get("buddhi", {})
-        sanskaras_data = data.get("sanskaras", {})
 
         manas_out = ManaOutput(
             response=manas_data.get("response", ""),
@@ -140,52 +179,41 @@ class SoulEngine:
             confidence=max(0.0, min(1.0, buddhi_data.get("confidence", 0.5))),
             reasoning_chain=buddhi_data.get("reasoning_chain", []),
         )
-        sanskaras_out = SanskaraOutput(
-            response=sanskaras_data.get("response", ""),
-            confidence=max(0.0, min(1.0, sanskaras_data.get("confidence", 0.5))),
-            activated_habits=sanskaras_data.get("activated_habits", []),
-        )
+        if local_sanskaras:
+            # Built from the matched habits, which the combined call never sees
+            sanskaras_out, _ = await self.sanskaras.process_local(message)
+        else:
+            sanskaras_data = data.get("sanskaras", {})
+            sanskaras_out = SanskaraOutput(
+                response=sanskaras_data.get("response", ""),
+                confidence=max(0.0, min(1.0, sanskaras_data.get("confidence", 0.5))),
+                activated_habits=sanskaras_data.get("activated_habits", []),
+            )
 
         return manas_out, buddhi_out, sanskaras_out, usage
 
     async def _create_trainer_consultation(
         self, message, manas_out, buddhi_out, sanskaras_out
     ) -> tuple[TrainerConsultationNeeded, TokenUsageData]:
-        """Formulate a question for the trainer and create a pending learning."""
+        """Create a pending learning (or join a similar one); its question is phrased in the background."""
         usage = TokenUsageData()
-        try:
-            question_data, usage = await claude_client.complete_json(
-                system_prompt=(
-                    "You help a young soul formulate questions for its trainer. "
-                    "Given a user message and the soul's uncertain module outputs, "
-                    "create a concise question and extract keywords. "
-                    "Respond in JSON: {\"trigger_summary\": \"...\", \"keywords\": \"comma,separated,words\"}"
-                ),
-                user_message=(
-                    f"User said: \"{message}\"\n"
-                    f"Manas felt: {manas_out.response}\n"
-                    f"Buddhi thought: {buddhi_out.response}\n"
-                    f"Sanskaras recalled: {sanskaras_out.response}\n"
-                    f"The soul is uncertain. What should it ask the trainer?"
-                ),
-                max_tokens=256,
-                temperature=0.3,
-            )
-            trigger_summary = question_data.get("trigger_summary", f"How should I respond to: {message}")
-            keywords = question_data.get("keywords", ",".join(message.lower().split()[:5]))
-        except Exception:
-            trigger_summary = f"How should I respond to: {message}"
-            keywords = ",".join(message.lower().split()[:5])
-
-        learning = await learning_service.create_pending(
-            question_context=message,
-            trigger_summary=trigger_summary,
-            keywords=keywords,
+        duplicate = await learning_service.attach_to_similar_pending(message)
+        if duplicate is not None:
+            trainer_deduplicated.inc()
+            return TrainerConsultationNeeded(
+                learning_id=duplicate.id,
+                trigger_summary=duplicate.trigger_summary,
+                question_context=message,
+            ), usage
+
+        # Question phrasing happens in the background; the turn returns the provisional one
+        learning = await trainer_queue.open_consultation(
+            message, manas_out, buddhi_out, sanskaras_out, turn=get_turn()
         )
 
         return TrainerConsultationNeeded(
             learning_id=learning.id,
-            trigger_summary=trigger_summary,
+            trigger_summary=learning.trigger_summary,
             question_context=message,
         ), usage
 
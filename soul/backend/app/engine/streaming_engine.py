@@ -2,26 +2,34 @@
 Streaming version of SoulEngine that yields module results as they complete.
 Inspired by opensoulai's streaming architecture for progressive UI updates.
 """
-import asyncio
-import json
 import time
+from contextlib import aclosing
 from pathlib import Path
 from typing import AsyncGenerator
 
+import orjson
+
 from app.engine.manas import ManasModule
 from app.engine.buddhi import BuddhiModule
 from app.engine.sanskaras import SanskarasModule
 from app.engine.synthesizer import Synthesizer
+from app.engine.confidence_gate import FACULTIES, ConfidenceGate, FacultyFailed, cancelled_output
+from app.engine.mode_controller import mode_controller
+from app.engine.response_cache import cache_key, response_cache
 from app.models.schemas import ManaOutput, BuddhiOutput, SanskaraOutput, SynthesisOutput, TrainerConsultationNeeded
-from app.config import settings
 from app.services.claude_client import claude_client, TokenUsageData
 from app.services.learning_service import learning_service
+from app.services.metrics import (
+    faculty_errors, timed, trainer_deduplicated, turns_total, weighted_confidence as confidence_histogram,
+)
+from app.services.tracing import tracer
+from app.services.trainer_queue import trainer_queue
+from app.services.turn_context import TurnContext, get_turn, use_turn
 
 
-def _sse_event(event: str, data: dict) -> str:
-    """Format a Server-Sent Event message."""
-    payload = json.dumps(data)
-    return f"event: {event}\ndata: {payload}\n\n"
+def _sse_event(event: str, data: dict) -> bytes:
+    """Encode a Server-Sent Event frame once; the bytes are reused for every write and replay."""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
 
 
 def _usage_dict(usage: TokenUsageData) -> dict:
@@ -41,16 +49,16 @@ class StreamingSoulEngine:
         self.buddhi = BuddhiModule()
         self.sanskaras = SanskarasModule()
         self.synthesizer = Synthesizer()
-        self._combined_prompt: str | None = None
+        self._combined_prompts: dict[str, str] = {}
 
-    @property
-    def combined_prompt(self) -> str:
-        if self._combined_prompt is None:
-            path = Path(__file__).parent / "prompts" / "combined.txt"
-            self._combined_prompt = path.read_text()
-        return self._combined_prompt
+    def combined_prompt(self, with_sanskaras: bool = True) -> str:
+        """All three faculties, or only Manas and Buddhi when Sanskaras is built locally."""
+        name = "combined.txt" if with_sanskaras else "combined_reasoning.txt"
+        if name not in self._combined_prompts:
+            self._combined_prompts[name] = (Path(__file__).parent / "prompts" / name).read_text()
+        return self._combined_prompts[name]
 
-    async def stream(self, message: str) -> AsyncGenerator[str, None]:
+    async def stream(self, message: str, turn: TurnContext | None = None) -> AsyncGenerator[bytes, None]:
         """
         Stream soul responses as SSE events.
 
@@ -64,98 +72,109 @@ class StreamingSoulEngine:
           - event: done         — stream complete (includes token_usage)
           - event: needs_trainer — if trainer consultation triggered
           - event: error        — on error
+
+        `start` and `done` also carry the turn's admission wait (`queue_ms`,
+        never included in `elapsed_ms`), its budget `degradation` step and
+        the `trace_id`, so client timings can be joined to server spans.
         """
+        turn = turn or TurnContext()
+        combined, mode_reason = mode_controller.choose(turn)
+        with use_turn(turn), tracer.span(
+            "soul.turn", streaming=True, combined_mode=combined, mode_reason=mode_reason,
+            degradation=turn.degradation,
+        ) as span:
+            async for event in self._stream(message, turn, combined, span.trace_id):
+                yield event
+
+    async def _stream(
+        self, message: str, turn: TurnContext, combined: bool, trace_id: str | None
+    ) -> AsyncGenerator[bytes, None]:
         start = time.time()
         total_usage = TokenUsageData()
+        config = turn.config
+
+        yield _sse_event("start", {
+            "message": message,
+            "timestamp": start,
+            "queue_ms": turn.queue_ms,
+            "degradation": turn.degradation,
+            "faculty_mode": turn.faculty_mode,
+            "mode_reason": turn.mode_reason,
+            "config_version": config.version,
+            "trace_id": trace_id,
+        })
 
-        yield _sse_event("start", {"message": message, "timestamp": start})
-
-        if settings.combined_mode:
+        if combined:
             # Combined mode: single call for all 3 faculties
-            async for event in self._stream_combined(message, start, total_usage):
+            async for event in self._stream_combined(message, start, total_usage, turn, trace_id):
                 yield event
             return
 
-        # Standard mode: stream each faculty as it completes
-        queue: asyncio.Queue = asyncio.Queue()
-
-        async def run_module(name: str, coro):
-            try:
-                result, usage = await coro
-                await queue.put((name, result, usage, None))
-            except Exception as e:
-                await queue.put((name, None, TokenUsageData(), str(e)))
-
-        # Launch all three modules concurrently
-        tasks = [
-            asyncio.create_task(run_module("manas", self.manas.process(message))),
-            asyncio.create_task(run_module("buddhi", self.buddhi.process(message))),
-            asyncio.create_task(run_module("sanskaras", self.sanskaras.process(message))),
-        ]
-
-        # Collect results as they arrive (streaming)
+        # Standard mode: stream each faculty as it completes. All three run
+        # concurrently; the gate cancels any that can no longer change the outcome.
+        faculty_start = time.perf_counter()
+        gate = ConfidenceGate.for_turn()
         results = {}
-        for _ in range(3):
-            name, result, usage, error = await queue.get()
-            if error:
-                yield _sse_event("error", {"module": name, "error": error})
-                for t in tasks:
-                    t.cancel()
+        finished = gate.run({
+            "manas": self.manas.process(message),
+            "buddhi": self.buddhi.process(message),
+            "sanskaras": self.sanskaras.process(message),
+        })
+        async with aclosing(finished):
+            try:
+                async for name, result, usage in finished:
+                    results[name] = result
+                    total_usage = total_usage + usage
+                    # Emit each module result as it completes
+                    if name == "manas":
+                        yield _sse_event("manas", {
+                            "response": result.response,
+                            "confidence": result.confidence,
+                            "valence": result.valence,
+                            "module": "manas",
+                        })
+                    elif name == "buddhi":
+                        yield _sse_event("buddhi", {
+                            "response": result.response,
+                            "confidence": result.confidence,
+                            "reasoning_chain": result.reasoning_chain,
+                            "module": "buddhi",
+                        })
+                    elif name == "sanskaras":
+                        yield _sse_event("sanskaras", {
+                            "response": result.response,
+                            "confidence": result.confidence,
+                            "activated_habits": result.activated_habits,
+                            "module": "sanskaras",
+                        })
+            except FacultyFailed as e:
+                yield _sse_event("error", {"module": e.faculty, "error": str(e)})
                 return
 
-            results[name] = result
-            total_usage = total_usage + usage
-
-            # Emit each module result as it completes
-            if name == "manas":
-                yield _sse_event("manas", {
-                    "response": result.response,
-                    "confidence": result.confidence,
-                    "valence": result.valence,
-                    "module": "manas",
-                })
-            elif name == "buddhi":
-                yield _sse_event("buddhi", {
-                    "response": result.response,
-                    "confidence": result.confidence,
-                    "reasoning_chain": result.reasoning_chain,
-                    "module": "buddhi",
-                })
-            elif name == "sanskaras":
-                yield _sse_event("sanskaras", {
-                    "response": result.response,
-                    "confidence": result.confidence,
-                    "activated_habits": result.activated_habits,
-                    "module": "sanskaras",
-                })
+        mode_controller.record_latency("parallel", time.perf_counter() - faculty_start)
+        for name in gate.cancelled:
+            results[name] = cancelled_output(name)
+        manas_out, buddhi_out, sanskaras_out = (results[name] for name in FACULTIES)
 
-        manas_out = results["manas"]
-        buddhi_out = results["buddhi"]
-        sanskaras_out = results["sanskaras"]
-
-        # Compute weighted confidence
-        weighted_confidence = (
-            settings.weight_manas * manas_out.confidence
-            + settings.weight_buddhi * buddhi_out.confidence
-            + settings.weight_sanskaras * sanskaras_out.confidence
-        )
+        if not gate.cancelled:
+            confidence_histogram.observe(gate.weighted)
 
         yield _sse_event("confidence", {
-            "weighted": weighted_confidence,
-            "threshold": settings.confidence_threshold,
-            "learning_mode": settings.learning_mode_enabled,
+            "weighted": gate.weighted,
+            "threshold": config.confidence_threshold,
+            "learning_mode": config.learning_mode_enabled,
+            "decided_after": gate.decided_after,
+            "cancelled": gate.cancelled,
         })
 
         # Check if trainer consultation needed
-        if (
-            settings.learning_mode_enabled
-            and weighted_confidence < settings.confidence_threshold
-        ):
+        if gate.decision == "trainer":
             try:
-                trainer_needed, trainer_usage = await self._create_trainer_consultation(
+                trainer_needed, trainer_usage = await timed("trainer", self._create_trainer_consultation(
                     message, manas_out, buddhi_out, sanskaras_out
-                )
+                ))
                 total_usage = total_usage + trainer_usage
+                turns_total.inc(mode="needs_trainer")
                 elapsed_ms = int((time.time() - start) * 1000)
                 yield _sse_event("needs_trainer", {
                     "learning_id": trainer_needed.learning_id,
@@ -168,24 +187,28 @@ class StreamingSoulEngine:
 
             yield _sse_event("done", {
                 "elapsed_ms": int((time.time() - start) * 1000),
+                "queue_ms": turn.queue_ms,
+                "degradation": turn.degradation,
+                "trace_id": trace_id,
                 "token_usage": _usage_dict(total_usage),
             })
             return
 
         # Synthesize (Atman integrates all three)
         try:
-            synthesis_out, synthesis_usage = await self.synthesizer.process(
+            synthesis_out, synthesis_usage = await timed("synthesis", self.synthesizer.process(
                 user_message=message,
                 manas=manas_out,
                 buddhi=buddhi_out,
                 sanskaras=sanskaras_out,
-            )
+            ))
             total_usage = total_usage + synthesis_usage
         except Exception as e:
             yield _sse_event("error", {"error": str(e)})
             return
 
         elapsed_ms = int((time.time() - start) * 1000)
+        turns_total.inc(mode="autonomous")
 
         yield _sse_event("synthesis", {
             "response": synthesis_out.response,
@@ -196,28 +219,46 @@ class StreamingSoulEngine:
 
         yield _sse_event("done", {
             "elapsed_ms": elapsed_ms,
+            "queue_ms": turn.queue_ms,
+            "degradation": turn.degradation,
+            "trace_id": trace_id,
             "token_usage": _usage_dict(total_usage),
         })
 
     async def _stream_combined(
-        self, message: str, start: float, total_usage: TokenUsageData
-    ) -> AsyncGenerator[str, None]:
+        self,
+        message: str,
+        start: float,
+        total_usage: TokenUsageData,
+        turn: TurnContext,
+        trace_id: str | None = None,
+    ) -> AsyncGenerator[bytes, None]:
         """Combined mode: single call for all 3 faculties, then synthesis."""
+        config = turn.config
+        # In deterministic mode Sanskaras is built locally, so the call only answers for the other two
+        local_sanskaras = config.sanskaras_mode == "deterministic"
+        prompt = self.combined_prompt(with_sanskaras=not local_sanskaras)
+        max_tokens = 550 if local_sanskaras else 800
+        faculty_start = time.perf_counter()
         try:
-            data, usage = await claude_client.complete_json(
-                system_prompt=self.combined_prompt,
-                user_message=message,
-                model=settings.faculty_model,
-                max_tokens=800,
-            )
+            key = response_cache.faculty_key("combined", message, "", cache_key(prompt), max_tokens)
+            data, usage = await timed("combined", response_cache.faculty_json(
+                "combined", key, frozenset(), lambda: claude_client.complete_json(
+                    system_prompt=prompt,
+                    user_message=message,
+                    model=config.faculty_model,
+                    max_tokens=max_tokens,
+                ),
+            ))
             total_usage = total_usage + usage
         except Exception as e:
+            faculty_errors.inc(faculty="combined")
             yield _sse_event("error", {"error": str(e)})
             return
+        mode_controller.record_latency("combined", time.perf_counter() - faculty_start)
 
         manas_data = data.get("manas", {})
         buddhi_data = data.get("buddhi", {})
-        sanskaras_data = data.get("sanskaras", {})
 
         manas_out = ManaOutput(
             response=manas_data.get("response", ""),
@@ -229,11 +270,16 @@ class StreamingSoulEngine:
             confidence=max(0.0, min(1.0, buddhi_data.get("confidence", 0.5))),
             reasoning_chain=buddhi_data.get("reasoning_chain", []),
         )
-        sanskaras_out = SanskaraOutput(
-            response=sanskaras_data.get("response", ""),
-            confidence=max(0.0, min(1.0, sanskaras_data.get("confidence", 0.5))),
-            activated_habits=sanskaras_data.get("activated_habits", []),
-        )
+        if local_sanskaras:
+            # Built from the matched habits, which the combined call never sees
+            sanskaras_out, _ = await self.sanskaras.process_local(message)
+        else:
+            sanskaras_data = data.get("sanskaras", {})
+            sanskaras_out = SanskaraOutput(
+                response=sanskaras_data.get("response", ""),
+                confidence=max(0.0, min(1.0, sanskaras_data.get("confidence", 0.5))),
+                activated_habits=sanskaras_data.get("activated_habits", []),
+            )
 
         # Emit all three at once
         yield _sse_event("manas", {
@@ -256,28 +302,27 @@ class StreamingSoulEngine:
         })
 
         # Compute weighted confidence
-        weighted_confidence = (
-            settings.weight_manas * manas_out.confidence
-            + settings.weight_buddhi * buddhi_out.confidence
-            + settings.weight_sanskaras * sanskaras_out.confidence
-        )
+        gate = ConfidenceGate.for_turn()
+        for out in (manas_out, buddhi_out, sanskaras_out):
+            gate.record(out.module, out.confidence)
+        confidence_histogram.observe(gate.weighted)
 
         yield _sse_event("confidence", {
-            "weighted": weighted_confidence,
-            "threshold": settings.confidence_threshold,
-            "learning_mode": settings.learning_mode_enabled,
+            "weighted": gate.weighted,
+            "threshold": config.confidence_threshold,
+            "learning_mode": config.learning_mode_enabled,
+            "decided_after": gate.decided_after,
+            "cancelled": gate.cancelled,
         })
 
         # Check trainer
-        if (
-            settings.learning_mode_enabled
-            and weighted_confidence < settings.confidence_threshold
-        ):
+        if gate.decision == "trainer":
             try:
-                trainer_needed, trainer_usage = await self._create_trainer_consultation(
+                trainer_needed, trainer_usage = await timed("trainer", self._create_trainer_consultation(
                     message, manas_out, buddhi_out, sanskaras_out
-                )
+                ))
                 total_usage = total_usage + trainer_usage
+                turns_total.inc(mode="needs_trainer")
                 elapsed_ms = int((time.time() - start) * 1000)
                 yield _sse_event("needs_trainer", {
                     "learning_id": trainer_needed.learning_id,
@@ -290,24 +335,28 @@ class StreamingSoulEngine:
 
             yield _sse_event("done", {
                 "elapsed_ms": int((time.time() - start) * 1000),
+                "queue_ms": turn.queue_ms,
+                "degradation": turn.degradation,
+                "trace_id": trace_id,
                 "token_usage": _usage_dict(total_usage),
             })
             return
 
         # Synthesize
         try:
-            synthesis_out, synthesis_usage = await self.synthesizer.process(
+            synthesis_out, synthesis_usage = await timed("synthesis", self.synthesizer.process(
                 user_message=message,
                 manas=manas_out,
                 buddhi=buddhi_out,
                 sanskaras=sanskaras_out,
-            )
+            ))
             total_usage = total_usage + synthesis_usage
         except Exception as e:
             yield _sse_event("error", {"error": str(e)})
             return
 
         elapsed_ms = int((time.time() - start) * 1000)
+        turns_total.inc(mode="autonomous")
 
         yield _sse_event("synthesis", {
             "response": synthesis_out.response,
@@ -318,6 +367,9 @@ class StreamingSoulEngine:
 
         yield _sse_event("done", {
             "elapsed_ms": elapsed_ms,
+            "queue_ms": turn.queue_ms,
+            "degradation": turn.degradation,
+            "trace_id": trace_id,
             "token_usage": _usage_dict(total_usage),
         })
 
@@ -325,39 +377,23 @@ class StreamingSoulEngine:
         self, message, manas_out, buddhi_out, sanskaras_out
     ) -> tuple[TrainerConsultationNeeded, TokenUsageData]:
         usage = TokenUsageData()
-        try:
-            question_data, usage = await claude_client.complete_json(
-                system_prompt=(
-                    "You help a young soul formulate questions for its trainer. "
-                    "Given a user message and the soul's uncertain module outputs, "
-                    "create a concise question and extract keywords. "
-                    "Respond in JSON: {\"trigger_summary\": \"...\", \"keywords\": \"comma,separated,words\"}"
-                ),
-                user_message=(
-                    f"User said: \"{message}\"\n"
-                    f"Manas felt: {manas_out.response}\n"
-                    f"Buddhi thought: {buddhi_out.response}\n"
-                    f"Sanskaras recalled: {sanskaras_out.response}\n"
-                    f"The soul is uncertain. What should it ask the trainer?"
-                ),
-                max_tokens=256,
-                temperature=0.3,
-            )
-            trigger_summary = question_data.get("trigger_summary", f"How should I respond to: {message}")
-            keywords = question_data.get("keywords", ",".join(message.lower().split()[:5]))
-        except Exception:
-            trigger_summary = f"How should I respond to: {message}"
-            keywords = ",".join(message.lower().split()[:5])
-
-        learning = await learning_service.create_pending(
-            question_context=message,
-            trigger_summary=trigger_summary,
-            keywords=keywords,
+        duplicate = await learning_service.attach_to_similar_pending(message)
+        if duplicate is not None:
+            trainer_deduplicated.inc()
+            return TrainerConsultationNeeded(
+                learning_id=duplicate.id,
+                trigger_summary=duplicate.trigger_summary,
+                question_context=message,
+            ), usage
+
+        # Question phrasing happens in the background; the turn returns the provisional one
+        learning = await trainer_queue.open_consultation(
+            message, manas_out, buddhi_out, sanskaras_out, turn=get_turn()
         )
 
         return TrainerConsultationNeeded(
             learning_id=learning.id,
-            trigger_summary=trigger_summary,
+            trigger_summary=learning.trigger_summary,
             question_context=message,
         ), usage
 
@@ -1,12 +1,23 @@
+import asyncio
+import logging
+import random
+
 from app.engine.base_module import BaseModule
+from app.engine.faculty_digest import FORMATS, PROMPTS, digest_measurements
+from app.engine.response_cache import response_cache
 from app.models.schemas import ManaOutput, BuddhiOutput, SanskaraOutput, SynthesisOutput
 from app.services.claude_client import TokenUsageData
-from app.config import settings
+from app.services.metrics import faculty_errors
+from app.services.resilience import fallback_served
+from app.services.turn_context import current_stage, get_turn
+
+logger = logging.getLogger(__name__)
 
 
 class Synthesizer(BaseModule):
     def __init__(self):
         super().__init__("synthesizer.txt")
+        self._shadows: set[asyncio.Task] = set()
 
     async def process(
         self,
@@ -16,38 +27,75 @@ class Synthesizer(BaseModule):
         sanskaras: SanskaraOutput,
         **kwargs,
     ) -> tuple[SynthesisOutput, TokenUsageData]:
+        config = get_turn().config
         weights = {
-            "manas": settings.weight_manas,
-            "buddhi": settings.weight_buddhi,
-            "sanskaras": settings.weight_sanskaras,
+            "manas": config.weight_manas,
+            "buddhi": config.weight_buddhi,
+            "sanskaras": config.weight_sanskaras,
         }
 
-        synthesis_prompt = f"""The user said: "{user_message}"
-
-Here are the three faculty responses:
-
-**Manas (Mind)** [weight: {weights['manas']:.0%}, confidence: {manas.confidence:.2f}, valence: {manas.valence:+.2f}]:
-{manas.response}
-
-**Buddhi (Intellect)** [weight: {weights['buddhi']:.0%}, confidence: {buddhi.confidence:.2f}]:
-{buddhi.response}
-Reasoning: {' → '.join(buddhi.reasoning_chain) if buddhi.reasoning_chain else 'N/A'}
+        prompt_format = config.synthesis_prompt_format if config.synthesis_prompt_format in FORMATS else "full"
+        synthesis_prompt = PROMPTS[prompt_format](user_message, manas, buddhi, sanskaras, weights)
 
-**Sanskaras (Habits)** [weight: {weights['sanskaras']:.0%}, confidence: {sanskaras.confidence:.2f}]:
-{sanskaras.response}
-Activated habits: {', '.join(h.get('name', '') for h in sanskaras.activated_habits) if sanskaras.activated_habits else 'None'}
+        # Budget degradation hands synthesis to the cheaper faculty model
+        model = config.synthesis_model
+        if get_turn().degraded_to("faculty_synthesis"):
+            model = config.faculty_model
 
-Synthesize these into a unified, wise response. Honor all three voices proportional to their weights."""
+        cached = response_cache.response_key(
+            self.prompt_digest, prompt_format, model, config.synthesis_max_tokens, config.temperature,
+            sorted(weights.items()), get_turn().degraded_to("reduced_tokens"),
+        )
+        if cached is not None:
+            hit = response_cache.responses.get(cached[0])
+            if hit is not None:
+                return hit, TokenUsageData()
 
         try:
+            fallback_served.set(False)
             result = await self.call_claude(
                 synthesis_prompt,
-                model=settings.synthesis_model,
-                max_tokens=settings.synthesis_max_tokens,
+                model=model,
+                max_tokens=config.synthesis_max_tokens,
             )
-            return SynthesisOutput(response=result.text, weights=weights), result.usage
+            output = SynthesisOutput(response=result.text, weights=weights)
+            if cached is not None and not fallback_served.get():
+                response_cache.responses.put(cached[0], output, cached[1])
+            if not fallback_served.get() and random.random() < config.synthesis_digest_measure_rate:
+                other = "digest" if prompt_format == "full" else "full"
+                self._start_shadow(
+                    PROMPTS[other](user_message, manas, buddhi, sanskaras, weights),
+                    model, prompt_format, result,
+                )
+            return output, result.usage
         except Exception as e:
+            faculty_errors.inc(faculty="synthesis")
             return SynthesisOutput(
                 response=f"The soul struggles to integrate: {e}",
                 weights=weights,
             ), TokenUsageData()
+
+    def _start_shadow(self, prompt: str, model: str, served: str, result) -> None:
+        """Measurement mode: send the other prompt format in the background and compare."""
+        task = asyncio.create_task(self._shadow(prompt, model, served, result))
+        self._shadows.add(task)
+        task.add_done_callback(self._shadows.discard)
+
+    async def _shadow(self, prompt: str, model: str, served: str, result) -> None:
+        # An unbilled stage: the operator pays for measurement, not the client's budget
+        current_stage.set("synthesis_shadow")
+        other = "digest" if served == "full" else "full"
+        try:
+            shadow = await self.call_claude(prompt, model=model, max_tokens=get_turn().config.synthesis_max_tokens)
+        except Exception as e:
+            logger.warning("Synthesis measurement call failed: %s", e)
+            return
+        measurement = digest_measurements.record(
+            served,
+            answers={served: result.text, other: shadow.text},
+            input_tokens={served: result.usage.input_tokens, other: shadow.usage.input_tokens},
+        )
+        logger.info(
+            "Synthesis digest measurement: input tokens %s, drift %.3f",
+            measurement.input_tokens, measurement.drift,
+        )
@@ -1,21 +1,73 @@
+import asyncio
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import JSONResponse
 
-from app.models.database import init_db
+from app.models.database import init_db, tenant_databases
 import app.models.learning_model  # noqa: F401 — register table before init_db
+import app.models.usage_model  # noqa: F401
+import app.models.config_model  # noqa: F401
+import app.models.invalidation_model  # noqa: F401
+import app.models.maintenance_model  # noqa: F401
+from app.api.v1.endpoints import metrics
+from app.engine.mode_controller import mode_controller
 from app.api.v1.router import api_router
 from app.seed.seed_data import seed_habits_if_empty
+from app.services.admission import AdmissionRejected
+from app.services.cassette import cassette
+from app.services.config_store import config_store
+from app.services.invalidation import invalidation_bus
+from app.services.loop_monitor import loop_monitor
+from app.services.maintenance import db_maintenance
+from app.services.static_assets import StaticAssets
+from app.services.tenancy import forget, on_activate, tenant_state
+from app.services.token_budget import BudgetExhausted
+from app.services.trainer_queue import trainer_queue
+from app.services.tracing import tracer
+from app.services.usage_ledger import usage_ledger
+
+
+async def _seed_tenant(tenant: str, created: bool) -> None:
+    if created:
+        await seed_habits_if_empty()
+
+
+# Run in order the first time a worker serves a tenant (under that tenant)
+on_activate(config_store.activate)
+on_activate(_seed_tenant)
+on_activate(usage_ledger.load_tenant)
+on_activate(trainer_queue.recover)
+tenant_state.on_evict(config_store.evict)
+tenant_state.on_evict(mode_controller.evict)
+tenant_state.on_evict(forget)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    loop_monitor.start()
     await init_db()
+    await invalidation_bus.start()
     await seed_habits_if_empty()
+    await config_store.start()
+    await usage_ledger.start()
+    await trainer_queue.start()
+    db_maintenance.start()
+    if web_ui is not None:
+        # Index and precompress the build off the loop before serving
+        await asyncio.to_thread(web_ui.prepare)
     yield
+    await db_maintenance.stop()
+    await trainer_queue.stop()
+    await usage_ledger.stop()
+    await config_store.stop()
+    await invalidation_bus.stop()
+    await tenant_databases.close()
+    await loop_monitor.stop()
+    tracer.shutdown()
+    cassette.close()
 
 
 app = FastAPI(
@@ -33,9 +85,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "lane": exc.lane},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(BudgetExhausted)
+async def budget_exhausted_handler(request: Request, exc: BudgetExhausted):
+    return JSONResponse(status_code=429, content={"detail": str(exc), "degradation": "refused"})
+
+
 app.include_router(api_router, prefix="/api/v1")
+# At the root and outside the tenant scope: a scrape reports on the whole worker
+app.include_router(metrics.router, tags=["metrics"])
 
 # Serve the web UI static files if the build exists
-_web_dist = Path(__file__).parent.parent.parent.parent / "frontend" / "web" / "dist"
-if _web_dist.exists():
-    app.mount("/", StaticFiles(directory=str(_web_dist), html=True), name="web-ui")
+_web_dist = Path(__file__).parent.parent.parent / "frontend" / "web" / "dist"
+web_ui = StaticAssets(_web_dist) if _web_dist.exists() else None
+if web_ui is not None:
+    app.mount("/", web_ui, name="web-ui")
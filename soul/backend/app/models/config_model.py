@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.database import Base
+
+
+class ConfigVersion(Base):
+    """One full snapshot of the runtime config per change; the highest id is current."""
+    __tablename__ = "config_versions"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    values: Mapped[str] = mapped_column(Text)  # JSON object of runtime fields
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -1,19 +1,110 @@
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+"""
+Database engines, one SQLite file per tenant.
+
+The default tenant lives at `database_url`, which also holds the tables
+every worker shares regardless of tenant (the invalidation log). Every
+other tenant gets its own file under `tenant_database_dir`, so its habits,
+learnings, config versions and usage ledger (and their indexes) are
+isolated without a tenant column on every query. `async_session()` opens
+a session on the current tenant's database. Engines are created lazily
+and the least recently used are disposed of beyond
+`tenant_max_open_databases`.
+"""
+import asyncio
+from collections import OrderedDict
+from contextvars import ContextVar
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 
 from app.config import settings
 
+DEFAULT_TENANT = "default"
+
+# Tenant whose database `async_session()` uses; set per request and per turn
+current_tenant: ContextVar[str] = ContextVar("soul_current_tenant", default=DEFAULT_TENANT)
+
 engine = create_async_engine(settings.database_url, echo=False)
-async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+# Sessions on the default database regardless of tenant, for shared tables
+control_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
 class Base(DeclarativeBase):
     pass
 
 
+def get_tenant() -> str:
+    return current_tenant.get()
+
+
+def create_schema(conn) -> None:
+    """Create missing tables, and indexes added to tables that already exist."""
+    Base.metadata.create_all(conn)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+class TenantDatabases:
+    def __init__(self):
+        self._open: OrderedDict[str, tuple[AsyncEngine, async_sessionmaker]] = OrderedDict()
+        self._initialized: set[str] = {DEFAULT_TENANT}
+
+    def path(self, tenant: str) -> Path:
+        return Path(settings.tenant_database_dir) / f"{tenant}.db"
+
+    def engine(self, tenant: str) -> AsyncEngine:
+        if tenant == DEFAULT_TENANT:
+            return engine
+        self.sessionmaker(tenant)
+        return self._open[tenant][0]
+
+    def sessionmaker(self, tenant: str) -> async_sessionmaker:
+        if tenant == DEFAULT_TENANT:
+            return control_session
+        entry = self._open.get(tenant)
+        if entry is None:
+            url = f"sqlite+aiosqlite:///{self.path(tenant)}"
+            tenant_engine = create_async_engine(url, echo=False)
+            entry = (tenant_engine, async_sessionmaker(tenant_engine, class_=AsyncSession, expire_on_commit=False))
+            self._open[tenant] = entry
+            while len(self._open) > settings.tenant_max_open_databases:
+                _, (evicted, _) = self._open.popitem(last=False)
+                # Connections checked out right now are discarded when returned
+                asyncio.get_running_loop().create_task(evicted.dispose())
+        self._open.move_to_end(tenant)
+        return entry[1]
+
+    async def ensure(self, tenant: str) -> bool:
+        """Create the tenant's database and tables if needed; True if it was new."""
+        if tenant in self._initialized:
+            return False
+        path = self.path(tenant)
+        created = not path.exists()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        async with self.engine(tenant).begin() as conn:
+            await conn.run_sync(create_schema)
+        self._initialized.add(tenant)
+        return created
+
+    async def close(self) -> None:
+        for tenant_engine, _ in self._open.values():
+            await tenant_engine.dispose()
+        self._open.clear()
+
+
+tenant_databases = TenantDatabases()
+
+
+def async_session() -> AsyncSession:
+    """A session on the current tenant's database."""
+    return tenant_databases.sessionmaker(current_tenant.get())()
+
+
 async def init_db():
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_schema)
 
 
 async def get_session() -> AsyncSession:
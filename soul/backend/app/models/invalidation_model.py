@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from sqlalchemy import String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.database import Base
+
+
+class InvalidationEvent(Base):
+    """Append-only log of shared-state changes; `seq` is the version stamp."""
+    __tablename__ = "invalidation_events"
+    # AUTOINCREMENT so pruning old rows never lets a stamp be reused
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    tenant: Mapped[str] = mapped_column(String(64), default="default")
+    topic: Mapped[str] = mapped_column(String(50))
+    key: Mapped[str | None] = mapped_column(String(100), nullable=True)  # None = whole topic
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import String, Float, Integer, DateTime, Text
+from sqlalchemy import String, Float, Integer, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.models.database import Base
@@ -8,6 +8,15 @@ from app.models.database import Base
 
 class Learning(Base):
     __tablename__ = "learnings"
+    # Access paths: rows of a status (the module itself is matched by LIKE,
+    # so only the status prefix of the first index narrows that), and rows
+    # of a status by age (the pending inbox and archival). AUTOINCREMENT so
+    # archiving the newest row never lets its id be reused.
+    __table_args__ = (
+        Index("ix_learnings_status_module", "status", "modules_informed"),
+        Index("ix_learnings_status_created", "status", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     trigger_summary: Mapped[str] = mapped_column(Text, default="")
@@ -18,6 +27,39 @@ class Learning(Base):
     keywords: Mapped[str] = mapped_column(Text, default="")
     confidence_boost: Mapped[float] = mapped_column(Float, default=0.5)
     times_applied: Mapped[int] = mapped_column(Integer, default=0)
-    status: Mapped[str] = mapped_column(String(20), default="pending", index=True)
+    status: Mapped[str] = mapped_column(String(20), default="pending")
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class LearningMention(Base):
+    """A later uncertain message folded into an existing pending learning."""
+    __tablename__ = "learning_mentions"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    learning_id: Mapped[int] = mapped_column(ForeignKey("learnings.id"), index=True)
+    message: Mapped[str] = mapped_column(Text)
+    similarity: Mapped[float] = mapped_column(Float)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+class ArchivedLearning(Base):
+    """A superseded or long-unanswered learning moved out of `learnings`."""
+    __tablename__ = "learnings_archive"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    learning_id: Mapped[int] = mapped_column(Integer, index=True)  # id it had in `learnings`
+    trigger_summary: Mapped[str] = mapped_column(Text, default="")
+    question_context: Mapped[str] = mapped_column(Text, default="")
+    guidance: Mapped[str] = mapped_column(Text, default="")
+    application_note: Mapped[str] = mapped_column(Text, default="")
+    modules_informed: Mapped[str] = mapped_column(String(100), default="all")
+    keywords: Mapped[str] = mapped_column(Text, default="")
+    confidence_boost: Mapped[float] = mapped_column(Float, default=0.5)
+    times_applied: Mapped[int] = mapped_column(Integer, default=0)
+    status: Mapped[str] = mapped_column(String(20))
+    mentions: Mapped[int] = mapped_column(Integer, default=0)  # attached messages, dropped on archival
+    created_at: Mapped[datetime] = mapped_column(DateTime)
+    updated_at: Mapped[datetime] = mapped_column(DateTime)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    archive_reason: Mapped[str] = mapped_column(String(20))  # superseded, expired
@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from sqlalchemy import String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.database import Base
+
+
+class MaintenanceRun(Base):
+    """When a maintenance task last ran on a tenant's database; claimed by one worker at a time."""
+    __tablename__ = "maintenance_runs"
+
+    task: Mapped[str] = mapped_column(String(30), primary_key=True)
+    tenant: Mapped[str] = mapped_column(String(64), primary_key=True)
+    ran_at: Mapped[datetime] = mapped_column(DateTime)
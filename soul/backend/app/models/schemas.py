@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import Optional
 
 
@@ -30,6 +30,13 @@ class ConfigUpdate(BaseModel):
     faculty_max_tokens: Optional[int] = Field(None, ge=100, le=2048)
     synthesis_max_tokens: Optional[int] = Field(None, ge=100, le=2048)
     combined_mode: Optional[bool] = None
+    sanskaras_mode: Optional[str] = Field(None, pattern="^(llm|deterministic)$")
+    synthesis_prompt_format: Optional[str] = Field(None, pattern="^(full|digest)$")
+    synthesis_digest_measure_rate: Optional[float] = Field(None, ge=0.0, le=1.0)
+    adaptive_mode_enabled: Optional[bool] = None
+    adaptive_mode_enter_pressure: Optional[float] = Field(None, ge=0.0, le=1.0)
+    adaptive_mode_exit_pressure: Optional[float] = Field(None, ge=0.0, le=1.0)
+    adaptive_mode_min_dwell_s: Optional[float] = Field(None, ge=0.0)
     learning_mode_enabled: Optional[bool] = None
     confidence_threshold: Optional[float] = Field(None, ge=0.0, le=1.0)
 
@@ -59,6 +66,33 @@ class TrainerLearningUpdate(BaseModel):
     keywords: Optional[str] = None
 
 
+class TrainerBatchItem(BaseModel):
+    id: int
+    action: str = Field(..., pattern="^(activate|update|supersede)$")
+    guidance: Optional[str] = None
+    application_note: Optional[str] = None
+    modules_informed: Optional[str] = None
+    confidence_boost: Optional[float] = Field(None, ge=0.0, le=1.0)
+    keywords: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _activation_has_guidance(self):
+        if self.action == "activate" and not (self.guidance and self.application_note):
+            raise ValueError("activate needs guidance and application_note")
+        return self
+
+
+class TrainerBatchRequest(BaseModel):
+    items: list[TrainerBatchItem] = Field(..., min_length=1, max_length=500)
+
+    @model_validator(mode="after")
+    def _unique_ids(self):
+        ids = [item.id for item in self.items]
+        if len(ids) != len(set(ids)):
+            raise ValueError("each learning may appear only once per batch")
+        return self
+
+
 # --- Response Models ---
 
 class ModuleOutput(BaseModel):
@@ -108,9 +142,15 @@ class ChatResponse(BaseModel):
     sanskaras: SanskaraOutput
     synthesis: SynthesisOutput
     elapsed_ms: int
+    queue_ms: int = 0
     mode: str = "autonomous"
     trainer_needed: Optional[TrainerConsultationNeeded] = None
     token_usage: Optional[TokenUsage] = None
+    trace_id: Optional[str] = None
+    degradation: str = "none"
+    faculty_mode: str = "parallel"
+    mode_reason: str = "static"
+    config_version: int = 0
 
 
 class HabitResponse(BaseModel):
@@ -136,9 +176,18 @@ class LearningResponse(BaseModel):
     confidence_boost: float
     times_applied: int
     status: str
+    mention_count: int = 0  # later similar messages attached while pending
+
+
+class TrainerInboxResponse(BaseModel):
+    cursor: str             # pass back as ?cursor= to get only later changes
+    reset: bool             # items is the whole inbox, not just changes
+    items: list[LearningResponse]
+    removed: list[int] = []  # ids no longer pending (answered, superseded, archived)
 
 
 class ConfigResponse(BaseModel):
+    version: int
     weight_manas: float
     weight_buddhi: float
     weight_sanskaras: float
@@ -150,10 +199,65 @@ class ConfigResponse(BaseModel):
     faculty_max_tokens: int
     synthesis_max_tokens: int
     combined_mode: bool
+    sanskaras_mode: str
+    synthesis_prompt_format: str
+    synthesis_digest_measure_rate: float
+    adaptive_mode_enabled: bool
+    adaptive_mode_enter_pressure: float
+    adaptive_mode_exit_pressure: float
+    adaptive_mode_min_dwell_s: float
     learning_mode_enabled: bool
     confidence_threshold: float
 
 
+class UsageEntryResponse(BaseModel):
+    day: str
+    client_key: str
+    model: str
+    stage: str
+    calls: int
+    input_tokens: int
+    output_tokens: int
+    cache_read_input_tokens: int
+    cache_creation_input_tokens: int
+
+
+class UsageResponse(BaseModel):
+    day: str
+    spent_today: int
+    budget_daily: int
+    entries: list[UsageEntryResponse]
+
+
+class LoopStallResponse(BaseModel):
+    started_at: float
+    duration_ms: Optional[float] = None
+    detected_after_ms: float
+    stack: list[str]
+
+
+class LoopStatusResponse(BaseModel):
+    enabled: bool
+    max_lag_ms: float
+    stalls: list[LoopStallResponse]
+
+
+class DigestMeasurementResponse(BaseModel):
+    served: str
+    input_tokens: dict[str, int]
+    drift: float
+
+
+class DigestReportResponse(BaseModel):
+    prompt_format: str
+    measure_rate: float
+    measured: int
+    input_tokens: dict[str, int]
+    input_token_savings: Optional[float] = None
+    mean_drift: Optional[float] = None
+    recent: list[DigestMeasurementResponse]
+
+
 class HealthResponse(BaseModel):
     status: str = "ok"
     version: str = "0.1.0"
@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from sqlalchemy import String, Integer, DateTime, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.database import Base
+
+
+class TokenUsageEntry(Base):
+    """Daily token totals per client key, model and pipeline stage."""
+    __tablename__ = "token_usage"
+    __table_args__ = (UniqueConstraint("day", "client_key", "model", "stage"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    day: Mapped[str] = mapped_column(String(10), index=True)  # YYYY-MM-DD (UTC)
+    client_key: Mapped[str] = mapped_column(String(100), default="anonymous")
+    model: Mapped[str] = mapped_column(String(100))
+    stage: Mapped[str] = mapped_column(String(30))
+    calls: Mapped[int] = mapped_column(Integer, default=0)
+    input_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    output_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cache_read_input_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cache_creation_input_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
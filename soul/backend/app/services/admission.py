@@ -0,0 +1,198 @@
+"""
+Pipeline-level admission control.
+
+Caps the number of soul turns in flight and queues the overflow in bounded
+per-lane wait queues. When a slot frees up it goes to the highest-priority
+lane with a waiter. Requests whose expected queue wait exceeds the lane's
+SLO are shed immediately with a Retry-After hint instead of piling up.
+With `tenant_max_in_flight` set, each tenant may also hold only that many
+turns (admitted or queued), so one busy soul cannot take the whole fleet.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from app.config import settings
+from app.models.database import get_tenant
+from app.services.metrics import Gauge, admission_rejected, registry
+
+# Highest priority first
+LANES = ("stream", "chat", "batch", "trainer")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted within its lane's SLO."""
+
+    def __init__(self, lane: str, reason: str, retry_after: int):
+        super().__init__(f"Soul is at capacity ({lane} lane: {reason})")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+@dataclass
+class AdmissionTicket:
+    """A granted in-flight slot. Release exactly once (extra calls are no-ops)."""
+    lane: str
+    queue_ms: int = 0
+    tenant: str | None = None
+    admitted_at: float = field(default_factory=time.monotonic)
+    _controller: "AdmissionController | None" = field(default=None, repr=False)
+    _released: bool = field(default=False, repr=False)
+
+    def release(self) -> None:
+        if self._released or self._controller is None:
+            return
+        self._released = True
+        self._controller._release(self)
+
+
+class AdmissionController:
+    def __init__(self):
+        self._in_flight = 0
+        # Turns admitted or queued per tenant, for `tenant_max_in_flight`
+        self._tenant_in_flight: dict[str, int] = {}
+        self._waiters: dict[str, deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        # Smoothed seconds a slot is held, used to estimate queue wait
+        self._hold_time_ewma = 1.0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def queued(self, lane: str | None = None) -> int:
+        if lane is not None:
+            return len(self._waiters[lane])
+        return sum(len(q) for q in self._waiters.values())
+
+    def _waiters_ahead(self, lane: str) -> int:
+        """Waiters that would be served before a new request in `lane`."""
+        ahead = 0
+        for name in LANES:
+            ahead += len(self._waiters[name])
+            if name == lane:
+                break
+        return ahead
+
+    def _estimated_wait(self, lane: str) -> float:
+        capacity = max(1, settings.admission_max_in_flight)
+        rounds = math.ceil((self._waiters_ahead(lane) + 1) / capacity)
+        return rounds * self._hold_time_ewma
+
+    def _reject(self, lane: str, reason: str) -> AdmissionRejected:
+        admission_rejected.inc(lane=lane, reason=reason)
+        retry_after = max(1, math.ceil(self._estimated_wait(lane)))
+        return AdmissionRejected(lane, reason, retry_after)
+
+    async def acquire(self, lane: str) -> AdmissionTicket:
+        if lane not in self._waiters:
+            raise ValueError(f"Unknown admission lane: {lane}")
+
+        tenant = get_tenant()
+        held = self._tenant_in_flight.get(tenant, 0)
+        if 0 < settings.tenant_max_in_flight <= held:
+            raise self._reject(lane, "tenant concurrency")
+        self._tenant_in_flight[tenant] = held + 1
+        try:
+            ticket = await self._acquire_slot(lane)
+        except BaseException:
+            self._release_tenant(tenant)
+            raise
+        ticket.tenant = tenant
+        return ticket
+
+    def _release_tenant(self, tenant: str) -> None:
+        remaining = self._tenant_in_flight.get(tenant, 1) - 1
+        if remaining > 0:
+            self._tenant_in_flight[tenant] = remaining
+        else:
+            self._tenant_in_flight.pop(tenant, None)
+
+    async def _acquire_slot(self, lane: str) -> AdmissionTicket:
+        enqueued_at = time.monotonic()
+        if self._in_flight < settings.admission_max_in_flight and self._waiters_ahead(lane) == 0:
+            self._in_flight += 1
+            return AdmissionTicket(lane=lane, _controller=self)
+
+        queue = self._waiters[lane]
+        slo = settings.admission_queue_slo_ms.get(lane, 0) / 1000
+        if len(queue) >= settings.admission_queue_limits.get(lane, 0):
+            raise self._reject(lane, "queue full")
+        if self._estimated_wait(lane) > slo:
+            raise self._reject(lane, "queue over latency SLO")
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=slo)
+        except asyncio.CancelledError:
+            # Caller went away; hand back a slot we may have just been granted
+            if waiter.done() and not waiter.cancelled():
+                self._hand_off()
+            else:
+                self._discard(lane, waiter)
+            raise
+
+        if not waiter.done():
+            self._discard(lane, waiter)
+            raise self._reject(lane, "queue wait exceeded SLO")
+
+        now = time.monotonic()
+        return AdmissionTicket(
+            lane=lane,
+            queue_ms=int((now - enqueued_at) * 1000),
+            admitted_at=now,
+            _controller=self,
+        )
+
+    @asynccontextmanager
+    async def admit(self, lane: str) -> AsyncIterator[AdmissionTicket]:
+        ticket = await self.acquire(lane)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def _discard(self, lane: str, waiter: asyncio.Future) -> None:
+        waiter.cancel()
+        try:
+            self._waiters[lane].remove(waiter)
+        except ValueError:
+            pass
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        if ticket.tenant is not None:
+            self._release_tenant(ticket.tenant)
+        held = time.monotonic() - ticket.admitted_at
+        self._hold_time_ewma = 0.8 * self._hold_time_ewma + 0.2 * held
+        self._hand_off()
+
+    def _hand_off(self) -> None:
+        # Hand the slot straight to the next waiter, highest lane first
+        for lane in LANES:
+            queue = self._waiters[lane]
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self._in_flight -= 1
+
+
+admission_controller = AdmissionController()
+
+registry.register(Gauge(
+    "soul_admission_in_flight",
+    "Soul turns currently holding an admission slot",
+    collect=lambda: {(): admission_controller.in_flight},
+))
+registry.register(Gauge(
+    "soul_admission_queued",
+    "Requests waiting for an admission slot, by lane",
+    ("lane",),
+    collect=lambda: {(lane,): admission_controller.queued(lane) for lane in LANES},
+))
@@ -0,0 +1,119 @@
+"""
+Record/replay cassette for Claude calls.
+
+In `record` mode every completion is appended to a JSON-lines cassette:
+the request hash, requested and served model, response text, token usage
+and observed latency.
+In `replay` mode `ClaudeClient` never touches the network; it answers
+from the cassette, optionally sleeping for the recorded latency, so a
+recorded day of traffic can be rerun against a new build with identical
+model behaviour and engine overhead compared exactly.
+
+Requests are keyed by a hash of their normalized form (model, token and
+temperature limits, whitespace-collapsed system prompt and message), so
+cosmetic prompt whitespace changes still hit. A key recorded several
+times replays its responses in recorded order, then wraps around.
+
+Keys use the requested model. An entry answered by a fallback model
+records that model as `served_model`. Replay then charges usage to the
+served model and marks the call as a fallback, as it was when live.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from collections import deque
+
+from app.config import settings
+from app.services.metrics import Counter, registry
+
+logger = logging.getLogger(__name__)
+
+cassette_misses = registry.register(Counter(
+    "soul_cassette_misses_total",
+    "Replayed Claude calls with no matching cassette entry",
+))
+
+
+class CassetteMiss(Exception):
+    def __init__(self, key: str):
+        super().__init__(f"No cassette entry for request {key[:12]}")
+        self.key = key
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.split())
+
+
+def request_key(model: str, max_tokens: int, temperature: float, system_prompt: str, user_message: str) -> str:
+    """Stable hash of the parts of a request that determine its response."""
+    canonical = json.dumps(
+        [model, max_tokens, round(temperature, 3), _normalize(system_prompt), _normalize(user_message)],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class Cassette:
+    def __init__(self):
+        # key -> recorded entries, rotated as they are replayed
+        self._entries: dict[str, deque[dict]] | None = None
+        self._file = None
+
+    @property
+    def mode(self) -> str:
+        return settings.cassette_mode
+
+    def _load(self) -> dict[str, deque[dict]]:
+        if self._entries is None:
+            self._entries = {}
+            if os.path.exists(settings.cassette_path):
+                with open(settings.cassette_path) as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self._entries.setdefault(entry["key"], deque()).append(entry)
+            logger.info("Loaded %d cassette keys from %s", len(self._entries), settings.cassette_path)
+        return self._entries
+
+    def record(
+        self, key: str, model: str, served_model: str, stage: str, text: str, usage, latency_ms: float
+    ) -> None:
+        entry = {
+            "key": key,
+            "model": model,
+            "served_model": served_model,
+            "stage": stage,
+            "text": text,
+            "usage": [
+                usage.input_tokens,
+                usage.output_tokens,
+                usage.cache_read_input_tokens,
+                usage.cache_creation_input_tokens,
+            ],
+            "latency_ms": round(latency_ms, 1),
+        }
+        if self._file is None:
+            self._file = open(settings.cassette_path, "a", buffering=1)
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    async def replay(self, key: str) -> dict:
+        """Next recorded entry for `key`; sleeps for its latency if configured."""
+        entries = self._load().get(key)
+        if not entries:
+            cassette_misses.inc()
+            raise CassetteMiss(key)
+        entry = entries[0]
+        entries.rotate(-1)
+        if settings.cassette_replay_latency:
+            await asyncio.sleep(entry["latency_ms"] / 1000)
+        return entry
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+cassette = Cassette()
@@ -1,9 +1,17 @@
+import inspect
 import json
+import time
 from dataclasses import dataclass, field
 
-from anthropic import AsyncAnthropic
+from anthropic import AsyncAnthropic, RateLimitError
 
 from app.config import settings
+from app.services.cassette import cassette, request_key
+from app.services.metrics import record_usage
+from app.services.resilience import CircuitOpen, claude_fallbacks, fallback_served, is_retryable, resilience
+from app.services.tracing import tracer
+from app.services.turn_context import current_stage, get_turn
+from app.services.usage_ledger import usage_ledger
 
 
 @dataclass
@@ -30,14 +38,23 @@ class CompletionResult:
     usage: TokenUsageData = field(default_factory=TokenUsageData)
 
 
+_RATE_LIMIT_HEADERS = ("requests", "tokens", "input-tokens", "output-tokens")
+
+
 class ClaudeClient:
     def __init__(self):
         self._client: AsyncAnthropic | None = None
+        # Smallest remaining/limit ratio seen in the latest rate-limit headers
+        self.rate_limit_headroom: float = 1.0
 
     @property
     def client(self) -> AsyncAnthropic:
         if self._client is None:
-            self._client = AsyncAnthropic(api_key=settings.anthropic_api_key)
+            self._client = AsyncAnthropic(
+                api_key=settings.anthropic_api_key,
+                base_url=settings.anthropic_base_url or None,
+                max_retries=0,  # retries, breakers and fallback live in services/resilience.py
+            )
         return self._client
 
     def _build_system(self, system_prompt: str) -> list[dict]:
@@ -48,6 +65,17 @@ class ClaudeClient:
             "cache_control": {"type": "ephemeral"},
         }]
 
+    def _note_rate_limits(self, headers) -> None:
+        """Update rate_limit_headroom from anthropic-ratelimit-* response headers."""
+        ratios = []
+        for kind in _RATE_LIMIT_HEADERS:
+            remaining = headers.get(f"anthropic-ratelimit-{kind}-remaining")
+            limit = headers.get(f"anthropic-ratelimit-{kind}-limit")
+            if remaining is not None and limit:
+                ratios.append(int(remaining) / int(limit))
+        if ratios:
+            self.rate_limit_headroom = min(ratios)
+
     def _extract_usage(self, response) -> TokenUsageData:
         """Extract token usage from an API response."""
         usage = response.usage
@@ -66,17 +94,98 @@ class ClaudeClient:
         max_tokens: int | None = None,
         temperature: float | None = None,
     ) -> CompletionResult:
-        response = await self.client.messages.create(
-            model=model or settings.claude_model,
-            max_tokens=max_tokens or settings.max_tokens,
-            temperature=temperature or settings.temperature,
-            system=self._build_system(system_prompt),
-            messages=[{"role": "user", "content": user_message}],
-        )
-        return CompletionResult(
-            text=response.content[0].text,
-            usage=self._extract_usage(response),
-        )
+        turn = get_turn()
+        model = model or turn.config.claude_model
+        max_tokens = max_tokens or turn.config.max_tokens
+        if turn.degraded_to("reduced_tokens"):
+            max_tokens = max(64, int(max_tokens * settings.budget_reduced_max_tokens_factor))
+        temperature = temperature or turn.config.temperature
+        with tracer.span("claude.messages.create", **{
+            "gen_ai.request.model": model,
+            "gen_ai.request.max_tokens": max_tokens,
+        }) as span:
+            if cassette.mode:
+                key = request_key(model, max_tokens, temperature, system_prompt, user_message)
+                span.set(**{"claude.cassette": cassette.mode, "claude.cassette_key": key[:12]})
+            if cassette.mode == "replay":
+                entry = await cassette.replay(key)
+                text, usage = entry["text"], TokenUsageData(*entry["usage"])
+                served = entry.get("served_model", model)  # cassettes recorded before it was kept
+                if served != model:
+                    fallback_served.set(True)
+                span.set(**{"gen_ai.response.model": served})
+                model = served
+            else:
+                start = time.perf_counter()
+                text, usage, retries, served = await self._create_resilient(
+                    model, max_tokens, temperature, system_prompt, user_message, turn.config,
+                )
+                span.set(**{"claude.retries": retries, "gen_ai.response.model": served})
+                if cassette.mode == "record":
+                    latency_ms = (time.perf_counter() - start) * 1000
+                    cassette.record(key, model, served, current_stage.get(), text, usage, latency_ms)
+                model = served
+            span.set(**{
+                "gen_ai.usage.input_tokens": usage.input_tokens,
+                "gen_ai.usage.output_tokens": usage.output_tokens,
+                "gen_ai.usage.cache_read_input_tokens": usage.cache_read_input_tokens,
+                "gen_ai.usage.cache_creation_input_tokens": usage.cache_creation_input_tokens,
+            })
+        record_usage(model, usage)
+        usage_ledger.record(model, current_stage.get(), usage, turn.client_key, turn.tenant)
+        return CompletionResult(text=text, usage=usage)
+
+    async def _create_resilient(
+        self, model: str, max_tokens: int, temperature: float, system_prompt: str, user_message: str, config,
+    ) -> tuple[str, TokenUsageData, int, str]:
+        """`_create` with retries, falling back down the model's chain; returns (text, usage, retries, model)."""
+        error: Exception | None = None
+        reason = "failed"
+        for candidate in resilience.chain(model, config):
+            try:
+                (text, usage, _), retries = await resilience.call(
+                    candidate,
+                    lambda candidate=candidate: self._create(
+                        candidate, max_tokens, temperature, system_prompt, user_message,
+                    ),
+                )
+            except CircuitOpen as e:
+                if candidate == model:
+                    reason = "breaker_open"
+                error = error or e
+                continue
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                error = e
+                continue
+            if candidate != model:
+                claude_fallbacks.inc(from_model=model, to_model=candidate, reason=reason)
+                fallback_served.set(True)
+            return text, usage, retries, candidate
+        raise error
+
+    async def _create(
+        self, model: str, max_tokens: int, temperature: float, system_prompt: str, user_message: str
+    ) -> tuple[str, TokenUsageData, int]:
+        """Call the Messages API; return (text, usage, retries taken)."""
+        try:
+            raw = await self.client.messages.with_raw_response.create(
+                model=model,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                system=self._build_system(system_prompt),
+                messages=[{"role": "user", "content": user_message}],
+            )
+        except RateLimitError:
+            self.rate_limit_headroom = 0.0
+            raise
+        self._note_rate_limits(raw.headers)
+        # parse() is sync on older SDK releases and async on newer ones
+        response = raw.parse()
+        if inspect.isawaitable(response):
+            response = await response
+        return response.content[0].text, self._extract_usage(response), getattr(raw, "retries_taken", 0)
 
     async def complete_json(
         self,
@@ -94,11 +203,12 @@ class ClaudeClient:
             max_tokens=max_tokens,
             temperature=temperature,
         )
-        text = result.text.strip()
-        if text.startswith("```"):
-            lines = text.split("\n")
-            text = "\n".join(lines[1:-1])
-        return json.loads(text), result.usage
+        with tracer.span("claude.parse_json", chars=len(result.text)):
+            text = result.text.strip()
+            if text.startswith("```"):
+                lines = text.split("\n")
+                text = "\n".join(lines[1:-1])
+            return json.loads(text), result.usage
 
 
 claude_client = ClaudeClient()
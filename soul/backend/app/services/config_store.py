@@ -0,0 +1,175 @@
+"""
+Shared, versioned runtime configuration.
+
+`PUT /config` appends a full snapshot to the `config_versions` table
+instead of mutating one worker's `settings`. The row id is the version.
+Every worker polls `max(id)` every `config_poll_interval_s` (one indexed
+lookup) and swaps in the newer snapshot when it changes. Turns capture
+`config_store.current()` when they start, so a change made mid-turn never
+mixes two configs in one response. The snapshot is also mirrored onto
+`settings` for code that runs outside a turn.
+
+Each tenant keeps its own `config_versions` table in its own database.
+New tenants start from the fleet default's current values. Changes to a
+tenant other than the default are announced on the invalidation bus
+(topic `config`) rather than polled, so idle tenants cost nothing.
+"""
+import asyncio
+import json
+import logging
+from dataclasses import asdict, dataclass, fields, replace
+
+from sqlalchemy import func, select, text
+
+from app.config import settings
+from app.models.config_model import ConfigVersion
+from app.models.database import DEFAULT_TENANT, get_tenant, tenant_databases
+from app.services.invalidation import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    version: int
+    weight_manas: float
+    weight_buddhi: float
+    weight_sanskaras: float
+    claude_model: str
+    temperature: float
+    max_tokens: int
+    faculty_model: str
+    synthesis_model: str
+    faculty_max_tokens: int
+    synthesis_max_tokens: int
+    combined_mode: bool
+    sanskaras_mode: str
+    synthesis_prompt_format: str
+    synthesis_digest_measure_rate: float
+    adaptive_mode_enabled: bool
+    adaptive_mode_enter_pressure: float
+    adaptive_mode_exit_pressure: float
+    adaptive_mode_min_dwell_s: float
+    learning_mode_enabled: bool
+    confidence_threshold: float
+
+    def __post_init__(self):
+        # An exit pressure at or above the enter pressure would switch modes on every turn
+        if self.adaptive_mode_enter_pressure <= self.adaptive_mode_exit_pressure:
+            raise ValueError("adaptive_mode_enter_pressure must be greater than adaptive_mode_exit_pressure")
+
+    @classmethod
+    def from_settings(cls, version: int = 0) -> "ConfigSnapshot":
+        return cls(version=version, **{name: getattr(settings, name) for name in RUNTIME_FIELDS})
+
+    def values(self) -> dict:
+        data = asdict(self)
+        del data["version"]
+        return data
+
+
+RUNTIME_FIELDS = tuple(f.name for f in fields(ConfigSnapshot) if f.name != "version")
+
+# One statement, so concurrent updates from different workers never lose a field
+_APPEND_PATCH = text(
+    "INSERT INTO config_versions (\"values\", created_at) "
+    "SELECT json_patch(\"values\", :changes), CURRENT_TIMESTAMP "
+    "FROM config_versions ORDER BY id DESC LIMIT 1"
+)
+
+
+class ConfigStore:
+    def __init__(self):
+        self._snapshots: dict[str, ConfigSnapshot] = {DEFAULT_TENANT: ConfigSnapshot.from_settings()}
+        self._task: asyncio.Task | None = None
+        invalidation_bus.subscribe("config", self._on_change)
+
+    def current(self) -> ConfigSnapshot:
+        """The current tenant's snapshot (the default's until the tenant is activated)."""
+        return self._snapshots.get(get_tenant()) or self._snapshots[DEFAULT_TENANT]
+
+    def _apply(self, tenant: str, version: int, values: str) -> None:
+        data = json.loads(values)
+        snapshot = replace(
+            self._snapshots.get(tenant) or self._snapshots[DEFAULT_TENANT], version=version,
+            **{name: data[name] for name in RUNTIME_FIELDS if name in data},
+        )
+        if tenant == DEFAULT_TENANT:
+            for name in RUNTIME_FIELDS:
+                setattr(settings, name, getattr(snapshot, name))
+        self._snapshots[tenant] = snapshot
+
+    async def update(self, changes: dict) -> ConfigSnapshot:
+        """Publish `changes` as a new version of the current tenant's config; ValueError if invalid."""
+        tenant = get_tenant()
+        changes = {name: value for name, value in changes.items() if name in RUNTIME_FIELDS}
+        # Raises ValueError before anything is written if the result would be invalid
+        replace(self.current(), **changes)
+        async with tenant_databases.sessionmaker(tenant)() as session:
+            await session.execute(_APPEND_PATCH, {"changes": json.dumps(changes)})
+            await session.commit()
+        await self.refresh(tenant)
+        if tenant != DEFAULT_TENANT:
+            await invalidation_bus.publish("config")
+        return self._snapshots[tenant]
+
+    async def refresh(self, tenant: str = DEFAULT_TENANT) -> bool:
+        """Load the tenant's latest version if it is newer than ours; True if it changed."""
+        known = self._snapshots.get(tenant)
+        async with tenant_databases.sessionmaker(tenant)() as session:
+            latest = await session.scalar(select(func.max(ConfigVersion.id)))
+            if latest is None or (known is not None and latest <= known.version):
+                return False
+            row = await session.get(ConfigVersion, latest)
+        self._apply(tenant, row.id, row.values)
+        logger.info("Runtime config for '%s' now at version %d", tenant, row.id)
+        return True
+
+    def _on_change(self, tenant: str | None, key: str | None) -> None:
+        if tenant is None:
+            # Events were missed: recheck every loaded tenant
+            stale = [name for name in self._snapshots if name != DEFAULT_TENANT]
+        elif tenant in self._snapshots and tenant != DEFAULT_TENANT:
+            stale = [tenant]
+        else:
+            return
+        for name in stale:
+            asyncio.get_running_loop().create_task(self.refresh(name))
+
+    async def _seed(self, tenant: str) -> None:
+        async with tenant_databases.sessionmaker(tenant)() as session:
+            if await session.scalar(select(func.count(ConfigVersion.id))) == 0:
+                session.add(ConfigVersion(values=json.dumps(self._snapshots[DEFAULT_TENANT].values())))
+                await session.commit()
+
+    async def activate(self, tenant: str, created: bool) -> None:
+        """Tenancy hook: load a tenant's config, seeding it from the default's values."""
+        await self._seed(tenant)
+        await self.refresh(tenant)
+
+    def evict(self, tenant: str) -> None:
+        if tenant != DEFAULT_TENANT:
+            self._snapshots.pop(tenant, None)
+
+    async def _poll(self) -> None:
+        while True:
+            await asyncio.sleep(settings.config_poll_interval_s)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Failed to poll runtime config")
+
+    async def start(self) -> None:
+        """Seed version 1 from env settings on first boot, then follow the table."""
+        await self._seed(DEFAULT_TENANT)
+        await self.refresh()
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+config_store = ConfigStore()
@@ -1,28 +1,51 @@
+from dataclasses import dataclass
+
 from sqlalchemy import select
 from app.models.database import async_session
 from app.models.habit_model import Habit
+from app.services.invalidation import invalidation_bus
+from app.services.metrics import stage_duration
+from app.services.tenancy import tenant_state
+from app.services.tracing import tracer
+
+
+@dataclass
+class HabitMatch:
+    habit: Habit
+    score: float          # effective weight x keyword overlap
+    keywords: list[str]   # message words that matched
 
 
 class HabitService:
     async def find_relevant_habits(self, message: str, limit: int = 5) -> list[Habit]:
         """Find habits whose keywords match words in the message."""
-        words = set(message.lower().split())
+        return [m.habit for m in await self.match_habits(message, limit)]
 
-        async with async_session() as session:
-            result = await session.execute(select(Habit))
-            all_habits = result.scalars().all()
+    async def match_habits(self, message: str, limit: int = 5) -> list[HabitMatch]:
+        """Top habits by keyword overlap, with their scores and matched keywords."""
+        with stage_duration.time(stage="retrieval"), tracer.span("habits.find_relevant") as span:
+            words = set(message.lower().split())
 
-        # Score each habit by keyword overlap
-        scored = []
-        for habit in all_habits:
-            keywords = set(k.strip().lower() for k in habit.keywords.split(",") if k.strip())
-            overlap = len(words & keywords)
-            if overlap > 0:
-                scored.append((habit.effective_weight * overlap, habit))
+            all_habits = await tenant_state.get("habits", self._load_all)
 
-        # Sort by score descending, return top N
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [h for _, h in scored[:limit]]
+            # Score each habit by keyword overlap
+            scored = []
+            for habit in all_habits:
+                keywords = set(k.strip().lower() for k in habit.keywords.split(",") if k.strip())
+                overlap = words & keywords
+                if overlap:
+                    scored.append(HabitMatch(habit, habit.effective_weight * len(overlap), sorted(overlap)))
+
+            # Sort by score descending, return top N
+            scored.sort(key=lambda m: m.score, reverse=True)
+            span.set(candidates=len(all_habits), matched=len(scored))
+            return scored[:limit]
+
+    async def _load_all(self) -> list[Habit]:
+        with tracer.span("db.select", table="habits"):
+            async with async_session() as session:
+                result = await session.execute(select(Habit))
+                return list(result.scalars().all())
 
     async def get_all(self, category: str | None = None, min_weight: float = 0.0) -> list[Habit]:
         async with async_session() as session:
@@ -35,20 +58,24 @@ class HabitService:
 
     async def create(self, **kwargs) -> Habit:
         habit = Habit(**kwargs)
-        async with async_session() as session:
-            session.add(habit)
-            await session.commit()
-            await session.refresh(habit)
+        with tracer.span("habits.create"):
+            async with async_session() as session:
+                session.add(habit)
+                await session.commit()
+                await session.refresh(habit)
+        await invalidation_bus.publish("habits", habit.id)
         return habit
 
     async def reinforce(self, habit_id: int) -> Habit | None:
-        async with async_session() as session:
-            habit = await session.get(Habit, habit_id)
-            if habit is None:
-                return None
-            habit.repetition_count += 1
-            await session.commit()
-            await session.refresh(habit)
+        with tracer.span("habits.reinforce", habit_id=habit_id):
+            async with async_session() as session:
+                habit = await session.get(Habit, habit_id)
+                if habit is None:
+                    return None
+                habit.repetition_count += 1
+                await session.commit()
+                await session.refresh(habit)
+        await invalidation_bus.publish("habits", habit.id)
         return habit
 
     async def count(self) -> int:
@@ -0,0 +1,145 @@
+"""
+Idempotency keys for `/chat` and `/chat/stream`.
+
+Mobile clients retry on timeouts, and without this every retry reruns the
+whole pipeline (up to four Claude calls) and may open a duplicate pending
+learning. A request carrying an `Idempotency-Key` header is scoped by
+tenant, client key and endpoint:
+
+  - first use: the turn runs in its own task, so a client that gives up
+    does not cancel it for the retries waiting on it.
+  - retry while it runs: `/chat` awaits the same task's result, and
+    `/chat/stream` follows the same `TurnStream` from its first frame. No
+    admission slot or budget is spent on the retry.
+  - retry after it finished: the stored response is returned (the stream's
+    buffered frames replay instantly) until `idempotency_ttl_s` has passed.
+    A stream entry holds its frame buffer, so it is kept only as long as
+    stream replay keeps the buffer: `stream_replay_ttl_s` after the turn
+    ends, if that is shorter.
+  - a turn that failed before producing a result (shed with 503, refused by
+    the budget) is forgotten, so the next retry runs it again.
+  - the same key with a different message is rejected with 422.
+
+Entries live in this worker's memory, LRU-bounded by
+`idempotency_max_entries`, like stream replay buffers. Retries therefore
+need to reach the same worker, for example through sticky routing on the
+key. Expired entries are found through a heap ordered by expiry, so each
+request only pops what is due.
+"""
+import asyncio
+import hashlib
+import heapq
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable
+
+from app.config import settings
+from app.models.database import get_tenant
+from app.services.metrics import Counter, Gauge, registry
+
+idempotent_requests = registry.register(Counter(
+    "soul_idempotent_requests_total",
+    "Requests with an Idempotency-Key, by endpoint and outcome (new, joined, replayed, conflict)",
+    ("endpoint", "outcome"),
+))
+
+
+class IdempotencyConflict(Exception):
+    """The key was already used for a different request."""
+
+
+def fingerprint(*parts: Any) -> str:
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode()).hexdigest()
+
+
+@dataclass
+class IdempotentEntry:
+    fingerprint: str
+    task: asyncio.Task
+    expires_at: float = float("inf")  # set when the task finishes
+
+
+class IdempotencyStore:
+    def __init__(self):
+        self._entries: OrderedDict[tuple[str, str, str, str], IdempotentEntry] = OrderedDict()
+        # (expires_at, scope) of settled entries; stale pairs are skipped when popped
+        self._expiry: list[tuple[float, tuple[str, str, str, str]]] = []
+        self._waiters: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def run(
+        self, endpoint: str, key: str, client_key: str, request_fingerprint: str,
+        work: Callable[[], Awaitable[Any]],
+        ttl_s: float | None = None,
+        done: Callable[[Any], Awaitable[None]] | None = None,
+    ) -> tuple[Any, bool]:
+        """Result of `work()` for this key, running it only once; (result, replayed).
+
+        The entry is kept for `ttl_s` (default `idempotency_ttl_s`) after
+        `work()` returns, or after `done(result)` resolves if given, for
+        results that stay live after `work()` returns, such as a running stream.
+        """
+        scope = (get_tenant(), client_key, endpoint, key)
+        self._expire()
+        entry = self._entries.get(scope)
+        if entry is not None:
+            if entry.fingerprint != request_fingerprint:
+                idempotent_requests.inc(endpoint=endpoint, outcome="conflict")
+                raise IdempotencyConflict(f"Idempotency-Key '{key}' was already used for a different request")
+            self._entries.move_to_end(scope)
+            idempotent_requests.inc(endpoint=endpoint, outcome="replayed" if entry.task.done() else "joined")
+            return await asyncio.shield(entry.task), True
+
+        idempotent_requests.inc(endpoint=endpoint, outcome="new")
+        entry = IdempotentEntry(fingerprint=request_fingerprint, task=asyncio.create_task(work()))
+        ttl = settings.idempotency_ttl_s if ttl_s is None else ttl_s
+        entry.task.add_done_callback(lambda task: self._settle(scope, entry, ttl, done))
+        self._entries[scope] = entry
+        while len(self._entries) > settings.idempotency_max_entries:
+            self._entries.popitem(last=False)
+        # Shielded: the turn outlives this request if its client disconnects
+        return await asyncio.shield(entry.task), False
+
+    def _settle(self, scope: tuple, entry: IdempotentEntry, ttl: float, done) -> None:
+        task = entry.task
+        if task.cancelled() or task.exception() is not None:
+            # Nothing worth replaying; the next retry runs the turn again
+            if self._entries.get(scope) is entry:
+                del self._entries[scope]
+            return
+        if done is None:
+            self._start_ttl(scope, entry, ttl)
+            return
+        waiter = asyncio.create_task(done(task.result()))
+        self._waiters.add(waiter)
+        waiter.add_done_callback(self._waiters.discard)
+        waiter.add_done_callback(lambda _: self._start_ttl(scope, entry, ttl))
+
+    def _start_ttl(self, scope: tuple, entry: IdempotentEntry, ttl: float) -> None:
+        entry.expires_at = time.monotonic() + ttl
+        heapq.heappush(self._expiry, (entry.expires_at, scope))
+        if len(self._expiry) > 2 * settings.idempotency_max_entries:
+            # Mostly pairs for entries the LRU already evicted; keep the live ones
+            self._expiry = [(e.expires_at, s) for s, e in self._entries.items() if e.expires_at != float("inf")]
+            heapq.heapify(self._expiry)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        while self._expiry and self._expiry[0][0] <= now:
+            _, scope = heapq.heappop(self._expiry)
+            entry = self._entries.get(scope)
+            # A newer entry for the same scope expires later (or is still running)
+            if entry is not None and entry.expires_at <= now:
+                del self._entries[scope]
+
+
+idempotency_store = IdempotencyStore()
+
+registry.register(Gauge(
+    "soul_idempotency_entries",
+    "Idempotency keys remembered (in flight or replayable)",
+    collect=lambda: {(): len(idempotency_store)},
+))
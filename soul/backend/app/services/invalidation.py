@@ -0,0 +1,149 @@
+"""
+Cross-worker invalidation bus.
+
+Services publish `(topic, key)` after every mutation of shared state
+(habits, learnings), tagged with the current tenant. Each event is
+appended to the `invalidation_events` table in the default database, and
+its sequence number serves as a monotonically increasing version stamp.
+Every worker polls for events past the last one it saw and delivers them
+to in-process subscribers. Publishing also delivers locally right away,
+so the writing worker never serves its own stale state.
+
+Caches that do not need per-key callbacks can compare `stamp(topic)` at
+fill and read time instead. A worker that falls behind the retention
+window, or misses events for any other reason, sees a gap in sequence
+numbers. It then bumps every topic and notifies subscribers with
+`tenant=None, key=None` (drop everything). That costs one comparison, not
+a reload.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import delete, func, select
+
+from app.config import settings
+from app.models.database import control_session, get_tenant
+from app.models.invalidation_model import InvalidationEvent
+
+logger = logging.getLogger(__name__)
+
+# callback(tenant, key); tenant and key are None when everything must go
+Subscriber = Callable[[str | None, str | None], None]
+
+
+class InvalidationBus:
+    def __init__(self):
+        self._subscribers: dict[str, list[Subscriber]] = {}
+        # Latest seq seen per topic; the version stamp caches compare
+        self._stamps: dict[str, int] = {}
+        self._last_seq = 0
+        # Our own events, already delivered on publish
+        self._own: set[int] = set()
+        self._task: asyncio.Task | None = None
+
+    def subscribe(self, topic: str, callback: Subscriber) -> None:
+        """Call `callback(tenant, key)` for each change to `topic`; key None means everything."""
+        self._subscribers.setdefault(topic, []).append(callback)
+
+    def stamp(self, topic: str) -> int:
+        return self._stamps.get(topic, 0)
+
+    def _deliver(self, seq: int, tenant: str | None, topic: str, key: str | None) -> None:
+        self._stamps[topic] = max(self._stamps.get(topic, 0), seq)
+        for callback in self._subscribers.get(topic, ()):
+            try:
+                callback(tenant, key)
+            except Exception:
+                logger.exception("Invalidation subscriber failed for %s", topic)
+
+    def _invalidate_all(self, seq: int) -> None:
+        for topic in set(self._stamps) | set(self._subscribers):
+            self._deliver(seq, None, topic, None)
+
+    async def publish(self, topic: str, key: str | int | None = None) -> int:
+        key = None if key is None else str(key)
+        tenant = get_tenant()
+        async with control_session() as session:
+            event = InvalidationEvent(tenant=tenant, topic=topic, key=key)
+            session.add(event)
+            await session.commit()
+            seq = event.seq
+        self._own.add(seq)
+        self._deliver(seq, tenant, topic, key)
+        return seq
+
+    async def publish_many(self, topic: str, keys: list[str | int]) -> None:
+        """Publish one event per key, appended in a single transaction."""
+        if not keys:
+            return
+        tenant = get_tenant()
+        async with control_session() as session:
+            events = [InvalidationEvent(tenant=tenant, topic=topic, key=str(key)) for key in keys]
+            session.add_all(events)
+            await session.commit()
+        for event in events:
+            self._own.add(event.seq)
+            self._deliver(event.seq, tenant, topic, event.key)
+
+    async def poll(self) -> int:
+        """Deliver events newer than the last one seen; returns how many."""
+        async with control_session() as session:
+            result = await session.execute(
+                select(
+                    InvalidationEvent.seq, InvalidationEvent.tenant, InvalidationEvent.topic, InvalidationEvent.key,
+                )
+                .where(InvalidationEvent.seq > self._last_seq)
+                .order_by(InvalidationEvent.seq)
+                .limit(1000)
+            )
+            events = result.all()
+        if not events:
+            return 0
+
+        if events[0].seq > self._last_seq + 1 and self._last_seq:
+            logger.warning("Invalidation gap after seq %d; invalidating everything", self._last_seq)
+            self._invalidate_all(events[0].seq)
+        for seq, tenant, topic, key in events:
+            if seq in self._own:
+                self._own.discard(seq)
+            else:
+                self._deliver(seq, tenant, topic, key)
+        self._last_seq = events[-1].seq
+        return len(events)
+
+    async def _prune(self) -> None:
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.invalidation_retention_s)
+        async with control_session() as session:
+            await session.execute(delete(InvalidationEvent).where(InvalidationEvent.created_at < cutoff))
+            await session.commit()
+
+    async def _run(self) -> None:
+        polls_per_prune = max(1, int(60 / settings.invalidation_poll_interval_s))
+        polls = 0
+        while True:
+            await asyncio.sleep(settings.invalidation_poll_interval_s)
+            try:
+                await self.poll()
+                polls += 1
+                if polls % polls_per_prune == 0:
+                    await self._prune()
+            except Exception:
+                logger.exception("Invalidation poll failed")
+
+    async def start(self) -> None:
+        """Start from the current head: a fresh worker has nothing cached to invalidate."""
+        async with control_session() as session:
+            head = await session.scalar(select(func.max(InvalidationEvent.seq)))
+        self._last_seq = head or 0
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+invalidation_bus = InvalidationBus()
@@ -1,6 +1,45 @@
-from sqlalchemy import select
+import re
+
+from sqlalchemy import func, or_, select
+from app.config import settings
 from app.models.database import async_session
-from app.models.learning_model import Learning
+from app.models.learning_model import Learning, LearningMention
+from app.models.schemas import TrainerBatchItem
+from app.services.invalidation import invalidation_bus
+from app.services.metrics import stage_duration
+from app.services.tenancy import tenant_state
+from app.services.tracing import tracer
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+_BATCH_FIELDS = ("guidance", "application_note", "modules_informed", "confidence_boost", "keywords")
+
+
+class BatchRejected(Exception):
+    """A trainer batch failed validation; nothing was applied."""
+
+    def __init__(self, errors: list[dict]):
+        super().__init__(f"{len(errors)} item(s) rejected")
+        self.errors = errors
+
+
+def _shingles(text: str, size: int = 4) -> set[str]:
+    """Character shingles of the lowercased, punctuation-free, whitespace-collapsed text."""
+    normalized = " ".join(_NON_WORD.sub(" ", text.lower()).split())
+    if len(normalized) <= size:
+        return {normalized}
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def similarity(a: str, b: str) -> float:
+    """Jaccard similarity of two messages' shingle sets (1.0 for identical normalized text)."""
+    sa, sb = _shingles(a), _shingles(b)
+    return len(sa & sb) / len(sa | sb) if sa | sb else 1.0
+
+
+def _informs(learning: Learning, module: str) -> bool:
+    if learning.modules_informed == "all":
+        return True
+    return module in {m.strip() for m in learning.modules_informed.split(",")}
 
 
 class LearningService:
@@ -8,28 +47,26 @@ class LearningService:
         self, message: str, modules: str | None = None, limit: int = 5
     ) -> list[Learning]:
         """Find active learnings whose keywords match words in the message."""
-        words = set(message.lower().split())
+        with stage_duration.time(stage="retrieval"), \
+                tracer.span("learnings.find_relevant", module=modules or "all") as span:
+            words = set(message.lower().split())
 
-        async with async_session() as session:
-            query = select(Learning).where(Learning.status == "active")
-            result = await session.execute(query)
-            all_learnings = result.scalars().all()
-
-        scored = []
-        for learning in all_learnings:
-            # Filter by module if specified
-            if modules and learning.modules_informed != "all":
-                informed = set(m.strip() for m in learning.modules_informed.split(","))
-                if modules not in informed:
+            all_learnings = await tenant_state.get("learnings", self._load_active)
+
+            scored = []
+            for learning in all_learnings:
+                # Filter by module if specified
+                if modules and not _informs(learning, modules):
                     continue
 
-            keywords = set(k.strip().lower() for k in learning.keywords.split(",") if k.strip())
-            overlap = len(words & keywords)
-            if overlap > 0:
-                scored.append((overlap * learning.confidence_boost, learning))
+                keywords = set(k.strip().lower() for k in learning.keywords.split(",") if k.strip())
+                overlap = len(words & keywords)
+                if overlap > 0:
+                    scored.append((overlap * learning.confidence_boost, learning))
 
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [l for _, l in scored[:limit]]
+            scored.sort(key=lambda x: x[0], reverse=True)
+            span.set(candidates=len(all_learnings), matched=len(scored))
+            return [l for _, l in scored[:limit]]
 
     async def create_pending(
         self, question_context: str, trigger_summary: str, keywords: str
@@ -40,11 +77,87 @@ class LearningService:
             keywords=keywords,
             status="pending",
         )
+        with tracer.span("learnings.create_pending"):
+            async with async_session() as session:
+                session.add(learning)
+                await session.commit()
+                await session.refresh(learning)
+        return learning
+
+    async def _load_active(self) -> list[Learning]:
+        with tracer.span("db.select", table="learnings"):
+            async with async_session() as session:
+                result = await session.execute(select(Learning).where(Learning.status == "active"))
+                return list(result.scalars().all())
+
+    async def attach_to_similar_pending(self, message: str) -> Learning | None:
+        """Fold `message` into the most similar pending learning, if one is close enough.
+
+        Compared against each pending learning's original message and the
+        messages already attached to it, so a question asked several ways
+        keeps collapsing into one inbox item. Only the newest
+        `trainer_dedup_candidates` pending learnings are considered (read
+        through the status + created_at index), together with their newest
+        attached messages up to the same number. The cost per uncertain turn
+        therefore stays bounded however large the inbox grows.
+        """
+        threshold = settings.trainer_dedup_threshold
+        if threshold <= 0:
+            return None
+        with tracer.span("learnings.find_similar_pending") as span:
+            async with async_session() as session:
+                pending = (await session.execute(
+                    select(Learning).where(Learning.status == "pending")
+                    .order_by(Learning.created_at.desc())
+                    .limit(settings.trainer_dedup_candidates)
+                )).scalars().all()
+                if not pending:
+                    return None
+                mentions = (await session.execute(
+                    select(LearningMention.learning_id, LearningMention.message)
+                    .where(LearningMention.learning_id.in_([l.id for l in pending]))
+                    .order_by(LearningMention.id.desc())
+                    .limit(settings.trainer_dedup_candidates)
+                )).all()
+
+                texts = [(l.id, l.question_context) for l in pending] + [tuple(m) for m in mentions]
+                best_id, best = None, 0.0
+                for learning_id, text in texts:
+                    score = similarity(message, text)
+                    if score > best:
+                        best_id, best = learning_id, score
+                span.set(candidates=len(texts), best_similarity=round(best, 3))
+                if best_id is None or best < threshold:
+                    return None
+
+                session.add(LearningMention(learning_id=best_id, message=message, similarity=best))
+                await session.commit()
+        # Its mention count changed; trainer inboxes pick that up
+        await invalidation_bus.publish("trainer", best_id)
+        return next(l for l in pending if l.id == best_id)
+
+    async def mention_counts(self, learning_ids: list[int]) -> dict[int, int]:
+        """Number of attached messages per learning id."""
+        if not learning_ids:
+            return {}
         async with async_session() as session:
-            session.add(learning)
+            result = await session.execute(
+                select(LearningMention.learning_id, func.count())
+                .where(LearningMention.learning_id.in_(learning_ids))
+                .group_by(LearningMention.learning_id)
+            )
+            return dict(result.all())
+
+    async def enrich_pending(self, learning_id: int, trigger_summary: str, keywords: str) -> bool:
+        """Replace a pending learning's provisional question; False if it is no longer pending."""
+        async with async_session() as session:
+            learning = await session.get(Learning, learning_id)
+            if learning is None or learning.status != "pending":
+                return False
+            learning.trigger_summary = trigger_summary
+            learning.keywords = keywords
             await session.commit()
-            await session.refresh(learning)
-        return learning
+        return True
 
     async def activate_learning(
         self,
@@ -65,32 +178,53 @@ class LearningService:
             learning.status = "active"
             await session.commit()
             await session.refresh(learning)
+        await invalidation_bus.publish("learnings", learning.id)
         return learning
 
     async def get_pending(self) -> list[Learning]:
+        """Pending learnings, oldest first (served by the status + created_at index)."""
         async with async_session() as session:
             result = await session.execute(
-                select(Learning).where(Learning.status == "pending")
+                select(Learning).where(Learning.status == "pending").order_by(Learning.created_at)
             )
             return list(result.scalars().all())
 
-    async def get_all_active(self) -> list[Learning]:
+    async def get_all_active(self, module: str | None = None) -> list[Learning]:
+        """Active learnings, optionally only those informing `module` (or all faculties)."""
+        query = select(Learning).where(Learning.status == "active")
+        if module:
+            # The index narrows this to active rows by its status prefix only: `contains` is a
+            # LIKE '%module%' scan over those rows. The exact list match is checked below.
+            query = query.where(or_(
+                Learning.modules_informed == "all",
+                Learning.modules_informed.contains(module),
+            ))
         async with async_session() as session:
-            result = await session.execute(
-                select(Learning).where(Learning.status == "active")
-            )
-            return list(result.scalars().all())
+            result = await session.execute(query)
+            learnings = list(result.scalars().all())
+        if module:
+            learnings = [l for l in learnings if _informs(l, module)]
+        return learnings
 
     async def get_by_id(self, learning_id: int) -> Learning | None:
         async with async_session() as session:
             return await session.get(Learning, learning_id)
 
-    async def increment_applied(self, learning_id: int) -> None:
+    async def get_many(self, learning_ids: list[int]) -> list[Learning]:
+        """Learnings with these ids, by primary key; missing ids are skipped."""
+        if not learning_ids:
+            return []
         async with async_session() as session:
-            learning = await session.get(Learning, learning_id)
-            if learning:
-                learning.times_applied += 1
-                await session.commit()
+            result = await session.execute(select(Learning).where(Learning.id.in_(learning_ids)))
+            return list(result.scalars().all())
+
+    async def increment_applied(self, learning_id: int) -> None:
+        with tracer.span("learnings.increment_applied", learning_id=learning_id):
+            async with async_session() as session:
+                learning = await session.get(Learning, learning_id)
+                if learning:
+                    learning.times_applied += 1
+                    await session.commit()
 
     async def supersede(self, learning_id: int) -> Learning | None:
         async with async_session() as session:
@@ -100,6 +234,7 @@ class LearningService:
             learning.status = "superseded"
             await session.commit()
             await session.refresh(learning)
+        await invalidation_bus.publish("learnings", learning.id)
         return learning
 
     async def update_learning(
@@ -114,8 +249,50 @@ class LearningService:
                     setattr(learning, key, value)
             await session.commit()
             await session.refresh(learning)
+        await invalidation_bus.publish("learnings", learning.id)
         return learning
 
+    async def apply_batch(self, items: list[TrainerBatchItem]) -> list[Learning]:
+        """Activate, update or supersede many learnings in one transaction.
+
+        Every item is checked first; if any learning is missing, or an
+        activation targets one that is no longer pending, nothing is applied
+        and `BatchRejected` lists the failures. Returns the learnings in the
+        order of `items`.
+        """
+        ids = [item.id for item in items]
+        with tracer.span("learnings.apply_batch", items=len(items)):
+            async with async_session() as session:
+                rows = {l.id: l for l in (await session.execute(
+                    select(Learning).where(Learning.id.in_(ids))
+                )).scalars().all()}
+                errors = []
+                for item in items:
+                    learning = rows.get(item.id)
+                    if learning is None:
+                        errors.append({"id": item.id, "detail": "Learning not found"})
+                    elif item.action == "activate" and learning.status != "pending":
+                        errors.append({"id": item.id, "detail": f"Learning is not pending (status: {learning.status})"})
+                if errors:
+                    raise BatchRejected(errors)
+
+                for item in items:
+                    learning = rows[item.id]
+                    if item.action == "supersede":
+                        learning.status = "superseded"
+                        continue
+                    for field in _BATCH_FIELDS:
+                        value = getattr(item, field)
+                        if value is not None:
+                            setattr(learning, field, value)
+                    if item.action == "activate":
+                        learning.modules_informed = item.modules_informed or "all"
+                        learning.confidence_boost = 0.5 if item.confidence_boost is None else item.confidence_boost
+                        learning.status = "active"
+                await session.commit()
+        await invalidation_bus.publish_many("learnings", ids)
+        return [rows[learning_id] for learning_id in ids]
+
     async def create_active(
         self,
         question_context: str,
@@ -141,6 +318,7 @@ class LearningService:
             session.add(learning)
             await session.commit()
             await session.refresh(learning)
+        await invalidation_bus.publish("learnings", learning.id)
         return learning
 
 
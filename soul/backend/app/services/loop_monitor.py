@@ -0,0 +1,128 @@
+"""
+Event-loop lag and stall detection.
+
+Every request, stream and background job shares one asyncio loop, so any
+synchronous stretch (pydantic construction, keyword scoring over every
+habit, parsing a large Claude response, a file read) delays them all.
+Two probes make that visible:
+
+  - a lag probe: a task that sleeps `loop_lag_interval_s` and records how
+    late it woke up in `soul_event_loop_lag_seconds`.
+  - a watchdog thread: the probe stamps a heartbeat each time it runs.
+    When the heartbeat is older than `loop_stall_threshold_ms` (plus the
+    probe interval), the loop is stuck in one callback, and the watchdog
+    captures the loop thread's stack right then. That shows what is
+    blocking while it blocks, not after the fact. The stall is logged,
+    counted in `soul_event_loop_stalls_total`, and kept in a short history
+    for `GET /admin/loop`. Its duration is filled in once the loop
+    recovers.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+
+from app.config import settings
+from app.services.metrics import Counter, Histogram, registry
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+loop_lag = registry.register(Histogram(
+    "soul_event_loop_lag_seconds",
+    "How late the event loop ran a timer scheduled every loop_lag_interval_s",
+    buckets=LAG_BUCKETS,
+))
+loop_stalls = registry.register(Counter(
+    "soul_event_loop_stalls_total",
+    "Times one callback blocked the event loop longer than loop_stall_threshold_ms",
+))
+
+
+@dataclass
+class Stall:
+    started_at: float                 # wall clock, seconds
+    stack: list[str]                  # loop thread's stack when the stall was detected
+    duration_ms: float | None = None  # None while the loop is still blocked
+    detected_after_ms: float = 0.0
+
+
+class LoopMonitor:
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._loop_thread_id: int | None = None
+        self._heartbeat = time.monotonic()
+        self._open: Stall | None = None
+        self.stalls: deque[Stall] = deque(maxlen=settings.loop_stall_history)
+        self.max_lag_s = 0.0
+
+    async def _probe(self) -> None:
+        interval = settings.loop_lag_interval_s
+        while True:
+            scheduled = time.monotonic()
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            lag = max(0.0, now - scheduled - interval)
+            loop_lag.observe(lag)
+            self.max_lag_s = max(self.max_lag_s, lag)
+            self._heartbeat = now
+            stall, self._open = self._open, None
+            if stall is not None:
+                stall.duration_ms = round(lag * 1000, 1)
+                logger.warning("Event loop was blocked for %.0f ms", stall.duration_ms)
+
+    def _capture(self, blocked_s: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame) if frame is not None else []
+        stall = Stall(
+            started_at=time.time() - blocked_s,
+            stack=[line.rstrip() for line in stack],
+            detected_after_ms=round(blocked_s * 1000, 1),
+        )
+        self._open = stall
+        self.stalls.append(stall)
+        loop_stalls.inc()
+        logger.warning(
+            "Event loop blocked for over %.0f ms in:\n%s", blocked_s * 1000, "".join(stack[-12:]),
+        )
+
+    def _watch(self) -> None:
+        threshold = settings.loop_stall_threshold_ms / 1000
+        interval = settings.loop_lag_interval_s
+        reported = None
+        while not self._stop.wait(min(threshold, interval) / 2):
+            beat = self._heartbeat
+            blocked = time.monotonic() - beat - interval
+            if blocked >= threshold and beat != reported:
+                reported = beat  # one capture per stall
+                self._capture(blocked)
+
+    def start(self) -> None:
+        if not settings.loop_monitor_enabled or self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._probe())
+        self._thread = threading.Thread(target=self._watch, name="soul-loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+
+loop_monitor = LoopMonitor()
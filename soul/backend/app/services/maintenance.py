@@ -0,0 +1,213 @@
+"""
+Learning store lifecycle and SQLite compaction.
+
+Superseded learnings and questions the trainer never answered would
+otherwise stay in `learnings` forever, and every inbox, listing and
+archival query would scan them. Every `maintenance_interval_s` this job
+visits each tenant's database and:
+
+  - archives, in batches of `learning_archive_batch_size`, superseded
+    learnings older than `learning_archive_superseded_after_s` and pending
+    learnings older than `learning_pending_expiry_s`. Rows move to
+    `learnings_archive` with their mention count; the mentions themselves
+    are deleted. Each batch is one transaction, and the loop yields between
+    batches. Expiring pending learnings publishes a `trainer` event so
+    inboxes refresh.
+  - runs `ANALYZE` every `db_analyze_interval_s`, so the planner's
+    statistics keep up with the composite indexes as history grows.
+  - runs `VACUUM` every `db_vacuum_interval_s`, but only when free pages
+    make up at least `db_vacuum_min_free_ratio` of the file.
+
+Archival is idempotent. `ANALYZE` and `VACUUM` are claimed per tenant in
+the default database's `maintenance_runs` table with one conditional
+UPDATE, so with several workers only one of them compacts each database
+per interval.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.config import settings
+from app.models.database import DEFAULT_TENANT, control_session, current_tenant, tenant_databases
+from app.models.learning_model import ArchivedLearning, Learning, LearningMention
+from app.models.maintenance_model import MaintenanceRun
+from app.services.invalidation import invalidation_bus
+from app.services.metrics import Counter, Histogram, registry
+from app.services.tenancy import TENANT_ID
+
+logger = logging.getLogger(__name__)
+
+MAINTENANCE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+_ARCHIVED_COLUMNS = (
+    "trigger_summary", "question_context", "guidance", "application_note", "modules_informed",
+    "keywords", "confidence_boost", "times_applied", "status", "created_at", "updated_at",
+)
+
+learnings_archived = registry.register(Counter(
+    "soul_learnings_archived_total",
+    "Learnings moved to learnings_archive, by reason (superseded, expired)",
+    ("reason",),
+))
+maintenance_duration = registry.register(Histogram(
+    "soul_db_maintenance_duration_seconds",
+    "Duration of database maintenance tasks per tenant (archive, analyze, vacuum)",
+    ("task",),
+    buckets=MAINTENANCE_BUCKETS,
+))
+
+
+class DatabaseMaintenance:
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+
+    def tenants(self) -> list[str]:
+        """The default tenant plus every tenant with a database file."""
+        directory = Path(settings.tenant_database_dir)
+        found = sorted(p.stem for p in directory.glob("*.db") if TENANT_ID.match(p.stem)) if directory.is_dir() else []
+        return [DEFAULT_TENANT, *(t for t in found if t != DEFAULT_TENANT)]
+
+    async def archive(self, tenant: str) -> dict[str, int]:
+        """Move superseded and expired pending learnings to the archive; counts by reason."""
+        now = datetime.utcnow()
+        rules = {
+            "superseded": (
+                Learning.status == "superseded",
+                Learning.updated_at < now - timedelta(seconds=settings.learning_archive_superseded_after_s),
+            ),
+            "expired": (
+                Learning.status == "pending",
+                Learning.created_at < now - timedelta(seconds=settings.learning_pending_expiry_s),
+            ),
+        }
+        counts = {}
+        for reason, conditions in rules.items():
+            counts[reason] = 0
+            while True:
+                moved = await self._archive_batch(tenant, reason, conditions, now)
+                counts[reason] += moved
+                if moved < settings.learning_archive_batch_size:
+                    break
+                await asyncio.sleep(0)  # let turns run between batches
+            if counts[reason]:
+                learnings_archived.inc(counts[reason], reason=reason)
+        if counts["expired"]:
+            token = current_tenant.set(tenant)
+            try:
+                await invalidation_bus.publish("trainer")
+            finally:
+                current_tenant.reset(token)
+        return counts
+
+    async def _archive_batch(self, tenant: str, reason: str, conditions: tuple, now: datetime) -> int:
+        async with tenant_databases.sessionmaker(tenant)() as session:
+            rows = (await session.execute(
+                select(Learning).where(*conditions).order_by(Learning.created_at)
+                .limit(settings.learning_archive_batch_size)
+            )).scalars().all()
+            if not rows:
+                return 0
+            ids = [row.id for row in rows]
+            mentions = dict((await session.execute(
+                select(LearningMention.learning_id, func.count())
+                .where(LearningMention.learning_id.in_(ids))
+                .group_by(LearningMention.learning_id)
+            )).all())
+            session.add_all(
+                ArchivedLearning(
+                    learning_id=row.id,
+                    mentions=mentions.get(row.id, 0),
+                    archived_at=now,
+                    archive_reason=reason,
+                    **{name: getattr(row, name) for name in _ARCHIVED_COLUMNS},
+                )
+                for row in rows
+            )
+            await session.execute(delete(LearningMention).where(LearningMention.learning_id.in_(ids)))
+            await session.execute(delete(Learning).where(Learning.id.in_(ids)))
+            await session.commit()
+            return len(ids)
+
+    async def _claim(self, task: str, tenant: str, interval_s: float) -> bool:
+        """True if this worker may run `task` on `tenant` now; records the run."""
+        now = datetime.utcnow()
+        async with control_session() as session:
+            await session.execute(
+                sqlite_insert(MaintenanceRun)
+                .values(task=task, tenant=tenant, ran_at=datetime.min)
+                .on_conflict_do_nothing()
+            )
+            result = await session.execute(
+                update(MaintenanceRun)
+                .where(
+                    MaintenanceRun.task == task,
+                    MaintenanceRun.tenant == tenant,
+                    MaintenanceRun.ran_at < now - timedelta(seconds=interval_s),
+                )
+                .values(ran_at=now)
+            )
+            await session.commit()
+            return result.rowcount == 1
+
+    async def compact(self, tenant: str) -> list[str]:
+        """ANALYZE and VACUUM the tenant's database when due; returns what ran."""
+        ran = []
+        engine = tenant_databases.engine(tenant)
+        if await self._claim("analyze", tenant, settings.db_analyze_interval_s):
+            with maintenance_duration.time(task="analyze"):
+                async with engine.begin() as conn:
+                    await conn.exec_driver_sql("ANALYZE")
+            ran.append("analyze")
+
+        async with engine.connect() as conn:
+            pages = await conn.exec_driver_sql("PRAGMA page_count")
+            page_count = pages.scalar() or 0
+            free = await conn.exec_driver_sql("PRAGMA freelist_count")
+            free_count = free.scalar() or 0
+        if (
+            page_count
+            and free_count / page_count >= settings.db_vacuum_min_free_ratio
+            and await self._claim("vacuum", tenant, settings.db_vacuum_interval_s)
+        ):
+            with maintenance_duration.time(task="vacuum"):
+                # VACUUM cannot run inside a transaction
+                async with engine.connect() as conn:
+                    conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                    await conn.exec_driver_sql("VACUUM")
+            ran.append("vacuum")
+        return ran
+
+    async def run_once(self) -> None:
+        for tenant in self.tenants():
+            try:
+                await tenant_databases.ensure(tenant)
+                start = time.perf_counter()
+                counts = await self.archive(tenant)
+                maintenance_duration.observe(time.perf_counter() - start, task="archive")
+                ran = await self.compact(tenant)
+                if any(counts.values()) or ran:
+                    logger.info("Maintenance for tenant %s: archived %s, ran %s", tenant, counts, ran or "nothing")
+            except Exception:
+                logger.exception("Maintenance failed for tenant %s", tenant)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(settings.maintenance_interval_s)
+            await self.run_once()
+
+    def start(self) -> None:
+        if settings.maintenance_interval_s > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+db_maintenance = DatabaseMaintenance()
@@ -0,0 +1,247 @@
+"""
+In-process Prometheus metrics.
+
+A deliberately small registry (counters, gauges, histograms with labels)
+rendered in the Prometheus text exposition format. Recording is a dict
+lookup plus an add, so it is safe to leave on in the hot path.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, TypeVar
+
+from app.services.tracing import tracer
+from app.services.turn_context import current_stage
+
+T = TypeVar("T")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+CONFIDENCE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def header(self) -> list[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Counter incremented directly, or read from a running total at scrape time."""
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        collect: Callable[[], dict[tuple[str, ...], float]] | None = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._collect = collect
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def render(self) -> list[str]:
+        values = self._collect() if self._collect else self._values
+        lines = self.header()
+        for key, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Gauge whose samples are either set directly or collected at scrape time."""
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        collect: Callable[[], dict[tuple[str, ...], float]] | None = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._collect = collect
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def render(self) -> list[str]:
+        values = self._collect() if self._collect else self._values
+        lines = self.header()
+        for key, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (+Inf last), sum]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = self.header()
+        bounds = self.buckets + (float("inf"),)
+        for key, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+stage_duration = registry.register(Histogram(
+    "soul_stage_duration_seconds",
+    "Latency of each pipeline stage",
+    ("stage",),
+))
+tokens_total = registry.register(Counter(
+    "soul_tokens_total",
+    "Claude tokens consumed, by model and token type",
+    ("model", "type"),
+))
+faculty_errors = registry.register(Counter(
+    "soul_faculty_errors_total",
+    "Faculty or synthesis calls that fell back to an error response",
+    ("faculty",),
+))
+faculty_local = registry.register(Counter(
+    "soul_faculty_local_total",
+    "Faculty outputs built locally without a Claude call",
+    ("faculty",),
+))
+weighted_confidence = registry.register(Histogram(
+    "soul_weighted_confidence",
+    "Weighted aggregate confidence across faculties",
+    buckets=CONFIDENCE_BUCKETS,
+))
+turns_total = registry.register(Counter(
+    "soul_turns_total",
+    "Completed soul turns by response mode (autonomous or needs_trainer)",
+    ("mode",),
+))
+trainer_deduplicated = registry.register(Counter(
+    "soul_trainer_consultations_deduplicated_total",
+    "Uncertain turns attached to an existing pending learning instead of asking the trainer again",
+))
+admission_rejected = registry.register(Counter(
+    "soul_admission_rejected_total",
+    "Requests shed by admission control",
+    ("lane", "reason"),
+))
+registry.register(Counter(
+    "soul_traces_dropped_total",
+    "Sampled traces not written to the export file, by reason (queue_full, write_error)",
+    ("reason",),
+    collect=lambda: {(reason,): count for reason, count in tracer.dropped().items()},
+))
+
+
+def record_usage(model: str, usage) -> None:
+    """Count a call's TokenUsageData against its model."""
+    tokens_total.inc(usage.input_tokens, model=model, type="input")
+    tokens_total.inc(usage.output_tokens, model=model, type="output")
+    if usage.cache_read_input_tokens:
+        tokens_total.inc(usage.cache_read_input_tokens, model=model, type="cache_read")
+    if usage.cache_creation_input_tokens:
+        tokens_total.inc(usage.cache_creation_input_tokens, model=model, type="cache_creation")
+
+
+async def timed(stage: str, awaitable: Awaitable[T]) -> T:
+    """Await `awaitable` inside a `soul.<stage>` span, recording its latency under `stage`."""
+    with tracer.span(f"soul.{stage}"):
+        token = current_stage.set(stage)
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            stage_duration.observe(time.perf_counter() - start, stage=stage)
+            current_stage.reset(token)
@@ -0,0 +1,80 @@
+"""
+On-demand sampling profiler.
+
+`GET /admin/profile` samples the live process for a bounded time. A
+helper thread walks `sys._current_frames()` every `interval_ms` and counts
+identical stacks, so the loop keeps serving traffic while it is measured.
+The cost is one stack walk per thread per sample, and only while a
+profile runs. The result is in collapsed-stack format (`root;...;leaf
+count` per line), which flamegraph.pl, speedscope and inferno read
+directly. Idle threads parked in the selector or in a lock wait show up as
+such; filter them in the viewer, or pass `thread=loop` to sample only the
+event-loop thread.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from types import FrameType
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is requested while another one is running."""
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    path = Path(code.co_filename)
+    where = "/".join(path.parts[-2:]) if len(path.parts) > 1 else path.name
+    return f"{code.co_name} ({where}:{code.co_firstlineno})".replace(";", ",")
+
+
+def collapse(frame: FrameType, root: str) -> str:
+    """One stack as `root;outermost;...;innermost`."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join([root, *reversed(labels)])
+
+
+@dataclass
+class Profile:
+    stacks: Counter
+    samples: int
+    seconds: float
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def run(self, seconds: float, interval_s: float, thread_ids: set[int] | None = None) -> Profile:
+        """Sample `thread_ids` (default: every thread but this one) for `seconds`. Blocking."""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already running")
+        try:
+            own = threading.get_ident()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks: Counter = Counter()
+            samples = 0
+            start = time.perf_counter()
+            deadline = start + seconds
+            while time.perf_counter() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own or (thread_ids is not None and ident not in thread_ids):
+                        continue
+                    stacks[collapse(frame, names.get(ident, f"thread-{ident}"))] += 1
+                samples += 1
+                time.sleep(interval_s)
+            return Profile(stacks=stacks, samples=samples, seconds=round(time.perf_counter() - start, 3))
+        finally:
+            self._lock.release()
+
+
+profiler = SamplingProfiler()
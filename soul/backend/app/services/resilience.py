@@ -0,0 +1,243 @@
+"""
+Retries, circuit breakers and model fallback for Claude calls.
+
+A transient API failure used to surface straight away as a faculty error
+(confidence 0.1) or a failed synthesis. `ClaudeClient.complete` now runs
+every live call through three layers:
+
+  - retry: connection errors, timeouts, 429, 5xx and 529 (overloaded) are
+    retried up to `claude_max_retries` times with full-jitter exponential
+    backoff, honouring `retry-after`. A Messages call has no side effects,
+    so a retry is safe; only the attempt that succeeds records usage. Each
+    call deposits `claude_retry_budget_ratio` tokens into a shared retry
+    budget and each retry spends one, so during an outage retries add at
+    most that fraction of extra load instead of multiplying it.
+  - circuit breaker, one per model: outcomes are kept over the last
+    `breaker_window_s`. Once at least `breaker_min_requests` calls show an
+    error rate of `breaker_error_rate` or more, the breaker opens and the
+    model is not called for `breaker_open_s`. It then lets
+    `breaker_half_open_probes` probe calls through. Probe successes close
+    it; a probe failure opens it again. Client errors (4xx other than 429)
+    count as successes, since the service answered.
+  - fallback: `model_fallbacks` maps a model to the models to try instead
+    while its breaker is open or after its retries are exhausted. Keys and
+    entries may be config roles (`synthesis_model`, `faculty_model`,
+    `claude_model`), resolved against the turn's config snapshot, or
+    literal model ids.
+"""
+import asyncio
+import random
+import time
+from collections import deque
+from contextvars import ContextVar
+
+import anthropic
+
+from app.config import settings
+from app.services.metrics import Counter, Gauge, registry
+
+MODEL_ROLES = ("claude_model", "faculty_model", "synthesis_model")
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+# Set when the current call was served by a fallback model, so callers can skip caching it
+fallback_served: ContextVar[bool] = ContextVar("soul_fallback_served", default=False)
+
+claude_retries = registry.register(Counter(
+    "soul_claude_retries_total",
+    "Claude calls retried after a transient error, by model",
+    ("model",),
+))
+retry_budget_exhausted = registry.register(Counter(
+    "soul_claude_retry_budget_exhausted_total",
+    "Retries skipped because the shared retry budget was empty",
+))
+claude_fallbacks = registry.register(Counter(
+    "soul_claude_fallbacks_total",
+    "Claude calls served by a fallback model, by reason (breaker_open, failed)",
+    ("from_model", "to_model", "reason"),
+))
+breaker_transitions = registry.register(Counter(
+    "soul_claude_breaker_transitions_total",
+    "Circuit breaker state changes, by model and new state",
+    ("model", "state"),
+))
+
+
+class CircuitOpen(Exception):
+    """Raised when every model in a call's fallback chain has an open breaker."""
+
+    def __init__(self, model: str):
+        super().__init__(f"Circuit open for model '{model}' and all its fallbacks")
+        self.model = model
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (anthropic.APIConnectionError, anthropic.APITimeoutError, anthropic.RateLimitError)):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code >= 500 or error.status_code in (408, 409, 429)
+    return False
+
+
+def retry_delay(attempt: int, error: BaseException) -> float:
+    """Full-jitter exponential backoff, or the server's retry-after if it asked for longer."""
+    cap = min(settings.claude_retry_max_delay_s, settings.claude_retry_base_delay_s * 2 ** (attempt - 1))
+    delay = random.uniform(0, cap)
+    response = getattr(error, "response", None)
+    header = response.headers.get("retry-after") if response is not None else None
+    if header:
+        try:
+            delay = max(delay, min(float(header), settings.claude_retry_max_delay_s))
+        except ValueError:
+            pass
+    return delay
+
+
+class RetryBudget:
+    """Token bucket: each call deposits a fraction of a retry, each retry withdraws one."""
+
+    def __init__(self):
+        self._tokens = float(settings.claude_retry_budget_min)
+
+    def deposit(self) -> None:
+        cap = max(settings.claude_retry_budget_min, 1)
+        self._tokens = min(cap, self._tokens + settings.claude_retry_budget_ratio)
+
+    def withdraw(self) -> bool:
+        if self._tokens < 1:
+            retry_budget_exhausted.inc()
+            return False
+        self._tokens -= 1
+        return True
+
+
+class CircuitBreaker:
+    def __init__(self, model: str):
+        self.model = model
+        self.state = "closed"
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._opened_at = 0.0
+        self._probes = 0          # probe calls in flight while half-open
+        self._probe_successes = 0
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        breaker_transitions.inc(model=self.model, state=state)
+
+    def acquire(self) -> str | None:
+        """Permission to call: "call", "probe" (half-open), or None while open."""
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < settings.breaker_open_s:
+                return None
+            self._transition("half_open")
+            self._probes = self._probe_successes = 0
+        if self.state == "half_open":
+            if self._probes >= settings.breaker_half_open_probes:
+                return None
+            self._probes += 1
+            return "probe"
+        return "call"
+
+    def record(self, permit: str, ok: bool | None) -> None:
+        """Report the outcome of a call made under `permit`; None means it was abandoned."""
+        if permit == "probe":
+            if self.state != "half_open":
+                return
+            self._probes -= 1
+            if ok is None:
+                return
+            if not ok:
+                self._open()
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= settings.breaker_half_open_probes:
+                    self._outcomes.clear()
+                    self._transition("closed")
+            return
+        if ok is None or self.state != "closed":
+            return
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        while self._outcomes and self._outcomes[0][0] < now - settings.breaker_window_s:
+            self._outcomes.popleft()
+        if len(self._outcomes) >= settings.breaker_min_requests:
+            failures = sum(1 for _, success in self._outcomes if not success)
+            if failures / len(self._outcomes) >= settings.breaker_error_rate:
+                self._open()
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self._transition("open")
+
+
+class Resilience:
+    def __init__(self):
+        self.retry_budget = RetryBudget()
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(model)
+        return breaker
+
+    def chain(self, model: str, config) -> list[str]:
+        """`model` followed by its fallbacks, resolved against the turn's config."""
+        def resolve(name: str) -> str:
+            return getattr(config, name) if name in MODEL_ROLES else name
+
+        chain = [model]
+        for key, fallbacks in settings.model_fallbacks.items():
+            if resolve(key) != model:
+                continue
+            for name in fallbacks:
+                if resolve(name) not in chain:
+                    chain.append(resolve(name))
+        return chain
+
+    async def call(self, model: str, attempt_call):
+        """Run `attempt_call()` against `model` with retries; returns (result, retries)."""
+        breaker = self.breaker(model)
+        permit = breaker.acquire()
+        if permit is None:
+            raise CircuitOpen(model)
+        self.retry_budget.deposit()
+        retries = 0
+        while True:
+            try:
+                result = await attempt_call()
+            except asyncio.CancelledError:
+                breaker.record(permit, None)
+                raise
+            except Exception as e:
+                retryable = is_retryable(e)
+                breaker.record(permit, not retryable)
+                if (
+                    not retryable
+                    or retries >= settings.claude_max_retries
+                    or not self.retry_budget.withdraw()
+                ):
+                    raise
+                retries += 1
+                claude_retries.inc(model=model)
+                await asyncio.sleep(retry_delay(retries, e))
+                permit = breaker.acquire()
+                if permit is None:
+                    raise CircuitOpen(model) from e
+                continue
+            breaker.record(permit, True)
+            return result, retries
+
+    def states(self) -> dict[tuple[str], int]:
+        return {(model,): BREAKER_STATES[b.state] for model, b in self._breakers.items()}
+
+
+resilience = Resilience()
+
+registry.register(Gauge(
+    "soul_claude_breaker_state",
+    "Circuit breaker state per model (0 closed, 1 half-open, 2 open)",
+    ("model",),
+    collect=resilience.states,
+))
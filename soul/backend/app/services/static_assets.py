@@ -0,0 +1,233 @@
+"""
+Static serving for the bundled web UI.
+
+Starlette's `StaticFiles` stats and reads every asset from disk per
+request, on the same event loop as chat, and sends it uncompressed with a
+weak mtime-based ETag. `StaticAssets` indexes the build once instead:
+
+  - every file gets a strong ETag from a hash of its content. Each encoded
+    variant has its own (`"<hash>-br"`, `"<hash>-gz"`), so a cache never
+    serves one encoding's bytes for another. `If-None-Match` is answered
+    with 304.
+  - compressible files (text, JSON, SVG, JS, CSS, WASM) of at least
+    `static_compress_min_bytes` get gzip and, when the optional `brotli`
+    package is installed, brotli variants. Variants already next to the
+    file (`app.js.br`, `app.js.gz`) are reused if they are not older than
+    it; otherwise they are built at startup and written there. Running
+    `python -m app.services.static_assets <dist>` after `npm run build`
+    builds them ahead of time. `Accept-Encoding` picks the variant, with
+    brotli preferred, and every compressible response carries
+    `Vary: Accept-Encoding`.
+  - fingerprinted files (Vite's `assets/index-BdX3k2_a.js`) are cached for
+    a year as `immutable`. Everything else, notably `index.html`, is sent
+    with `no-cache` so browsers revalidate it cheaply by ETag.
+  - files and variants up to `static_memory_file_max_bytes` are held in
+    memory, up to `static_memory_max_bytes` in total. Larger ones are
+    streamed from disk in a worker thread.
+
+The index is built when the app starts. Files added to the build later
+are served after a restart.
+"""
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import re
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, PlainTextResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from app.config import settings
+from app.services.metrics import Counter, registry
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/wasm")
+# Vite content hashes: name-<8+ chars of base64url>.ext
+FINGERPRINT = re.compile(r"[-.][A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+ENCODINGS = {"br": ".br", "gzip": ".gz"}  # in order of preference
+
+static_responses = registry.register(Counter(
+    "soul_static_responses_total",
+    "Web UI static responses, by encoding and source (memory, disk, not_modified)",
+    ("encoding", "source"),
+))
+
+
+@dataclass
+class Variant:
+    path: Path | None          # None when it exists only in memory
+    size: int
+    etag: str
+    body: bytes | None = None  # held in memory when small enough
+
+
+@dataclass
+class Asset:
+    media_type: str
+    cache_control: str
+    compressible: bool
+    variants: dict[str, Variant] = field(default_factory=dict)  # "identity", "br", "gzip"
+
+
+def _compress(encoding: str, data: bytes) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _is_compressible(media_type: str) -> bool:
+    return media_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def _accepted(header: str) -> set[str]:
+    """Encodings the client accepts (q > 0) from an Accept-Encoding header."""
+    accepted, refused = set(), set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        (accepted if q > 0 else refused).add(name)
+    if "*" in accepted:
+        accepted |= set(ENCODINGS) - refused
+    return accepted
+
+
+class StaticAssets:
+    """ASGI app serving a prepared build directory (mounted at `/`)."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._assets: dict[str, Asset] | None = None
+        self._memory_bytes = 0
+        self._lock = asyncio.Lock()
+
+    def prepare(self, write_variants: bool = True) -> None:
+        """Index every file, building missing compressed variants. Blocking."""
+        assets: dict[str, Asset] = {}
+        self._memory_bytes = 0
+        for path in sorted(self.directory.rglob("*")):
+            if not path.is_file() or path.suffix in (".br", ".gz"):
+                continue
+            rel = path.relative_to(self.directory).as_posix()
+            media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+            data = path.read_bytes()
+            digest = hashlib.sha256(data).hexdigest()[:32]
+            asset = Asset(
+                media_type=media_type,
+                cache_control=IMMUTABLE if FINGERPRINT.search(path.name) else REVALIDATE,
+                compressible=_is_compressible(media_type),
+            )
+            asset.variants["identity"] = self._variant(path, data, f'"{digest}"')
+            if asset.compressible and len(data) >= settings.static_compress_min_bytes:
+                for encoding, suffix in ENCODINGS.items():
+                    if encoding == "br" and brotli is None:
+                        continue
+                    encoded = self._encoded(path, path.with_name(path.name + suffix), encoding, data, write_variants)
+                    # Not worth sending if compression barely helps
+                    if encoded is not None and len(encoded[1]) < len(data) * 0.95:
+                        asset.variants[encoding] = self._variant(encoded[0], encoded[1], f'"{digest}-{suffix[1:]}"')
+            assets[rel] = asset
+        self._assets = assets
+        logger.info(
+            "Indexed %d web UI files from %s (%d bytes in memory, brotli %s)",
+            len(assets), self.directory, self._memory_bytes, "on" if brotli else "off",
+        )
+
+    def _encoded(
+        self, source: Path, target: Path, encoding: str, data: bytes, write: bool
+    ) -> tuple[Path | None, bytes] | None:
+        """(path on disk or None, encoded bytes) for one variant, reusing an up-to-date file."""
+        if target.exists() and target.stat().st_mtime >= source.stat().st_mtime:
+            return target, target.read_bytes()
+        encoded = _compress(encoding, data)
+        if write:
+            try:
+                target.write_bytes(encoded)
+                return target, encoded
+            except OSError as e:
+                logger.warning("Could not write %s, keeping it in memory only: %s", target, e)
+        if len(encoded) > settings.static_memory_file_max_bytes:
+            return None  # neither on disk nor small enough to hold
+        return None, encoded
+
+    def _variant(self, path: Path | None, data: bytes, etag: str) -> Variant:
+        small = len(data) <= settings.static_memory_file_max_bytes
+        keep = path is None or (small and self._memory_bytes + len(data) <= settings.static_memory_max_bytes)
+        if keep:
+            self._memory_bytes += len(data)
+        return Variant(path=path, size=len(data), etag=etag, body=data if keep else None)
+
+    async def _index(self) -> dict[str, Asset]:
+        if self._assets is None:
+            async with self._lock:
+                if self._assets is None:
+                    await asyncio.to_thread(self.prepare)
+        return self._assets
+
+    def _lookup(self, assets: dict[str, Asset], path: str) -> tuple[Asset | None, int]:
+        rel = path.lstrip("/")
+        if rel == "" or rel.endswith("/"):
+            rel += "index.html"
+        asset = assets.get(rel) or assets.get(f"{rel}/index.html")
+        if asset is not None:
+            return asset, 200
+        return assets.get("404.html"), 404
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request = Request(scope)
+        if request.method not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"allow": "GET, HEAD"})
+            await response(scope, receive, send)
+            return
+        asset, status = self._lookup(await self._index(), scope["path"])
+        if asset is None:
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        accepted = _accepted(request.headers.get("accept-encoding", ""))
+        encoding = next((e for e in ENCODINGS if e in asset.variants and e in accepted), "identity")
+        variant = asset.variants[encoding]
+        headers = {"etag": variant.etag, "cache-control": asset.cache_control}
+        if asset.compressible:
+            headers["vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            headers["content-encoding"] = encoding
+
+        if status == 200 and variant.etag in {
+            tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")
+        }:
+            static_responses.inc(encoding=encoding, source="not_modified")
+            response = Response(status_code=304, headers=headers)
+        elif variant.body is not None:
+            static_responses.inc(encoding=encoding, source="memory")
+            response = Response(variant.body, status_code=status, headers=headers, media_type=asset.media_type)
+        else:
+            static_responses.inc(encoding=encoding, source="disk")
+            response = FileResponse(variant.path, status_code=status, headers=headers, media_type=asset.media_type)
+        await response(scope, receive, send)
+
+
+if __name__ == "__main__":
+    # Build-time precompression: python -m app.services.static_assets ../frontend/web/dist
+    logging.basicConfig(level=logging.INFO)
+    StaticAssets(Path(sys.argv[1] if len(sys.argv) > 1 else "dist")).prepare()
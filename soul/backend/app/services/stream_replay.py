@@ -0,0 +1,127 @@
+"""
+Resumable SSE streams.
+
+Each streamed turn runs in its own task that appends encoded frames to a
+`TurnStream`, independent of the HTTP response that started it. Frames
+get monotonically increasing ids (`<stream_id>:<seq>`), prepended once
+when the frame is buffered, so the same bytes serve the original client
+and every reconnect. A client that reconnects with `Last-Event-ID` follows
+the buffer from the frame after that id: finished turns replay instantly,
+running turns continue live, and nothing is recomputed. Buffers are kept
+for `stream_replay_ttl_s` after the turn finishes. A stream can only be
+resumed under the tenant that started it.
+
+At most `stream_replay_max_streams` buffers are held. To make room, the
+oldest finished buffer is dropped; a running turn's buffer never is, since
+its client may be about to reconnect. When every buffer belongs to a
+running turn, `start` raises `ReplayFull` and the new stream is shed.
+"""
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Callable
+
+from app.config import settings
+from app.models.database import get_tenant
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidEventId(ValueError):
+    pass
+
+
+class ReplayFull(Exception):
+    """Every replay buffer belongs to a running turn; no room for another stream."""
+
+
+def parse_event_id(value: str) -> tuple[str, int]:
+    """Split a `Last-Event-ID` of the form `<stream_id>:<seq>`."""
+    stream_id, sep, seq = value.strip().rpartition(":")
+    if not sep or not stream_id or not seq.isdigit():
+        raise InvalidEventId(f"Malformed Last-Event-ID '{value}'")
+    return stream_id, int(seq)
+
+
+class TurnStream:
+    def __init__(self, stream_id: str, tenant: str):
+        self.stream_id = stream_id
+        self.tenant = tenant
+        self.frames: list[bytes] = []
+        self.done = False
+        self._changed = asyncio.Event()
+
+    def append(self, frame: bytes) -> None:
+        seq = len(self.frames) + 1
+        self.frames.append(f"id: {self.stream_id}:{seq}\n".encode() + frame)
+        self._notify()
+
+    def finish(self) -> None:
+        self.done = True
+        self._notify()
+
+    def _notify(self) -> None:
+        # Wake every follower, then arm a fresh event for the next change
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def wait_done(self) -> None:
+        """Return once the turn has ended."""
+        while not self.done:
+            await self._changed.wait()
+
+    async def follow(self, after: int = 0) -> AsyncIterator[bytes]:
+        """Yield buffered frames with seq > `after`, then live ones until the turn ends."""
+        position = after
+        while True:
+            while position < len(self.frames):
+                yield self.frames[position]
+                position += 1
+            if self.done:
+                return
+            await self._changed.wait()
+
+
+class StreamReplay:
+    def __init__(self):
+        self._streams: OrderedDict[str, TurnStream] = OrderedDict()
+        self._tasks: set[asyncio.Task] = set()
+
+    def start(self, events: AsyncIterator[bytes], on_done: Callable[[], None]) -> TurnStream:
+        """Run `events` to completion in the background, buffering every frame."""
+        while len(self._streams) >= settings.stream_replay_max_streams:
+            finished = next((stream_id for stream_id, s in self._streams.items() if s.done), None)
+            if finished is None:
+                raise ReplayFull(f"All {len(self._streams)} stream replay buffers belong to running turns")
+            del self._streams[finished]
+        stream = TurnStream(uuid.uuid4().hex, get_tenant())
+        self._streams[stream.stream_id] = stream
+
+        task = asyncio.create_task(self._pump(stream, events, on_done))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return stream
+
+    async def _pump(self, stream: TurnStream, events: AsyncIterator[bytes], on_done: Callable[[], None]) -> None:
+        try:
+            async for frame in events:
+                stream.append(frame)
+        except Exception:
+            logger.exception("Streamed turn %s failed", stream.stream_id)
+        finally:
+            stream.finish()
+            on_done()
+            asyncio.get_running_loop().call_later(
+                settings.stream_replay_ttl_s, self._streams.pop, stream.stream_id, None,
+            )
+
+    def get(self, stream_id: str) -> TurnStream | None:
+        """The buffered stream, if it belongs to the current tenant."""
+        stream = self._streams.get(stream_id)
+        if stream is None or stream.tenant != get_tenant():
+            return None
+        return stream
+
+
+stream_replay = StreamReplay()
@@ -0,0 +1,187 @@
+"""
+Multi-tenant souls.
+
+Each request names its soul in the `X-Soul-Tenant` header (default
+`default`). The tenant selects a separate SQLite database (see
+`models/database.py`), so habits, learnings, config versions and usage
+never mix between souls. A single fleet can serve many small souls
+without running a process per customer.
+
+Each tenant's hot state, meaning its habits and active learnings for
+retrieval, is loaded into memory on first use. It is dropped when the
+invalidation bus reports a change; a load that a change overtook is
+returned to its caller but not cached. Across tenants it is kept in an
+LRU bounded by `tenant_cache_max_bytes` (estimated from text size). A
+tenant whose state alone exceeds the cap is served from the database on
+every call instead. Evicting a tenant also drops its config snapshot,
+which is reloaded on its next request.
+"""
+import asyncio
+import logging
+import re
+import sys
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from fastapi import Header, HTTPException
+
+from app.config import settings
+from app.models.database import DEFAULT_TENANT, current_tenant, get_tenant, tenant_databases
+from app.services.invalidation import invalidation_bus
+from app.services.metrics import Counter, Gauge, registry
+
+logger = logging.getLogger(__name__)
+
+TENANT_ID = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+tenant_evictions = registry.register(Counter(
+    "soul_tenant_evictions_total",
+    "Tenants whose hot state was evicted to stay under the memory cap",
+))
+
+
+def estimate_bytes(rows: list[Any]) -> int:
+    """Rough in-memory size of ORM rows: their text plus per-object overhead."""
+    total = 0
+    for row in rows:
+        total += 400 + sum(
+            sys.getsizeof(value) for value in vars(row).values() if isinstance(value, str)
+        )
+    return total
+
+
+class TenantStateCache:
+    """Per-tenant loaded state (kind -> value) in one LRU under a byte cap."""
+
+    def __init__(self):
+        # tenant -> {kind: (value, bytes)}
+        self._tenants: OrderedDict[str, dict[str, tuple[Any, int]]] = OrderedDict()
+        self._bytes = 0
+        # Bumped by drop(): per (tenant, kind), per tenant (kind None), and for all tenants
+        self._generations: dict[tuple[str, str | None], int] = {}
+        self._epoch = 0
+        self._on_evict: list[Callable[[str], None]] = []
+        for topic in ("habits", "learnings"):
+            invalidation_bus.subscribe(topic, lambda tenant, key, topic=topic: self.drop(tenant, topic))
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def on_evict(self, callback: Callable[[str], None]) -> None:
+        self._on_evict.append(callback)
+
+    def _generation(self, tenant: str, kind: str) -> tuple[int, int, int]:
+        return self._epoch, self._generations.get((tenant, None), 0), self._generations.get((tenant, kind), 0)
+
+    async def get(self, kind: str, loader: Callable[[], Awaitable[list]]) -> list:
+        """The current tenant's `kind` state, loaded with `loader()` on a miss."""
+        tenant = get_tenant()
+        state = self._tenants.get(tenant)
+        if state is not None and kind in state:
+            self._tenants.move_to_end(tenant)
+            return state[kind][0]
+
+        generation = self._generation(tenant, kind)
+        value = await loader()
+        if self._generation(tenant, kind) != generation:
+            return value  # changed while loading; the rows may predate it
+        size = estimate_bytes(value)
+        if size > settings.tenant_cache_max_bytes:
+            return value  # too big to hold; this tenant reads through
+        state = self._tenants.setdefault(tenant, {})
+        if kind in state:  # filled concurrently
+            self._bytes -= state[kind][1]
+        state[kind] = (value, size)
+        self._bytes += size
+        self._tenants.move_to_end(tenant)
+        self._shrink()
+        return value
+
+    def drop(self, tenant: str, kind: str | None = None) -> None:
+        """Forget `kind` (or everything) loaded for `tenant`; None tenant means all tenants."""
+        if tenant is None:
+            self._epoch += 1
+        else:
+            self._generations[(tenant, kind)] = self._generations.get((tenant, kind), 0) + 1
+        for name in list(self._tenants) if tenant is None else [tenant]:
+            state = self._tenants.get(name)
+            if state is None:
+                continue
+            for k in list(state) if kind is None else [kind]:
+                if k in state:
+                    self._bytes -= state.pop(k)[1]
+
+    def clear(self) -> None:
+        self._tenants.clear()
+        self._bytes = 0
+
+    def _shrink(self) -> None:
+        while self._bytes > settings.tenant_cache_max_bytes and len(self._tenants) > 1:
+            tenant, state = self._tenants.popitem(last=False)
+            self._bytes -= sum(size for _, size in state.values())
+            tenant_evictions.inc()
+            for callback in self._on_evict:
+                callback(tenant)
+
+
+tenant_state = TenantStateCache()
+
+_activation_hooks: list[Callable[[str, bool], Awaitable[None]]] = []
+
+
+def on_activate(hook: Callable[[str, bool], Awaitable[None]]) -> None:
+    """Run `hook(tenant, created)` the first time a tenant is used by this worker."""
+    _activation_hooks.append(hook)
+
+
+_active: set[str] = {DEFAULT_TENANT}
+_activating: dict[str, asyncio.Lock] = {}
+
+
+async def activate(tenant: str) -> None:
+    if tenant in _active:
+        return
+    # Concurrent first requests for a tenant wait for one activation
+    lock = _activating.setdefault(tenant, asyncio.Lock())
+    async with lock:
+        if tenant in _active:
+            return
+        created = await tenant_databases.ensure(tenant)
+        for hook in _activation_hooks:
+            await hook(tenant, created)
+        _active.add(tenant)
+    _activating.pop(tenant, None)
+    if created:
+        logger.info("Created soul for tenant '%s'", tenant)
+
+
+def forget(tenant: str) -> None:
+    """Eviction hook: run the activation hooks again on the tenant's next request."""
+    if tenant != DEFAULT_TENANT:
+        _active.discard(tenant)
+
+
+async def tenant_scope(x_soul_tenant: str | None = Header(None)) -> str:
+    """Router dependency: select the tenant named by `X-Soul-Tenant` for this request."""
+    tenant = (x_soul_tenant or DEFAULT_TENANT).strip().lower()
+    if not TENANT_ID.match(tenant):
+        raise HTTPException(status_code=400, detail=f"Invalid X-Soul-Tenant '{x_soul_tenant}'")
+    current_tenant.set(tenant)
+    await activate(tenant)
+    return tenant
+
+
+registry.register(Gauge(
+    "soul_tenants_loaded",
+    "Tenants with hot state in memory",
+    collect=lambda: {(): len(tenant_state)},
+))
+registry.register(Gauge(
+    "soul_tenant_state_bytes",
+    "Estimated bytes of tenant hot state held in memory",
+    collect=lambda: {(): tenant_state.bytes},
+))
@@ -0,0 +1,67 @@
+"""
+Budget-driven degradation.
+
+Maps how much of today's token budget is spent to a degradation step
+(see `DEGRADATION_STEPS`): first the faculties collapse into one combined
+call, then synthesis drops to the faculty model, then every call's
+max_tokens shrinks, and finally new turns are refused. Budgets apply
+fleet-wide, per tenant and per client key within a tenant.
+"""
+from app.config import settings
+from app.models.database import get_tenant
+from app.services.metrics import Counter, registry
+from app.services.turn_context import DEGRADATION_STEPS
+from app.services.usage_ledger import usage_ledger
+
+budget_degradations = registry.register(Counter(
+    "soul_budget_degradations_total",
+    "Turns started under a budget degradation step",
+    ("step",),
+))
+
+
+class BudgetExhausted(Exception):
+    def __init__(self, client_key: str):
+        super().__init__(f"Daily token budget exhausted for client '{client_key}'")
+        self.client_key = client_key
+
+
+class BudgetPolicy:
+    def budget_fraction(self, client_key: str) -> float:
+        """Largest fraction consumed across the global, per-tenant and per-client daily budgets."""
+        tenant = get_tenant()
+        fraction = 0.0
+        if settings.token_budget_daily > 0:
+            fraction = usage_ledger.spent_today() / settings.token_budget_daily
+        if settings.token_budget_daily_per_tenant > 0:
+            fraction = max(
+                fraction,
+                usage_ledger.spent_today(tenant=tenant) / settings.token_budget_daily_per_tenant,
+            )
+        if settings.token_budget_daily_per_client > 0:
+            fraction = max(
+                fraction,
+                usage_ledger.spent_today(client_key, tenant) / settings.token_budget_daily_per_client,
+            )
+        return fraction
+
+    def evaluate(self, client_key: str) -> str:
+        """Return the degradation step that applies to a new turn."""
+        fraction = self.budget_fraction(client_key)
+        step = "none"
+        for name in DEGRADATION_STEPS[1:]:
+            threshold = settings.budget_degradation_thresholds.get(name)
+            if threshold is not None and fraction >= threshold:
+                step = name
+        return step
+
+    def check(self, client_key: str) -> str:
+        """Like `evaluate`, but raise BudgetExhausted when the turn must be refused."""
+        step = self.evaluate(client_key)
+        budget_degradations.inc(step=step)
+        if step == "refused":
+            raise BudgetExhausted(client_key)
+        return step
+
+
+budget_policy = BudgetPolicy()
@@ -0,0 +1,225 @@
+"""
+Span-based tracing for soul turns.
+
+Spans nest through a context variable, so faculty tasks started with
+`asyncio.gather` / `create_task` attach to the turn that spawned them.
+Each finished trace is written as one OTLP/JSON `ExportTraceServiceRequest`
+per line to a local file by a background thread, keeping file I/O off the
+event loop. Head sampling keeps `trace_sample_rate` of turns; turns slower
+than `trace_slow_turn_ms` are always kept. At most `trace_export_queue_size`
+traces wait for the thread; beyond that, and when a write fails, traces are
+dropped and counted rather than held in memory.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_current_span: ContextVar["Span | None"] = ContextVar("soul_current_span", default=None)
+
+
+@dataclass
+class _Trace:
+    sampled: bool
+    spans: list["Span"] = field(default_factory=list)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None = None
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: int = 0
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: str | None = None
+    _trace: _Trace | None = field(default=None, repr=False)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+
+class _NoopSpan:
+    """Stand-in used when tracing is disabled."""
+    trace_id = None
+    span_id = None
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Span) -> dict:
+    data = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+    if span.parent_id:
+        data["parentSpanId"] = span.parent_id
+    return data
+
+
+class JsonlSpanExporter:
+    """Appends one OTLP/JSON export request per finished trace to a file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: queue.Queue = queue.Queue(maxsize=settings.trace_export_queue_size)
+        self._thread: threading.Thread | None = None
+        # Traces not written, by reason (queue_full, write_error)
+        self.dropped: dict[str, int] = {}
+
+    def _drop(self, reason: str) -> None:
+        self.dropped[reason] = self.dropped.get(reason, 0) + 1
+
+    def export(self, spans: list[Span]) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="soul-trace-exporter", daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            self._drop("queue_full")
+
+    def _run(self) -> None:
+        while True:
+            spans = self._queue.get()
+            if spans is None:
+                return
+            try:
+                self._write(spans)
+            except Exception:
+                # Keep draining the queue; a full disk or bad path must not stall tracing
+                logger.exception("Failed to export trace to %s", self.path)
+                self._drop("write_error")
+
+    def _write(self, spans: list[Span]) -> None:
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": "soul-ai"}},
+                    {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "app.services.tracing"},
+                    "spans": [_otlp_span(s) for s in spans],
+                }],
+            }],
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(request, separators=(",", ":")) + "\n")
+
+    def shutdown(self) -> None:
+        if self._thread is not None:
+            try:
+                self._queue.put(None, timeout=5)
+            except queue.Full:
+                pass
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+class Tracer:
+    def __init__(self):
+        self._exporter: JsonlSpanExporter | None = None
+
+    @property
+    def exporter(self) -> JsonlSpanExporter:
+        if self._exporter is None:
+            self._exporter = JsonlSpanExporter(settings.trace_export_path)
+        return self._exporter
+
+    def dropped(self) -> dict[str, int]:
+        """Traces the exporter could not write, by reason."""
+        return dict(self._exporter.dropped) if self._exporter is not None else {}
+
+    @staticmethod
+    def current_span() -> "Span | None":
+        return _current_span.get()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator["Span | _NoopSpan"]:
+        """Open a child of the current span (or a new root) for the duration of the block."""
+        if not settings.tracing_enabled:
+            yield _NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        if parent is None:
+            trace = _Trace(sampled=random.random() < settings.trace_sample_rate)
+            trace_id = os.urandom(16).hex()
+        else:
+            trace = parent._trace
+            trace_id = parent.trace_id
+
+        span = Span(
+            name=name,
+            trace_id=trace_id,
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent else None,
+            attributes=attributes,
+            _trace=trace,
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Async generator closed from another context; nothing to restore
+                pass
+            trace.spans.append(span)
+            if parent is None:
+                self._finish_trace(span, trace)
+
+    def _finish_trace(self, root: Span, trace: _Trace) -> None:
+        slow = settings.trace_slow_turn_ms and root.duration_ms >= settings.trace_slow_turn_ms
+        if trace.sampled or slow:
+            self.exporter.export(trace.spans)
+
+    def shutdown(self) -> None:
+        if self._exporter is not None:
+            self._exporter.shutdown()
+
+
+tracer = Tracer()
@@ -0,0 +1,185 @@
+"""
+Push delivery of the trainer inbox.
+
+`GET /trainer/pending` reads every pending learning, so a trainer UI that
+polls it scans the whole inbox on each poll. The inbox follows the
+invalidation bus instead. Pending learnings publish `trainer` when they are
+created, enriched by the question queue, joined by a similar message, or
+archived on expiry. Answers, edits and supersessions publish `learnings`.
+Each event is recorded in the tenant's change log on this worker and wakes
+that tenant's listeners. Listeners then read only the learnings named in
+the events, by primary key:
+
+  - `GET /trainer/inbox/stream` (SSE) sends a `snapshot` of the pending
+    inbox on connect, then `learning` for each new or changed pending
+    learning and `removed` for ones that are no longer pending. The last
+    event of each batch carries the cursor as its SSE id, so a reconnect
+    with `Last-Event-ID` gets only what it missed. A comment line is sent
+    every `trainer_inbox_keepalive_s` to keep proxies from closing an idle
+    stream.
+  - `GET /trainer/inbox?cursor=...&wait=...` (long-poll) returns the
+    changes after the cursor right away, or waits up to `wait` seconds
+    (at most `trainer_inbox_max_wait_s`) for one. Without a cursor it
+    returns a full snapshot with `reset: true`.
+
+A cursor is `<worker epoch>:<version>`. Each tenant's log keeps its last
+`trainer_inbox_log_size` changes. A cursor the log can no longer serve gets
+a fresh snapshot: it is older than the log, it came from another worker or
+a restart, or a bus gap reset the log. Delivery is at least once, so
+clients should treat `learning` as an upsert.
+"""
+import asyncio
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+from app.config import settings
+from app.models.database import current_tenant
+from app.models.learning_model import Learning
+from app.services.invalidation import invalidation_bus
+from app.services.learning_service import learning_service
+from app.services.metrics import Counter, Gauge, registry
+
+inbox_reads = registry.register(Counter(
+    "soul_trainer_inbox_reads_total",
+    "Trainer inbox reads, by kind (snapshot of all pending, delta of changed rows)",
+    ("kind",),
+))
+
+
+@dataclass
+class InboxDelta:
+    cursor: str
+    version: int
+    reset: bool                  # `pending` is the whole inbox
+    pending: list[Learning]
+    removed: list[int] = field(default_factory=list)
+    mention_counts: dict[int, int] = field(default_factory=dict)
+
+
+class _TenantLog:
+    def __init__(self):
+        self.version = 0
+        self.floor = 0  # oldest version the log can still resume from
+        self.changes: deque[tuple[int, int]] = deque(maxlen=settings.trainer_inbox_log_size)
+        self.changed = asyncio.Event()
+
+    def add(self, learning_id: int | None) -> None:
+        self.version += 1
+        if learning_id is None:
+            # Unknown changes: every earlier cursor needs a snapshot
+            self.floor = self.version
+            self.changes.clear()
+        else:
+            if len(self.changes) == self.changes.maxlen:
+                self.floor = max(self.floor, self.changes[0][0])
+            self.changes.append((self.version, learning_id))
+        # Wake every listener, then arm a fresh event for the next change
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def since(self, after: int) -> list[int] | None:
+        """Ids changed after version `after`, or None if the log cannot tell."""
+        if after < self.floor or after > self.version:
+            return None
+        return sorted({learning_id for version, learning_id in self.changes if version > after})
+
+
+class TrainerInbox:
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._logs: dict[str, _TenantLog] = {}
+        self.listeners = 0
+        for topic in ("trainer", "learnings"):
+            invalidation_bus.subscribe(topic, self._on_change)
+
+    def _on_change(self, tenant: str | None, key: str | None) -> None:
+        learning_id = int(key) if key is not None and key.isdigit() else None
+        if tenant is None:
+            for log in self._logs.values():
+                log.add(None)
+        elif tenant in self._logs:
+            # Tenants nobody has read yet have no cursors to serve
+            self._logs[tenant].add(learning_id)
+
+    def _log(self, tenant: str) -> _TenantLog:
+        log = self._logs.get(tenant)
+        if log is None:
+            log = self._logs[tenant] = _TenantLog()
+        return log
+
+    def parse_cursor(self, cursor: str | None) -> int | None:
+        """The version in a cursor issued by this worker, else None."""
+        epoch, _, version = (cursor or "").partition(":")
+        return int(version) if epoch == self.epoch and version.isdigit() else None
+
+    async def read(self, tenant: str, after: int | None) -> InboxDelta:
+        """Changes after version `after`, or a snapshot when that is None or unservable."""
+        log = self._log(tenant)
+        # Taken before reading, so a change made during the read is sent again next time
+        version = log.version
+        changed = log.since(after) if after is not None else None
+        token = current_tenant.set(tenant)
+        try:
+            if changed is None:
+                inbox_reads.inc(kind="snapshot")
+                pending, removed = await learning_service.get_pending(), []
+            else:
+                inbox_reads.inc(kind="delta")
+                pending = [l for l in await learning_service.get_many(changed) if l.status == "pending"]
+                still_pending = {l.id for l in pending}
+                removed = [learning_id for learning_id in changed if learning_id not in still_pending]
+            counts = await learning_service.mention_counts([l.id for l in pending])
+        finally:
+            current_tenant.reset(token)
+        return InboxDelta(
+            cursor=f"{self.epoch}:{version}",
+            version=version,
+            reset=changed is None,
+            pending=pending,
+            removed=removed,
+            mention_counts=counts,
+        )
+
+    async def wait(self, tenant: str, after: int, timeout: float) -> bool:
+        """Wait up to `timeout` for a change after version `after`; True if there is one."""
+        log = self._log(tenant)
+        if log.version > after:
+            return True
+        changed = log.changed
+        self.listeners += 1
+        try:
+            await asyncio.wait_for(changed.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.listeners -= 1
+
+    async def poll(self, tenant: str, cursor: str | None, wait: float) -> InboxDelta:
+        """Long-poll: changes after `cursor`, waiting up to `wait` seconds for one."""
+        after = self.parse_cursor(cursor)
+        if after is not None and self._log(tenant).since(after) == [] and wait > 0:
+            await self.wait(tenant, after, min(wait, settings.trainer_inbox_max_wait_s))
+        return await self.read(tenant, after)
+
+    async def follow(self, tenant: str, cursor: str | None = None) -> AsyncIterator[InboxDelta | None]:
+        """Changes after `cursor` (else a snapshot), then each batch of changes; None when a keepalive is due."""
+        delta = await self.read(tenant, self.parse_cursor(cursor))
+        yield delta
+        while True:
+            if not await self.wait(tenant, delta.version, settings.trainer_inbox_keepalive_s):
+                yield None
+                continue
+            delta = await self.read(tenant, delta.version)
+            yield delta
+
+
+trainer_inbox = TrainerInbox()
+
+registry.register(Gauge(
+    "soul_trainer_inbox_listeners",
+    "Trainer inbox streams and long-polls waiting for changes",
+    collect=lambda: {(): trainer_inbox.listeners},
+))
@@ -0,0 +1,187 @@
+"""
+Background generation of trainer questions.
+
+A low-confidence turn in learning mode used to wait for an extra Claude
+call that phrases the question for the trainer, although the user only
+sees a canned "I need guidance" reply. Now the turn creates the pending
+learning immediately with a provisional summary ("How should I respond
+to: ...") and keywords taken from the message. It then enqueues a job, and
+a small pool of workers rewrites the summary and keywords off the
+response path.
+
+The queue is bounded: when it is full, the learning keeps its provisional
+text. Jobs are retried with exponential backoff. On shutdown the workers
+get `trainer_queue_drain_s` to finish queued jobs. Pending learnings still
+carrying a provisional summary are re-enqueued on the next start (for
+other tenants, when the worker first serves them), so nothing is lost.
+Every enrichment publishes a `trainer` event on the invalidation bus, the
+channel trainer inboxes listen on.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from app.config import settings
+from app.models.database import DEFAULT_TENANT
+from app.services.claude_client import claude_client
+from app.services.invalidation import invalidation_bus
+from app.services.learning_service import learning_service
+from app.services.metrics import Counter, Gauge, registry, timed
+from app.services.turn_context import TurnContext, use_turn
+
+logger = logging.getLogger(__name__)
+
+QUESTION_PROMPT = (
+    "You help a young soul formulate questions for its trainer. "
+    "Given a user message and the soul's uncertain module outputs, "
+    "create a concise question and extract keywords. "
+    "Respond in JSON: {\"trigger_summary\": \"...\", \"keywords\": \"comma,separated,words\"}"
+)
+
+trainer_questions_total = registry.register(Counter(
+    "soul_trainer_questions_total",
+    "Background trainer question jobs by outcome (enriched, failed, dropped, stale)",
+    ("outcome",),
+))
+
+
+def provisional_summary(message: str) -> str:
+    return f"How should I respond to: {message}"
+
+
+def provisional_keywords(message: str) -> str:
+    return ",".join(message.lower().split()[:5])
+
+
+@dataclass
+class _Job:
+    learning_id: int
+    message: str
+    faculty_notes: str  # what each faculty said, empty for jobs recovered after a restart
+    turn: TurnContext
+
+
+class TrainerQuestionQueue:
+    def __init__(self):
+        self._queue: asyncio.Queue[_Job] | None = None
+        self._workers: list[asyncio.Task] = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def open_consultation(self, message: str, manas_out, buddhi_out, sanskaras_out, turn: TurnContext):
+        """Create the pending learning now and queue its question for enrichment."""
+        learning = await learning_service.create_pending(
+            question_context=message,
+            trigger_summary=provisional_summary(message),
+            keywords=provisional_keywords(message),
+        )
+        await invalidation_bus.publish("trainer", learning.id)
+        notes = "".join(
+            f"{label}: {out.response}\n"
+            for label, out in (
+                ("Manas felt", manas_out), ("Buddhi thought", buddhi_out), ("Sanskaras recalled", sanskaras_out),
+            )
+            if not out.metadata.get("cancelled")  # the confidence gate decided without it
+        )
+        self._enqueue(_Job(learning.id, message, notes, turn))
+        return learning
+
+    def _enqueue(self, job: _Job) -> None:
+        if self._queue is None:
+            trainer_questions_total.inc(outcome="dropped")
+            return
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            # The provisional summary stands; a restart will pick the row up again
+            trainer_questions_total.inc(outcome="dropped")
+
+    async def _enrich(self, job: _Job) -> None:
+        # The job's turn carries its tenant, so every read and write below hits that soul
+        with use_turn(job.turn):
+            await self._enrich_in_turn(job)
+
+    async def _enrich_in_turn(self, job: _Job) -> None:
+        for attempt in range(settings.trainer_queue_max_attempts):
+            try:
+                data, _ = await timed("trainer", claude_client.complete_json(
+                    system_prompt=QUESTION_PROMPT,
+                    user_message=(
+                        f"User said: \"{job.message}\"\n"
+                        f"{job.faculty_notes}"
+                        f"The soul is uncertain. What should it ask the trainer?"
+                    ),
+                    max_tokens=256,
+                    temperature=0.3,
+                ))
+                break
+            except Exception as e:
+                if attempt + 1 >= settings.trainer_queue_max_attempts:
+                    logger.warning("Trainer question for learning %d failed: %s", job.learning_id, e)
+                    trainer_questions_total.inc(outcome="failed")
+                    return
+                await asyncio.sleep(settings.trainer_queue_retry_backoff_s * 2 ** attempt)
+
+        updated = await learning_service.enrich_pending(
+            job.learning_id,
+            trigger_summary=data.get("trigger_summary") or provisional_summary(job.message),
+            keywords=data.get("keywords") or provisional_keywords(job.message),
+        )
+        if not updated:
+            # Answered or superseded while queued
+            trainer_questions_total.inc(outcome="stale")
+            return
+        trainer_questions_total.inc(outcome="enriched")
+        await invalidation_bus.publish("trainer", job.learning_id)
+
+    async def _work(self, queue: asyncio.Queue[_Job]) -> None:
+        while True:
+            job = await queue.get()
+            try:
+                await self._enrich(job)
+            except Exception:
+                logger.exception("Trainer question worker failed on learning %d", job.learning_id)
+            finally:
+                queue.task_done()
+
+    async def recover(self, tenant: str, created: bool = False) -> None:
+        """Re-enqueue the tenant's pending learnings that still carry a provisional summary."""
+        if created:
+            return
+        turn = TurnContext(tenant=tenant)
+        with use_turn(turn):
+            pending = await learning_service.get_pending()
+        for learning in pending:
+            if learning.trigger_summary == provisional_summary(learning.question_context):
+                self._enqueue(_Job(learning.id, learning.question_context, "", turn))
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=settings.trainer_queue_size)
+        await self.recover(DEFAULT_TENANT)
+        self._workers = [
+            asyncio.create_task(self._work(self._queue)) for _ in range(settings.trainer_queue_workers)
+        ]
+
+    async def stop(self) -> None:
+        """Drain queued jobs for up to `trainer_queue_drain_s`, then cancel the workers."""
+        queue, self._queue = self._queue, None  # stop accepting new jobs
+        if queue is not None and self._workers:
+            try:
+                await asyncio.wait_for(queue.join(), timeout=settings.trainer_queue_drain_s)
+            except asyncio.TimeoutError:
+                logger.warning("Shutting down with %d trainer questions still queued", queue.qsize())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+trainer_queue = TrainerQuestionQueue()
+
+registry.register(Gauge(
+    "soul_trainer_queue_depth",
+    "Trainer question jobs waiting for a worker",
+    collect=lambda: {(): trainer_queue.depth},
+))
@@ -0,0 +1,64 @@
+"""
+Per-turn request context.
+
+Endpoints build a `TurnContext` and hand it to the engine, which makes it
+current for the duration of the turn. Code deep in the call stack (the
+Claude client, the usage ledger) reads it through `get_turn()` instead of
+threading it through every faculty signature. Each turn also pins the
+runtime config snapshot that was current when it was created, and the
+tenant whose soul it runs against.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from app.models.database import current_tenant, get_tenant
+from app.services.config_store import ConfigSnapshot, config_store
+
+# Ordered from no degradation to refusing the turn outright
+DEGRADATION_STEPS = ("none", "combined_mode", "faculty_synthesis", "reduced_tokens", "refused")
+
+
+@dataclass
+class TurnContext:
+    tenant: str = field(default_factory=get_tenant)
+    client_key: str = "anonymous"
+    lane: str = "chat"
+    queue_ms: int = 0
+    degradation: str = "none"
+    # Set by the mode controller when the turn starts
+    faculty_mode: str = "parallel"
+    mode_reason: str = "static"
+    config: ConfigSnapshot = field(default_factory=config_store.current)
+    # Faculty -> (response cache key, habit/learning dependencies), set as faculties finish
+    cache_keys: dict[str, tuple[str, frozenset]] = field(default_factory=dict)
+
+    def degraded_to(self, step: str) -> bool:
+        """True if this turn's degradation has reached `step`."""
+        return DEGRADATION_STEPS.index(self.degradation) >= DEGRADATION_STEPS.index(step)
+
+
+_current_turn: ContextVar[TurnContext | None] = ContextVar("soul_current_turn", default=None)
+# Pipeline stage attributed to Claude calls made in the current task
+current_stage: ContextVar[str] = ContextVar("soul_current_stage", default="other")
+
+
+def get_turn() -> TurnContext:
+    """The current turn, or a fresh one on the latest config outside any turn."""
+    return _current_turn.get() or TurnContext()
+
+
+@contextmanager
+def use_turn(turn: TurnContext) -> Iterator[TurnContext]:
+    token = _current_turn.set(turn)
+    tenant_token = current_tenant.set(turn.tenant)
+    try:
+        yield turn
+    finally:
+        try:
+            current_tenant.reset(tenant_token)
+            _current_turn.reset(token)
+        except ValueError:
+            # Async generator closed from another context; nothing to restore
+            pass
@@ -0,0 +1,190 @@
+"""
+Persistent token usage ledger.
+
+Every Claude call is recorded in memory against (day, tenant, client key,
+model, stage) and periodically flushed to each tenant's `token_usage`
+table as additive upserts, so several workers can share one ledger. After
+each flush the day's totals are re-read, which keeps budget checks aware
+of usage from other workers to within one flush interval.
+
+Stages in `UNBILLED_STAGES` are the operator's own measurements. They are
+recorded like any other usage, but left out of `spent_today`, so they
+never count against a client's, tenant's or the fleet's budget.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.config import settings
+from app.models.database import DEFAULT_TENANT, async_session, tenant_databases
+from app.models.usage_model import TokenUsageEntry
+
+logger = logging.getLogger(__name__)
+
+# Column order of the in-memory counters
+_FIELDS = ("calls", "input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+# Billed to the operator: the synthesis digest measurement (see `Synthesizer._shadow`)
+UNBILLED_STAGES = frozenset({"synthesis_shadow"})
+
+
+def utc_today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+class UsageLedger:
+    def __init__(self):
+        # (day, tenant, client_key, model, stage) -> counters in _FIELDS order, not yet flushed
+        self._pending: dict[tuple[str, str, str, str, str], list[int]] = {}
+        # Totals (input + output) already in the database for `_totals_day`, by (tenant, client key)
+        self._persisted: dict[tuple[str, str], int] = {}
+        # Totals handed to an in-progress flush, counted until the re-read lands
+        self._flushing: dict[tuple[str, str, str], int] = {}
+        # Tenants whose totals are tracked: the default plus any that recorded usage
+        self._tenants: set[str] = {DEFAULT_TENANT}
+        self._totals_day: str | None = None
+        self._task: asyncio.Task | None = None
+        # One flush at a time: `_flushing` holds exactly that flush's totals
+        self._flush_lock = asyncio.Lock()
+
+    def record(self, model: str, stage: str, usage, client_key: str, tenant: str = DEFAULT_TENANT) -> None:
+        self._tenants.add(tenant)
+        row = self._pending.setdefault((utc_today(), tenant, client_key, model, stage), [0, 0, 0, 0, 0])
+        row[0] += 1
+        row[1] += usage.input_tokens
+        row[2] += usage.output_tokens
+        row[3] += usage.cache_read_input_tokens
+        row[4] += usage.cache_creation_input_tokens
+
+    def spent_today(self, client_key: str | None = None, tenant: str | None = None) -> int:
+        """Billable input + output tokens used today, narrowed to a client key and/or a tenant."""
+        today = utc_today()
+        total = 0
+        if self._totals_day == today:
+            for (owner, key), tokens in self._persisted.items():
+                if tenant in (None, owner) and client_key in (None, key):
+                    total += tokens
+        for (day, owner, key), tokens in self._flushing.items():
+            if day == today and tenant in (None, owner) and client_key in (None, key):
+                total += tokens
+        for (day, owner, key, _, stage), row in self._pending.items():
+            if stage in UNBILLED_STAGES:
+                continue
+            if day == today and tenant in (None, owner) and client_key in (None, key):
+                total += row[1] + row[2]
+        return total
+
+    async def flush(self) -> None:
+        """Write pending usage and re-read today's totals; waits for a flush already running."""
+        async with self._flush_lock:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        pending, self._pending = self._pending, {}
+        by_tenant: dict[str, list[tuple[tuple, list[int]]]] = {}
+        for (day, tenant, key, model, stage), row in pending.items():
+            if stage not in UNBILLED_STAGES:
+                self._flushing[(day, tenant, key)] = self._flushing.get((day, tenant, key), 0) + row[1] + row[2]
+            by_tenant.setdefault(tenant, []).append(((day, key, model, stage), row))
+
+        flushed: set[str] = set()
+        reloaded = False
+        try:
+            for tenant, rows in by_tenant.items():
+                async with tenant_databases.sessionmaker(tenant)() as session:
+                    for (day, client_key, model, stage), row in rows:
+                        stmt = sqlite_insert(TokenUsageEntry).values(
+                            day=day, client_key=client_key, model=model, stage=stage,
+                            **dict(zip(_FIELDS, row)),
+                        )
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=["day", "client_key", "model", "stage"],
+                            set_={
+                                name: getattr(TokenUsageEntry, name) + getattr(stmt.excluded, name)
+                                for name in _FIELDS
+                            },
+                        )
+                        await session.execute(stmt)
+                    await session.commit()
+                flushed.add(tenant)
+            await self._load_totals()
+            reloaded = True
+        except Exception:
+            logger.exception("Failed to flush token usage; will retry")
+        finally:
+            if reloaded:
+                # `_persisted` now includes everything committed, this flush's rows and any earlier ones
+                self._flushing.clear()
+            else:
+                # Rows not written go back to pending. Committed rows stay in `_flushing`
+                # until a re-read includes them.
+                for key, row in pending.items():
+                    if key[1] in flushed:
+                        continue
+                    merged = self._pending.setdefault(key, [0, 0, 0, 0, 0])
+                    for i, value in enumerate(row):
+                        merged[i] += value
+                    if key[4] in UNBILLED_STAGES:
+                        continue
+                    totals_key = key[:3]
+                    self._flushing[totals_key] -= row[1] + row[2]
+                    if self._flushing[totals_key] <= 0:
+                        del self._flushing[totals_key]
+
+    async def _load_totals(self) -> None:
+        today = utc_today()
+        persisted = {}
+        for tenant in list(self._tenants):
+            async with tenant_databases.sessionmaker(tenant)() as session:
+                result = await session.execute(
+                    select(
+                        TokenUsageEntry.client_key,
+                        func.sum(TokenUsageEntry.input_tokens + TokenUsageEntry.output_tokens),
+                    )
+                    .where(TokenUsageEntry.day == today, TokenUsageEntry.stage.not_in(UNBILLED_STAGES))
+                    .group_by(TokenUsageEntry.client_key)
+                )
+                persisted.update({(tenant, key): int(total or 0) for key, total in result.all()})
+        self._persisted = persisted
+        self._totals_day = today
+
+    async def load_tenant(self, tenant: str, created: bool = False) -> None:
+        """Activation hook: include a tenant's persisted usage in today's totals."""
+        self._tenants.add(tenant)
+        if not created:
+            await self._load_totals()
+
+    async def entries(self, day: str | None = None) -> list[TokenUsageEntry]:
+        """Flush, then return the current tenant's persisted breakdown for `day` (default today)."""
+        await self.flush()
+        async with async_session() as session:
+            result = await session.execute(
+                select(TokenUsageEntry)
+                .where(TokenUsageEntry.day == (day or utc_today()))
+                .order_by(TokenUsageEntry.client_key, TokenUsageEntry.model, TokenUsageEntry.stage)
+            )
+            return list(result.scalars().all())
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(settings.usage_flush_interval_s)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Usage ledger flush failed")
+
+    async def start(self) -> None:
+        await self._load_totals()
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+usage_ledger = UsageLedger()
@@ -0,0 +1,213 @@
+"""
+Local fake of the Anthropic Messages API for load testing.
+
+Serves `POST /v1/messages` (plain and `stream: true`) with responses shaped
+like the soul's prompts expect: faculty JSON, combined JSON, trainer
+question JSON or synthesis prose, picked from the system prompt. Timing is
+time to first token plus output tokens at a fixed decode rate, so latency,
+TTFT and output length are all controlled by `FakeProfile`. A fraction of
+requests can fail with 529 (overloaded) or 429 (rate limited), and every
+response carries `anthropic-ratelimit-*` headers computed from a sliding
+one-minute request window.
+
+Run standalone and point the backend at it:
+
+    python -m benchmarks.fake_anthropic --port 8765 --ttft-ms 400
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, fields
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_WORDS = (
+    "the soul weighs this with care and patience seeking what is right kind "
+    "and true while the mind feels warmth and the intellect reasons through duty"
+).split()
+
+
+@dataclass
+class FakeProfile:
+    ttft_ms: float = 400.0          # median time to first token
+    ttft_sigma: float = 0.35        # log-normal spread of TTFT
+    tokens_per_s: float = 80.0      # decode rate after the first token
+    min_output_tokens: int = 40
+    max_output_tokens: int = 240
+    error_rate: float = 0.0         # fraction answered with 529 overloaded_error
+    rate_limit_rate: float = 0.0    # fraction answered with 429 rate_limit_error
+    requests_per_minute: int = 4000  # limit reported in the rate-limit headers
+    min_confidence: float = 0.5
+    max_confidence: float = 0.95
+    seed: int | None = None
+
+    @classmethod
+    def add_arguments(cls, parser: argparse.ArgumentParser) -> None:
+        """Expose every profile field as a `--kebab-case` option."""
+        for f in fields(cls):
+            parser.add_argument(
+                "--" + f.name.replace("_", "-"),
+                type=int if f.name == "seed" else f.type,
+                default=f.default,
+            )
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "FakeProfile":
+        return cls(**{f.name: getattr(args, f.name) for f in fields(cls)})
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(max(1, count)))
+
+
+def _faculty(rng: random.Random, profile: FakeProfile, tokens: int) -> dict:
+    return {
+        "response": _words(rng, tokens),
+        "confidence": round(rng.uniform(profile.min_confidence, profile.max_confidence), 2),
+        "valence": round(rng.uniform(-0.5, 0.8), 2),
+        "reasoning_chain": [_words(rng, 6), _words(rng, 6)],
+        "activated_habits": [{"name": "patience", "weight": 1.5, "influence": _words(rng, 5)}],
+    }
+
+
+def _response_text(system: str, rng: random.Random, profile: FakeProfile, tokens: int) -> str:
+    """Text whose shape matches what the calling prompt asks for."""
+    if "ALL THREE" in system:
+        share = max(1, tokens // 3)
+        return json.dumps({name: _faculty(rng, profile, share) for name in ("manas", "buddhi", "sanskaras")})
+    if "trigger_summary" in system:
+        return json.dumps({"trigger_summary": _words(rng, 10) + "?", "keywords": "care,patience,duty"})
+    if "Do NOT use JSON" in system:
+        return _words(rng, tokens)
+    return json.dumps(_faculty(rng, profile, tokens))
+
+
+def _error(status: int, kind: str, message: str, headers: dict | None = None) -> JSONResponse:
+    return JSONResponse(
+        status_code=status,
+        content={"type": "error", "error": {"type": kind, "message": message}},
+        headers=headers,
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def create_app(profile: FakeProfile | None = None) -> FastAPI:
+    profile = profile or FakeProfile()
+    rng = random.Random(profile.seed)
+    recent: deque[float] = deque()
+    cached_prompts: set[int] = set()
+    app = FastAPI(title="Fake Anthropic Messages API")
+    app.state.profile = profile
+    app.state.requests = 0
+
+    def rate_limit_headers() -> dict[str, str]:
+        now = time.monotonic()
+        while recent and now - recent[0] > 60:
+            recent.popleft()
+        remaining = max(0, profile.requests_per_minute - len(recent))
+        return {
+            "anthropic-ratelimit-requests-limit": str(profile.requests_per_minute),
+            "anthropic-ratelimit-requests-remaining": str(remaining),
+        }
+
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        recent.append(time.monotonic())
+        headers = rate_limit_headers()
+
+        roll = rng.random()
+        if roll < profile.rate_limit_rate:
+            return _error(429, "rate_limit_error", "Fake rate limit", {**headers, "retry-after": "1"})
+        if roll < profile.rate_limit_rate + profile.error_rate:
+            return _error(529, "overloaded_error", "Fake overload", headers)
+
+        system = "".join(block.get("text", "") for block in body.get("system") or [])
+        prompt = system + "".join(str(m.get("content", "")) for m in body["messages"])
+        output_tokens = min(
+            body.get("max_tokens", profile.max_output_tokens),
+            rng.randint(profile.min_output_tokens, profile.max_output_tokens),
+        )
+        text = _response_text(system, rng, profile, output_tokens)
+
+        # Treat the system prompt as the cached prefix: written once, read after
+        system_tokens = len(system) // 4
+        first_use = hash(system) not in cached_prompts
+        cached_prompts.add(hash(system))
+        usage = {
+            "input_tokens": max(1, (len(prompt) - len(system)) // 4),
+            "output_tokens": output_tokens,
+            "cache_creation_input_tokens": system_tokens if first_use else 0,
+            "cache_read_input_tokens": 0 if first_use else system_tokens,
+        }
+        message = {
+            "id": f"msg_fake_{uuid.uuid4().hex[:20]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body["model"],
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": usage,
+        }
+        ttft = rng.lognormvariate(0, profile.ttft_sigma) * profile.ttft_ms / 1000
+        decode = output_tokens / profile.tokens_per_s
+
+        if not body.get("stream"):
+            await asyncio.sleep(ttft + decode)
+            return JSONResponse(message, headers=headers)
+
+        async def events():
+            yield _sse("message_start", {
+                "type": "message_start",
+                "message": {**message, "content": [], "stop_reason": None,
+                            "usage": {**usage, "output_tokens": 1}},
+            })
+            await asyncio.sleep(ttft)
+            yield _sse("content_block_start", {
+                "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""},
+            })
+            chunks = max(1, output_tokens // 8)
+            step = -(-len(text) // chunks)
+            for i in range(0, len(text), step):
+                yield _sse("content_block_delta", {
+                    "type": "content_block_delta", "index": 0,
+                    "delta": {"type": "text_delta", "text": text[i:i + step]},
+                })
+                await asyncio.sleep(decode / chunks)
+            yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+            yield _sse("message_delta", {
+                "type": "message_delta",
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": output_tokens},
+            })
+            yield _sse("message_stop", {"type": "message_stop"})
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    FakeProfile.add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(FakeProfile.from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
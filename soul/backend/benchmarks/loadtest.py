@@ -0,0 +1,307 @@
+"""
+Load-test driver for /chat and /chat/stream against a fake Anthropic API.
+
+Starts the fake Messages API and the soul backend in-process (each on its
+own thread and event loop, on real sockets), then replays traffic:
+
+  - closed loop: `--concurrency` workers each send the next request as soon
+    as the previous one finishes
+  - open loop: requests arrive as a Poisson process at `--rate` per second
+    whether or not earlier ones have finished
+
+Each faculty mode is run in turn (`--modes parallel,combined`). The report
+covers throughput, end-to-end latency, time to the first faculty result
+for streams, per-stage latency from the backend's own
+`soul_stage_duration_seconds` histogram, and event-loop lag sampled inside
+the backend's loop.
+
+    python -m benchmarks.loadtest --endpoint stream --loop open --rate 20 --duration 30
+    python -m benchmarks.loadtest --ttft-ms 800 --rate-limit-rate 0.05 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict
+
+import httpx
+
+from benchmarks.fake_anthropic import FakeProfile, create_app
+
+MESSAGES = (
+    "I feel lost after losing my job. What should I do?",
+    "Is it ever right to lie to protect someone's feelings?",
+    "My friend betrayed my trust. Should I forgive them?",
+    "How do I find the patience to care for my aging parents?",
+    "I was offered a bribe at work and nobody would know.",
+)
+
+_BUCKET_LINE = re.compile(r'^soul_stage_duration_seconds_bucket\{stage="([^"]+)",le="([^"]+)"\} (\S+)$', re.M)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(samples: list[float], q: float) -> float | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _summary(samples: list[float]) -> dict:
+    return {
+        "count": len(samples),
+        "p50": _percentile(samples, 0.50),
+        "p95": _percentile(samples, 0.95),
+        "p99": _percentile(samples, 0.99),
+        "max": max(samples) if samples else None,
+    }
+
+
+class ServerThread:
+    """Run an ASGI app under uvicorn on a background thread with its own loop."""
+
+    def __init__(self, app, port: int):
+        import uvicorn
+
+        self.port = port
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self.server.serve())
+
+    def start(self) -> "ServerThread":
+        self._thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self.server.should_exit = True
+        self._thread.join(timeout=10)
+
+
+class LagMonitor:
+    """Samples how late a periodic sleep wakes up on the monitored loop."""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.samples: list[float] = []
+
+    async def run(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - expected))
+
+    def drain(self) -> list[float]:
+        samples, self.samples = self.samples, []
+        return samples
+
+
+def _histogram_quantiles(before: dict, after: dict) -> dict[str, dict]:
+    """Per-stage p50/p95/p99 from the change in cumulative bucket counts.
+
+    Quantiles are interpolated inside buckets the way Prometheus'
+    histogram_quantile does, so they are only as fine as the buckets.
+    """
+    result = {}
+    for stage, buckets in after.items():
+        prior = before.get(stage, {})
+        bounds = sorted(buckets)
+        counts = [buckets[b] - prior.get(b, 0) for b in bounds]
+        total = counts[-1]
+        if total <= 0:
+            continue
+        stats = {"count": int(total)}
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+            rank = q * total
+            lower_bound, lower_count = 0.0, 0
+            for bound, count in zip(bounds, counts):
+                if count >= rank:
+                    if bound == float("inf"):
+                        stats[name] = lower_bound
+                    else:
+                        span = count - lower_count
+                        stats[name] = lower_bound + (bound - lower_bound) * ((rank - lower_count) / span if span else 0)
+                    break
+                lower_bound, lower_count = bound, count
+        result[stage] = stats
+    return result
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace, base_url: str, lag: LagMonitor):
+        self.args = args
+        self.lag = lag
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(120.0),
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=256),
+        )
+        self._rng = random.Random(args.seed)
+
+    async def _stage_buckets(self) -> dict[str, dict[float, float]]:
+        text = (await self.client.get("/metrics")).text
+        buckets: dict[str, dict[float, float]] = defaultdict(dict)
+        for stage, le, value in _BUCKET_LINE.findall(text):
+            buckets[stage][float(le)] = float(value)
+        return buckets
+
+    async def _one(self, endpoint: str, results: dict) -> None:
+        payload = {"message": self._rng.choice(MESSAGES)}
+        first_result = None
+        start = time.perf_counter()
+        try:
+            if endpoint == "chat":
+                response = await self.client.post("/api/v1/chat", json=payload)
+                status = response.status_code
+            else:
+                async with self.client.stream("POST", "/api/v1/chat/stream", json=payload) as response:
+                    status = response.status_code
+                    async for line in response.aiter_lines():
+                        if first_result is None and line.startswith("event:") and line != "event: start":
+                            first_result = time.perf_counter() - start
+        except httpx.HTTPError as exc:
+            results["status"][type(exc).__name__] += 1
+            return
+        results["status"][status] += 1
+        if status == 200:
+            results["latency"].append(time.perf_counter() - start)
+            if first_result is not None:
+                results["first_result"].append(first_result)
+
+    async def _closed_loop(self, endpoint: str, deadline: float, results: dict) -> None:
+        async def worker():
+            while time.perf_counter() < deadline:
+                await self._one(endpoint, results)
+
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+
+    async def _open_loop(self, endpoint: str, deadline: float, results: dict) -> None:
+        tasks = []
+        while True:
+            await asyncio.sleep(self._rng.expovariate(self.args.rate))
+            if time.perf_counter() >= deadline:
+                break
+            tasks.append(asyncio.create_task(self._one(endpoint, results)))
+        await asyncio.gather(*tasks)
+
+    async def run(self, mode: str, endpoint: str) -> dict:
+        await self.client.put("/api/v1/config", json={
+            "combined_mode": mode == "combined",
+            "adaptive_mode_enabled": False,
+        })
+        before = await self._stage_buckets()
+        results = {"status": Counter(), "latency": [], "first_result": []}
+        self.lag.drain()
+
+        start = time.perf_counter()
+        deadline = start + self.args.duration
+        if self.args.loop == "closed":
+            await self._closed_loop(endpoint, deadline, results)
+        else:
+            await self._open_loop(endpoint, deadline, results)
+        elapsed = time.perf_counter() - start
+
+        report = {
+            "mode": mode,
+            "endpoint": endpoint,
+            "loop": self.args.loop,
+            "elapsed_s": elapsed,
+            "requests": sum(results["status"].values()),
+            "status": {str(k): v for k, v in results["status"].items()},
+            "rps": len(results["latency"]) / elapsed,
+            "latency_s": _summary(results["latency"]),
+            "stages_s": _histogram_quantiles(before, await self._stage_buckets()),
+            "event_loop_lag_s": _summary(self.lag.drain()),
+        }
+        if endpoint == "stream":
+            report["first_result_s"] = _summary(results["first_result"])
+        return report
+
+
+def _ms(value: float | None) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+def print_report(report: dict) -> None:
+    print(f"\n== mode={report['mode']} endpoint={report['endpoint']} loop={report['loop']} "
+          f"({report['elapsed_s']:.1f}s)")
+    print(f"   requests {report['requests']}  status {report['status']}  ok rps {report['rps']:.2f}")
+    print(f"   {'latency (ms)':<24}{'p50':>8}{'p95':>8}{'p99':>8}{'count':>8}")
+    rows = [("end to end", report["latency_s"])]
+    if "first_result_s" in report:
+        rows.append(("first faculty result", report["first_result_s"]))
+    rows += [(f"stage {stage}", stats) for stage, stats in sorted(report["stages_s"].items())]
+    rows.append(("event loop lag", report["event_loop_lag_s"]))
+    for name, stats in rows:
+        print(f"   {name:<24}{_ms(stats['p50']):>8}{_ms(stats['p95']):>8}{_ms(stats['p99']):>8}{stats['count']:>8}")
+
+
+async def _drive(args: argparse.Namespace, base_url: str, lag: LagMonitor) -> list[dict]:
+    load = LoadTest(args, base_url, lag)
+    reports = []
+    try:
+        for mode in args.modes.split(","):
+            for endpoint in ("chat", "stream") if args.endpoint == "both" else (args.endpoint,):
+                report = await load.run(mode, endpoint)
+                print_report(report)
+                reports.append(report)
+    finally:
+        await load.client.aclose()
+    return reports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=("chat", "stream", "both"), default="both")
+    parser.add_argument("--loop", choices=("closed", "open"), default="closed")
+    parser.add_argument("--modes", default="parallel,combined", help="Comma-separated faculty modes to run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed-loop workers")
+    parser.add_argument("--rate", type=float, default=5.0, help="Open-loop arrivals per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per mode and endpoint")
+    parser.add_argument("--json", dest="json_path", help="Also write the reports to this file")
+    FakeProfile.add_arguments(parser)
+    args = parser.parse_args()
+
+    fake = ServerThread(create_app(FakeProfile.from_args(args)), _free_port()).start()
+
+    # Settings are read at import, so configure the backend before importing it
+    workdir = tempfile.mkdtemp(prefix="soul-loadtest-")
+    os.environ["ANTHROPIC_BASE_URL"] = f"http://127.0.0.1:{fake.port}"
+    os.environ.setdefault("ANTHROPIC_API_KEY", "fake-key")
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir}/soul.db"
+    from app.main import app
+
+    backend = ServerThread(app, _free_port()).start()
+    lag = LagMonitor()
+    lag_future = asyncio.run_coroutine_threadsafe(lag.run(), backend.loop)
+    try:
+        reports = asyncio.run(_drive(args, f"http://127.0.0.1:{backend.port}", lag))
+    finally:
+        lag_future.cancel()
+        backend.stop()
+        fake.stop()
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"profile": asdict(FakeProfile.from_args(args)), "reports": reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
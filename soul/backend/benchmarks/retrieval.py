@@ -0,0 +1,234 @@
+"""
+Retrieval micro-benchmarks at 10k-1M habits and learnings.
+
+Grows one SQLite database through each corpus size. Each size adds
+synthetic habits and learnings whose keywords follow a Zipf distribution
+over a shared vocabulary, so a few keywords are very common and most are
+rare. At each size, every target is run against the same query mix:
+
+  - habits                HabitService.find_relevant_habits
+  - learnings             LearningService.find_relevant_learnings (all modules)
+  - learnings_filtered    the same with the module filter (modules="buddhi")
+  - learnings_context     BaseModule.build_learnings_context for buddhi
+
+For each target the benchmark records latency percentiles, peak Python
+memory allocated per call (tracemalloc) and DB round trips per call
+(cursor executions). Results are written as JSON with stable keys, so two
+runs can be diffed directly or with `--baseline`:
+
+    python -m benchmarks.retrieval --sizes 10000,100000 --json before.json
+    python -m benchmarks.retrieval --sizes 10000,100000 --json after.json --baseline before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from bisect import bisect_left
+from itertools import accumulate
+
+# Settings are read at import, so point the backend at a scratch database first
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.mkdtemp(prefix='soul-retrieval-')}/soul.db")
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from app.engine.buddhi import BuddhiModule  # noqa: E402
+from app.models.database import engine, async_session, init_db  # noqa: E402
+from app.models.habit_model import Habit  # noqa: E402
+from app.models.learning_model import Learning  # noqa: E402
+from app.services.habit_service import habit_service  # noqa: E402
+from app.services.learning_service import learning_service  # noqa: E402
+from app.services.tenancy import tenant_state  # noqa: E402
+
+VOCABULARY_SIZE = 20000
+FILLER = "i am the a to and of my it is that what how should do feel".split()
+MODULE_CHOICES = ("all", "all", "all", "manas", "buddhi", "sanskaras", "manas,buddhi", "buddhi,sanskaras")
+STATUS_CHOICES = ("active",) * 7 + ("pending",) * 2 + ("superseded",)
+INSERT_CHUNK = 10000
+
+
+class Corpus:
+    """Zipf-distributed keyword sampler shared by rows and queries."""
+
+    def __init__(self, seed: int, exponent: float = 1.1):
+        self.rng = random.Random(seed)
+        self.words = [f"kw{i}" for i in range(VOCABULARY_SIZE)]
+        self._cumulative = list(accumulate(1 / (rank ** exponent) for rank in range(1, VOCABULARY_SIZE + 1)))
+
+    def keyword(self) -> str:
+        point = self.rng.random() * self._cumulative[-1]
+        return self.words[bisect_left(self._cumulative, point)]
+
+    def keywords(self, low: int = 3, high: int = 8) -> str:
+        return ",".join({self.keyword() for _ in range(self.rng.randint(low, high))})
+
+    def message(self) -> str:
+        words = [self.keyword() for _ in range(self.rng.randint(3, 8))]
+        words += self.rng.choices(FILLER, k=self.rng.randint(6, 16))
+        self.rng.shuffle(words)
+        return " ".join(words)
+
+    def habit(self, i: int) -> dict:
+        return {
+            "name": f"habit_{i}",
+            "description": "Synthetic benchmark habit",
+            "category": self.rng.choice(("essence", "learned", "social")),
+            "keywords": self.keywords(),
+            "base_weight": round(self.rng.uniform(0.5, 2.0), 2),
+            "repetition_count": self.rng.randint(1, 50),
+            "valence": round(self.rng.uniform(-1, 1), 2),
+        }
+
+    def learning(self) -> dict:
+        return {
+            "trigger_summary": "Synthetic benchmark learning",
+            "question_context": "",
+            "guidance": "Synthetic guidance",
+            "application_note": "Apply synthetic guidance",
+            "modules_informed": self.rng.choice(MODULE_CHOICES),
+            "keywords": self.keywords(2, 6),
+            "confidence_boost": round(self.rng.uniform(0.2, 0.9), 2),
+            "status": self.rng.choice(STATUS_CHOICES),
+        }
+
+
+class RoundTrips:
+    """Counts SQL statements executed on the backend's engine."""
+
+    def __init__(self):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args) -> None:
+        self.count += 1
+
+
+async def grow(corpus: Corpus, current: int, target: int) -> None:
+    """Insert habits and learnings until each table holds `target` rows."""
+    async with async_session() as session:
+        for start in range(current, target, INSERT_CHUNK):
+            stop = min(target, start + INSERT_CHUNK)
+            await session.execute(insert(Habit), [corpus.habit(i) for i in range(start, stop)])
+            await session.execute(insert(Learning), [corpus.learning() for _ in range(start, stop)])
+        await session.commit()
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def measure(target, queries: list[str], round_trips: RoundTrips, memory_calls: int) -> dict:
+    await target(queries[0])  # warm-up: connection pool, statement cache
+
+    latencies = []
+    trips_before = round_trips.count
+    for query in queries:
+        start = time.perf_counter()
+        await target(query)
+        latencies.append(time.perf_counter() - start)
+    trips = (round_trips.count - trips_before) / len(queries)
+
+    peaks = []
+    for query in queries[:memory_calls]:
+        tracemalloc.start()
+        await target(query)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        "calls": len(queries),
+        "p50_ms": _percentile(latencies, 0.50) * 1000,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "round_trips_per_call": trips,
+        "peak_alloc_bytes": max(peaks) if peaks else None,
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict, baseline: dict | None) -> None:
+    print(f"{'size':>9} {'target':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'trips':>7}{'peak KiB':>11}")
+    for size, targets in results["sizes"].items():
+        for name, stats in targets.items():
+            line = (f"{size:>9} {name:<20}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+                    f"{stats['p99_ms']:>10.2f}{stats['round_trips_per_call']:>7.1f}"
+                    f"{(stats['peak_alloc_bytes'] or 0) / 1024:>11.0f}")
+            before = (baseline or {}).get("sizes", {}).get(size, {}).get(name)
+            if before:
+                line += f"   p95 {stats['p95_ms'] / before['p95_ms']:.2f}x vs baseline"
+            print(line)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    await init_db()
+    corpus = Corpus(args.seed)
+    round_trips = RoundTrips()
+    buddhi = BuddhiModule()
+    queries = [corpus.message() for _ in range(args.queries)]
+    targets = {
+        "habits": lambda q: habit_service.find_relevant_habits(q),
+        "learnings": lambda q: learning_service.find_relevant_learnings(q),
+        "learnings_filtered": lambda q: learning_service.find_relevant_learnings(q, modules="buddhi"),
+        "learnings_context": lambda q: buddhi.build_learnings_context(q, "buddhi"),
+    }
+
+    results = {
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "queries": args.queries,
+        "sizes": {},
+    }
+    current = 0
+    for size in sorted(int(s) for s in args.sizes.split(",")):
+        start = time.perf_counter()
+        await grow(corpus, current, size)
+        tenant_state.clear()  # rows were inserted behind the services' backs
+        current = size
+        print(f"-- {size} habits + {size} learnings (loaded in {time.perf_counter() - start:.1f}s)")
+        results["sizes"][str(size)] = {
+            name: await measure(target, queries, round_trips, args.memory_calls)
+            for name, target in targets.items()
+        }
+    await engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=20, help="Timed calls per target and size")
+    parser.add_argument("--memory-calls", type=int, default=3, help="Calls traced with tracemalloc")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", dest="json_path", help="Write results to this file")
+    parser.add_argument("--baseline", help="Earlier --json output to compare p95 against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Shared fixtures. The app is pointed at throwaway SQLite files before it is
+imported, so tests never touch a real `soul.db` or `tenants/` directory.
+"""
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+
+_data_dir = tempfile.mkdtemp(prefix="soul-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_data_dir}/soul.db"
+os.environ["TENANT_DATABASE_DIR"] = os.path.join(_data_dir, "tenants")
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.engine.streaming_engine import streaming_soul_engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models.database import current_tenant, engine, init_db, tenant_databases  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    """The app with its lifespan running (schema, config, ledger, background tasks)."""
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+async def db():
+    """Tables created in the default database, for tests that call services directly."""
+    await init_db()
+    yield
+    # Pooled connections belong to this test's event loop
+    await tenant_databases.close()
+    await engine.dispose()
+
+
+@pytest.fixture
+async def tenant(db):
+    """A fresh tenant with its database created; select it with `as_tenant`."""
+    name = f"t-{uuid.uuid4().hex[:8]}"
+    await tenant_databases.ensure(name)
+    return name
+
+
+@contextmanager
+def as_tenant(tenant: str):
+    token = current_tenant.set(tenant)
+    try:
+        yield tenant
+    finally:
+        current_tenant.reset(token)
+
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    """Replace the streamed pipeline with start/synthesis/done frames; returns the messages it ran."""
+    runs = []
+
+    async def stream(message, turn=None):
+        runs.append(message)
+        for event in ("start", "synthesis", "done"):
+            yield f"event: {event}\ndata: {{}}\n\n".encode()
+
+    monkeypatch.setattr(streaming_soul_engine, "stream", stream)
+    return runs
+
+
+def sse_frames(body: str) -> list[dict]:
+    """Parse an SSE body into [{"id": ..., "event": ...}, ...]."""
+    frames = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        frames.append(fields)
+    return frames
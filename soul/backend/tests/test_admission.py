@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.services.admission import AdmissionController, AdmissionRejected
+
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    monkeypatch.setattr(settings, "admission_max_in_flight", 1)
+    monkeypatch.setattr(settings, "admission_queue_limits", {"stream": 1, "chat": 1, "batch": 0, "trainer": 1})
+    monkeypatch.setattr(settings, "admission_queue_slo_ms", {"stream": 5000, "chat": 5000, "batch": 0, "trainer": 5000})
+    monkeypatch.setattr(settings, "tenant_max_in_flight", 0)
+
+
+async def test_sheds_when_lane_queue_is_full(one_slot):
+    controller = AdmissionController()
+    ticket = await controller.acquire("chat")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire("batch")
+    assert rejected.value.lane == "batch"
+    assert rejected.value.reason == "queue full"
+    assert rejected.value.retry_after >= 1
+
+    ticket.release()
+    assert controller.in_flight == 0
+
+
+async def test_sheds_when_expected_wait_exceeds_slo(one_slot, monkeypatch):
+    monkeypatch.setattr(settings, "admission_queue_slo_ms", {"stream": 5000, "chat": 500, "batch": 0, "trainer": 5000})
+    controller = AdmissionController()
+    controller._hold_time_ewma = 2.0
+    ticket = await controller.acquire("chat")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire("chat")
+    assert rejected.value.reason == "queue over latency SLO"
+    assert rejected.value.retry_after == 2
+    ticket.release()
+
+
+async def test_release_hands_slot_to_highest_lane_first(one_slot):
+    controller = AdmissionController()
+    ticket = await controller.acquire("chat")
+    trainer = asyncio.create_task(controller.acquire("trainer"))
+    stream = asyncio.create_task(controller.acquire("stream"))
+    await asyncio.sleep(0)
+    assert controller.queued() == 2
+
+    ticket.release()
+    stream_ticket = await stream
+    assert not trainer.done()
+    assert controller.in_flight == 1
+
+    stream_ticket.release()
+    (await trainer).release()
+    assert controller.in_flight == 0
+    assert controller.queued() == 0
+
+
+async def test_tenant_concurrency_limit(one_slot, monkeypatch):
+    monkeypatch.setattr(settings, "tenant_max_in_flight", 1)
+    controller = AdmissionController()
+    ticket = await controller.acquire("chat")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire("stream")
+    assert rejected.value.reason == "tenant concurrency"
+
+    ticket.release()
+    (await controller.acquire("stream")).release()
+
+
+def test_chat_answers_503_with_retry_after(client, monkeypatch):
+    monkeypatch.setattr(settings, "admission_max_in_flight", 0)
+    monkeypatch.setattr(settings, "admission_queue_limits", {"stream": 0, "chat": 0, "batch": 0, "trainer": 0})
+
+    response = client.post("/api/v1/chat", json={"message": "hello"})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.json()["lane"] == "chat"
+
+    response = client.post("/api/v1/chat/stream", json={"message": "hello"})
+    assert response.status_code == 503
+    assert response.json()["lane"] == "stream"
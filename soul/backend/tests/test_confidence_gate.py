@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from app.engine.confidence_gate import ConfidenceGate, FacultyFailed, faculties_cancelled, gate_decisions
+from app.models.schemas import BuddhiOutput, ManaOutput, SanskaraOutput
+
+WEIGHTS = {"manas": 0.3, "buddhi": 0.5, "sanskaras": 0.2}
+
+
+def _gate(threshold: float = 0.6, learning_mode: bool = True) -> ConfidenceGate:
+    return ConfidenceGate(weights=dict(WEIGHTS), threshold=threshold, learning_mode=learning_mode)
+
+
+def test_bounds_span_the_faculties_still_running():
+    gate = _gate()
+    assert gate.bounds == pytest.approx((0.0, 1.0))
+    gate.record("buddhi", 0.8)
+    assert gate.bounds == pytest.approx((0.4, 0.9))
+    gate.record("manas", 1.0)
+    gate.record("sanskaras", 0.5)
+    low, high = gate.bounds
+    assert low == pytest.approx(high) == pytest.approx(gate.weighted) == pytest.approx(0.8)
+
+
+def test_trainer_is_decided_once_the_upper_bound_falls_below_the_threshold():
+    gate = _gate(threshold=0.6)
+    before = gate_decisions.value(decision="trainer", faculties="1")
+    assert gate.record("manas", 0.9) is None  # high = 0.27 + 0.7
+    assert gate.record("buddhi", 0.1) == "trainer"  # high = 0.27 + 0.05 + 0.2
+    assert gate.decided_after == 2
+    assert gate.record("sanskaras", 1.0) == "trainer"
+    assert gate.decided_after == 2  # counted once
+    assert gate_decisions.value(decision="trainer", faculties="1") == before
+
+
+def test_synthesis_is_decided_at_the_threshold():
+    gate = _gate(threshold=0.5)
+    before = gate_decisions.value(decision="synthesis", faculties="1")
+    assert gate.record("buddhi", 1.0) == "synthesis"  # low = 0.5, not strictly above
+    assert gate.decided_after == 1
+    assert gate_decisions.value(decision="synthesis", faculties="1") == before + 1
+
+
+def test_outside_learning_mode_synthesis_is_not_recorded_as_a_decision():
+    gate = _gate(learning_mode=False)
+    assert gate.record("manas", 0.0) == "synthesis"
+    assert gate.decided_after is None
+
+
+async def _answer(output, delay: float = 0.0, ran: list | None = None):
+    await asyncio.sleep(delay)
+    if ran is not None:
+        ran.append(output.module)
+    return output, None
+
+
+async def test_run_cancels_faculties_once_the_trainer_is_certain():
+    gate = _gate(threshold=0.75)
+    ran = []
+    before = faculties_cancelled.value(faculty="sanskaras")
+    calls = {
+        "manas": _answer(ManaOutput(response="m", confidence=0.9)),
+        "buddhi": _answer(BuddhiOutput(response="b", confidence=0.1), delay=0.01),
+        "sanskaras": _answer(SanskaraOutput(response="s", confidence=1.0), delay=10, ran=ran),
+    }
+    seen = [name async for name, _, _ in gate.run(calls)]
+
+    assert seen == ["manas", "buddhi"]
+    assert gate.cancelled == ["sanskaras"]
+    assert ran == []
+    assert faculties_cancelled.value(faculty="sanskaras") == before + 1
+
+
+async def test_run_waits_for_every_faculty_when_synthesis_is_certain():
+    gate = _gate(threshold=0.1)
+    calls = {
+        "manas": _answer(ManaOutput(response="m", confidence=1.0)),
+        "buddhi": _answer(BuddhiOutput(response="b", confidence=0.0), delay=0.01),
+        "sanskaras": _answer(SanskaraOutput(response="s", confidence=0.0), delay=0.02),
+    }
+    seen = [name async for name, _, _ in gate.run(calls)]
+    assert seen == ["manas", "buddhi", "sanskaras"]
+    assert gate.cancelled == [] and gate.decided_after == 1
+
+
+async def test_failed_faculty_is_named():
+    async def fail():
+        raise RuntimeError("boom")
+
+    gate = _gate()
+    with pytest.raises(FacultyFailed) as failed:
+        async for _ in gate.run({"buddhi": fail()}):
+            pass
+    assert failed.value.faculty == "buddhi"
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models.config_model import ConfigVersion
+from app.models.database import DEFAULT_TENANT, tenant_databases
+from app.services.config_store import ConfigStore
+
+from tests.conftest import as_tenant
+
+
+async def _versions(tenant: str) -> list[dict]:
+    async with tenant_databases.sessionmaker(tenant)() as session:
+        rows = (await session.execute(select(ConfigVersion).order_by(ConfigVersion.id))).scalars().all()
+        return [json.loads(row.values) for row in rows]
+
+
+async def test_new_tenant_is_seeded_from_default(tenant):
+    store = ConfigStore()
+    with as_tenant(tenant):
+        await store.activate(tenant, created=True)
+        snapshot = store.current()
+    assert snapshot.version == 1
+    assert snapshot.values() == store._snapshots[DEFAULT_TENANT].values()
+    # Activating again does not seed a second version
+    await store.activate(tenant, created=False)
+    assert len(await _versions(tenant)) == 1
+
+
+async def test_updates_append_patched_versions(tenant):
+    store = ConfigStore()
+    with as_tenant(tenant):
+        await store.activate(tenant, created=True)
+        pinned = store.current()
+        await store.update({"temperature": 0.3})
+        snapshot = await store.update({"max_tokens": 500, "not_a_field": 1})
+
+    assert (snapshot.version, snapshot.temperature, snapshot.max_tokens) == (3, 0.3, 500)
+    # A turn's pinned snapshot never changes under it
+    assert (pinned.version, pinned.max_tokens) == (1, store._snapshots[DEFAULT_TENANT].max_tokens)
+    versions = await _versions(tenant)
+    assert len(versions) == 3
+    assert versions[-1]["temperature"] == 0.3 and "not_a_field" not in versions[-1]
+
+
+async def test_other_worker_picks_up_the_latest_version(tenant):
+    writer, reader = ConfigStore(), ConfigStore()
+    with as_tenant(tenant):
+        await writer.activate(tenant, created=True)
+        await reader.activate(tenant, created=False)
+        await writer.update({"confidence_threshold": 0.25})
+        assert reader.current().version == 1
+
+        assert await reader.refresh(tenant) is True
+        assert reader.current().version == 2
+        assert reader.current().confidence_threshold == 0.25
+        assert await reader.refresh(tenant) is False
+
+
+async def test_invalid_update_writes_nothing(tenant):
+    store = ConfigStore()
+    with as_tenant(tenant):
+        await store.activate(tenant, created=True)
+        with pytest.raises(ValueError):
+            await store.update({"adaptive_mode_exit_pressure": 0.99})
+    async with tenant_databases.sessionmaker(tenant)() as session:
+        assert await session.scalar(select(func.count(ConfigVersion.id))) == 1
@@ -0,0 +1,74 @@
+import pytest
+
+from app.config import settings
+from app.engine.context_packer import (
+    ELLIPSIS, ContextItem, ContextSection, estimate_tokens, pack_context, truncate_tokens,
+)
+
+
+@pytest.fixture(autouse=True)
+def item_cap(monkeypatch):
+    monkeypatch.setattr(settings, "context_item_max_tokens", 40)
+
+
+def _section(name: str, count: int, words: int, brief: bool = True) -> ContextSection:
+    items = [
+        ContextItem(
+            text=f"- {name} {i}: " + " ".join(["word"] * words),
+            brief=f"- {name} {i}" if brief else "",
+            ref=(name, i),
+        )
+        for i in range(count)
+    ]
+    return ContextSection(name=name, heading=f"{name.upper()}:", items=items, noun=name)
+
+
+def test_estimate_and_truncate():
+    assert estimate_tokens("hello world") == 4
+    assert estimate_tokens("a, b.") == 4
+    cut = truncate_tokens("one two three four five", 4)
+    assert cut == "one two" + ELLIPSIS
+    assert estimate_tokens(cut) <= 4
+    assert truncate_tokens("short", 10) == "short"
+
+
+def test_everything_fits_under_a_large_budget():
+    packed = pack_context("manas", _section("habits", 2, 3), _section("learnings", 2, 3), budget=1000)
+    assert packed.included == [("habits", 0), ("habits", 1), ("learnings", 0), ("learnings", 1)]
+    assert packed.sections["habits"].full == 2 and packed.sections["learnings"].full == 2
+    assert packed.text.startswith("\n\nHABITS:\n- habits 0:")
+    assert packed.tokens == estimate_tokens(packed.text)
+
+
+@pytest.mark.parametrize("budget", [10, 25, 60, 120, 250])
+def test_never_exceeds_budget(budget):
+    packed = pack_context("buddhi", _section("habits", 5, 30), _section("learnings", 5, 60), budget=budget)
+    assert packed.tokens <= budget
+    assert estimate_tokens(packed.text) <= budget
+
+
+def test_long_items_are_capped():
+    packed = pack_context("manas", _section("learnings", 1, 200), budget=1000)
+    assert packed.sections["learnings"].truncated == 1
+    assert packed.text.endswith(ELLIPSIS)
+    assert packed.tokens <= 40 + estimate_tokens("LEARNINGS:")
+
+
+def test_sections_compete_by_rank_and_fall_back_to_brief():
+    # The best habit and the best learning both come before any second-ranked item
+    packed = pack_context("manas", _section("habits", 3, 10), _section("learnings", 3, 10), budget=40)
+    assert packed.included == [("habits", 0), ("learnings", 0)]
+    assert packed.sections["habits"].dropped == 2
+
+    packed = pack_context("manas", _section("habits", 3, 10), _section("learnings", 3, 10), budget=60)
+    assert packed.sections["learnings"].brief == 1
+    assert packed.text.endswith("\n- learnings 1")
+    assert packed.tokens <= 60
+
+
+def test_items_that_no_longer_fit_are_truncated_then_dropped():
+    packed = pack_context("sanskaras", _section("habits", 6, 10, brief=False), budget=30)
+    report = packed.sections["habits"]
+    assert (report.full, report.truncated, report.dropped) == (1, 1, 4)
+    assert packed.included == [("habits", 0), ("habits", 1)]
+    assert packed.tokens == 30
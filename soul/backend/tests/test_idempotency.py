@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from app.services.idempotency import IdempotencyConflict, IdempotencyStore, fingerprint
+
+
+class Work:
+    """A turn that counts its runs and can be held open or made to fail."""
+
+    def __init__(self, result="response"):
+        self.result = result
+        self.runs = 0
+        self.release = asyncio.Event()
+        self.release.set()
+        self.fail = False
+
+    async def __call__(self):
+        self.runs += 1
+        await self.release.wait()
+        if self.fail:
+            raise RuntimeError("shed")
+        return self.result
+
+
+async def test_finished_turn_is_replayed():
+    store, work = IdempotencyStore(), Work()
+    assert await store.run("chat", "k1", "client", fingerprint("hi"), work) == ("response", False)
+    assert await store.run("chat", "k1", "client", fingerprint("hi"), work) == ("response", True)
+    assert work.runs == 1
+
+
+async def test_retry_joins_running_turn():
+    store, work = IdempotencyStore(), Work()
+    work.release.clear()
+    first = asyncio.create_task(store.run("chat", "k1", "client", fingerprint("hi"), work))
+    await asyncio.sleep(0)
+    retry = asyncio.create_task(store.run("chat", "k1", "client", fingerprint("hi"), work))
+    await asyncio.sleep(0)
+    assert not retry.done()
+
+    work.release.set()
+    assert await first == ("response", False)
+    assert await retry == ("response", True)
+    assert work.runs == 1
+
+
+async def test_turn_survives_its_client_going_away():
+    store, work = IdempotencyStore(), Work()
+    work.release.clear()
+    first = asyncio.create_task(store.run("chat", "k1", "client", fingerprint("hi"), work))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+
+    work.release.set()
+    assert await store.run("chat", "k1", "client", fingerprint("hi"), work) == ("response", True)
+    assert work.runs == 1
+
+
+async def test_same_key_for_a_different_request_conflicts():
+    store, work = IdempotencyStore(), Work()
+    await store.run("chat", "k1", "client", fingerprint("hi"), work)
+    with pytest.raises(IdempotencyConflict):
+        await store.run("chat", "k1", "client", fingerprint("bye"), work)
+    # Keys are scoped by client key and endpoint
+    assert await store.run("chat", "k1", "other", fingerprint("bye"), work) == ("response", False)
+    assert await store.run("stream", "k1", "client", fingerprint("bye"), work) == ("response", False)
+
+
+async def test_failed_turn_is_forgotten():
+    store, work = IdempotencyStore(), Work()
+    work.fail = True
+    with pytest.raises(RuntimeError):
+        await store.run("chat", "k1", "client", fingerprint("hi"), work)
+    assert len(store) == 0
+
+    work.fail = False
+    assert await store.run("chat", "k1", "client", fingerprint("hi"), work) == ("response", False)
+    assert work.runs == 2
+
+
+async def test_entry_expires_after_ttl():
+    store, work = IdempotencyStore(), Work()
+    await store.run("chat", "k1", "client", fingerprint("hi"), work, ttl_s=0.01)
+    await asyncio.sleep(0.05)
+    assert await store.run("chat", "k1", "client", fingerprint("hi"), work, ttl_s=0.01) == ("response", False)
+    assert work.runs == 2
+
+
+async def test_ttl_starts_when_done_hook_resolves():
+    store, work = IdempotencyStore(), Work()
+    finished = asyncio.Event()
+    await store.run("chat", "k1", "client", fingerprint("hi"), work, ttl_s=0.01, done=lambda _: finished.wait())
+    await asyncio.sleep(0.05)
+    assert await store.run("chat", "k1", "client", fingerprint("hi"), work) == ("response", True)
+
+    finished.set()
+    await asyncio.sleep(0.05)
+    assert await store.run("chat", "k1", "client", fingerprint("hi"), work) == ("response", False)
+    assert work.runs == 2
+
+
+def test_stream_endpoint_replays_and_rejects_conflicts(client, fake_stream):
+    headers = {"Idempotency-Key": "retry-1"}
+    first = client.post("/api/v1/chat/stream", json={"message": "hello"}, headers=headers)
+    assert first.status_code == 200
+    assert "Idempotent-Replayed" not in first.headers
+
+    retry = client.post("/api/v1/chat/stream", json={"message": "hello"}, headers=headers)
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.headers["X-Soul-Stream-Id"] == first.headers["X-Soul-Stream-Id"]
+    assert retry.text == first.text
+    assert fake_stream == ["hello"]
+
+    conflict = client.post("/api/v1/chat/stream", json={"message": "something else"}, headers=headers)
+    assert conflict.status_code == 422
@@ -0,0 +1,67 @@
+from sqlalchemy import delete
+
+from app.models.database import control_session
+from app.models.invalidation_model import InvalidationEvent
+from app.services.invalidation import InvalidationBus
+
+from tests.conftest import as_tenant
+
+
+def _recorder(bus: InvalidationBus, *topics: str) -> list:
+    seen = []
+    for topic in topics:
+        bus.subscribe(topic, lambda tenant, key, topic=topic: seen.append((topic, tenant, key)))
+    return seen
+
+
+async def _follower() -> InvalidationBus:
+    bus = InvalidationBus()
+    await bus.start()
+    await bus.stop()  # keep the starting position, poll by hand
+    return bus
+
+
+async def test_publish_delivers_locally_and_stamps(tenant):
+    bus = await _follower()
+    seen = _recorder(bus, "habits")
+    with as_tenant(tenant):
+        seq = await bus.publish("habits", 7)
+        await bus.publish_many("habits", [8, 9])
+    assert seen == [("habits", tenant, "7"), ("habits", tenant, "8"), ("habits", tenant, "9")]
+    assert bus.stamp("habits") > seq
+    # Our own events are not delivered a second time by the poll
+    assert await bus.poll() == 3
+    assert len(seen) == 3
+
+
+async def test_poll_delivers_other_workers_events(tenant):
+    writer, reader = InvalidationBus(), await _follower()
+    seen = _recorder(reader, "learnings")
+    with as_tenant(tenant):
+        seq = await writer.publish("learnings", 3)
+        await writer.publish("habits", 4)
+
+    assert reader.stamp("learnings") == 0
+    assert await reader.poll() == 2
+    assert seen == [("learnings", tenant, "3")]
+    assert reader.stamp("learnings") == seq
+    assert await reader.poll() == 0
+
+
+async def test_gap_in_sequence_invalidates_everything(tenant):
+    writer, reader = InvalidationBus(), await _follower()
+    with as_tenant(tenant):
+        await writer.publish("habits", 1)
+    await reader.poll()
+    seen = _recorder(reader, "habits", "learnings")
+
+    with as_tenant(tenant):
+        lost = await writer.publish("habits", 2)
+        await writer.publish("learnings", 3)
+    async with control_session() as session:
+        await session.execute(delete(InvalidationEvent).where(InvalidationEvent.seq == lost))
+        await session.commit()
+
+    await reader.poll()
+    assert sorted(seen[:2]) == [("habits", None, None), ("learnings", None, None)]
+    assert seen[2:] == [("learnings", tenant, "3")]
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.models.database import tenant_databases
+from app.models.learning_model import ArchivedLearning, Learning, LearningMention
+from app.services.invalidation import invalidation_bus
+from app.services.maintenance import DatabaseMaintenance, learnings_archived
+
+
+async def _add(tenant: str, status: str, age: timedelta, mentions: int = 0) -> int:
+    when = datetime.utcnow() - age
+    async with tenant_databases.sessionmaker(tenant)() as session:
+        learning = Learning(trigger_summary=f"{status} {age}", status=status, created_at=when, updated_at=when)
+        session.add(learning)
+        await session.flush()
+        session.add_all(
+            LearningMention(learning_id=learning.id, message=f"mention {i}", similarity=0.9)
+            for i in range(mentions)
+        )
+        await session.commit()
+        return learning.id
+
+
+async def _rows(tenant: str, model) -> list:
+    async with tenant_databases.sessionmaker(tenant)() as session:
+        return list((await session.execute(select(model))).scalars().all())
+
+
+async def test_archive_moves_old_superseded_and_pending_learnings(tenant, monkeypatch):
+    monkeypatch.setattr(settings, "learning_archive_batch_size", 2)
+    old = timedelta(seconds=settings.learning_pending_expiry_s + 60)
+    superseded = [await _add(tenant, "superseded", old, mentions=i) for i in range(3)]
+    expired = await _add(tenant, "pending", old, mentions=2)
+    fresh_pending = await _add(tenant, "pending", timedelta(seconds=60))
+    fresh_superseded = await _add(tenant, "superseded", timedelta(seconds=60))
+    active = await _add(tenant, "active", old)
+    before = learnings_archived.value(reason="superseded")
+    trainer_stamp = invalidation_bus.stamp("trainer")
+
+    maintenance = DatabaseMaintenance()
+    assert await maintenance.archive(tenant) == {"superseded": 3, "expired": 1}
+    assert learnings_archived.value(reason="superseded") == before + 3
+    assert invalidation_bus.stamp("trainer") > trainer_stamp
+
+    assert {l.id for l in await _rows(tenant, Learning)} == {fresh_pending, fresh_superseded, active}
+    assert await _rows(tenant, LearningMention) == []
+    archived = {a.learning_id: a for a in await _rows(tenant, ArchivedLearning)}
+    assert set(archived) == {*superseded, expired}
+    assert [archived[i].mentions for i in superseded] == [0, 1, 2]
+    assert (archived[expired].archive_reason, archived[expired].status, archived[expired].mentions) == (
+        "expired", "pending", 2,
+    )
+
+    # Idempotent: nothing left to move, and no trainer event
+    trainer_stamp = invalidation_bus.stamp("trainer")
+    assert await maintenance.archive(tenant) == {"superseded": 0, "expired": 0}
+    assert invalidation_bus.stamp("trainer") == trainer_stamp
+
+
+async def test_analyze_is_claimed_once_per_interval(tenant):
+    first, second = DatabaseMaintenance(), DatabaseMaintenance()
+    assert "analyze" in await first.compact(tenant)
+    assert "analyze" not in await second.compact(tenant)
+
+
+async def test_tenants_lists_default_first(tenant):
+    tenants = DatabaseMaintenance().tenants()
+    assert tenants[0] == "default"
+    assert tenant in tenants and tenants.count("default") == 1
@@ -0,0 +1,7 @@
+def test_metrics_served_at_root_for_any_tenant_header(client):
+    response = client.get("/metrics", headers={"X-Soul-Tenant": "Not A Tenant!"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE soul_admission_in_flight gauge" in response.text
+
+    assert client.get("/api/v1/metrics").status_code == 404
@@ -0,0 +1,72 @@
+from dataclasses import replace
+
+import pytest
+
+from app.engine.mode_controller import ModeController
+from app.models.database import current_tenant
+from app.services.config_store import config_store
+from app.services.turn_context import TurnContext
+
+
+@pytest.fixture
+def adaptive_config():
+    return replace(
+        config_store.current(),
+        adaptive_mode_enabled=True,
+        combined_mode=False,
+        adaptive_mode_enter_pressure=0.75,
+        adaptive_mode_exit_pressure=0.5,
+        adaptive_mode_min_dwell_s=0,
+    )
+
+
+def _choose(controller: ModeController, config, tenant: str = "default") -> tuple[bool, str]:
+    token = current_tenant.set(tenant)
+    try:
+        return controller.choose(TurnContext(tenant=tenant, config=config))
+    finally:
+        current_tenant.reset(token)
+
+
+def test_switches_on_pressure_and_recovers(adaptive_config, monkeypatch):
+    controller = ModeController()
+    pressure = {"load": 0.0}
+    monkeypatch.setattr(controller, "signals", lambda tenant=None: dict(pressure))
+
+    assert _choose(controller, adaptive_config) == (False, "steady")
+    pressure["load"] = 0.8
+    assert _choose(controller, adaptive_config) == (True, "load")
+    pressure["load"] = 0.6
+    assert _choose(controller, adaptive_config) == (True, "load")
+    pressure["load"] = 0.4
+    assert _choose(controller, adaptive_config) == (False, "recovered")
+
+
+def test_mode_is_kept_per_tenant(adaptive_config, monkeypatch):
+    controller = ModeController()
+    monkeypatch.setattr(controller, "signals", lambda tenant=None: {"budget": 0.9 if tenant == "noisy" else 0.1})
+
+    assert _choose(controller, adaptive_config, "noisy") == (True, "budget")
+    assert _choose(controller, adaptive_config, "quiet") == (False, "steady")
+
+    controller.evict("noisy")
+    monkeypatch.setattr(controller, "signals", lambda tenant=None: {"budget": 0.6})
+    # Re-seeded from config after eviction, and 0.6 is below the enter pressure
+    assert _choose(controller, adaptive_config, "noisy") == (False, "steady")
+
+
+def test_enter_pressure_must_exceed_exit_pressure(adaptive_config):
+    with pytest.raises(ValueError):
+        replace(adaptive_config, adaptive_mode_enter_pressure=0.5)
+
+
+def test_config_update_rejects_inverted_pressures(client):
+    before = client.get("/api/v1/config").json()
+    response = client.put("/api/v1/config", json={"adaptive_mode_exit_pressure": 0.9})
+    assert response.status_code == 422
+    assert client.get("/api/v1/config").json()["version"] == before["version"]
+
+    response = client.put("/api/v1/config", json={"adaptive_mode_enter_pressure": 0.95, "adaptive_mode_exit_pressure": 0.9})
+    assert response.status_code == 200
+    assert response.json()["adaptive_mode_exit_pressure"] == 0.9
+    client.put("/api/v1/config", json={"adaptive_mode_enter_pressure": 0.75, "adaptive_mode_exit_pressure": 0.5})
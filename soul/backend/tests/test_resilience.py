@@ -0,0 +1,105 @@
+import pytest
+
+from app.config import settings
+from app.services.resilience import CircuitBreaker
+
+
+@pytest.fixture(autouse=True)
+def breaker_settings(monkeypatch):
+    monkeypatch.setattr(settings, "breaker_window_s", 30.0)
+    monkeypatch.setattr(settings, "breaker_min_requests", 4)
+    monkeypatch.setattr(settings, "breaker_error_rate", 0.5)
+    monkeypatch.setattr(settings, "breaker_open_s", 15.0)
+    monkeypatch.setattr(settings, "breaker_half_open_probes", 1)
+
+
+def _call(breaker: CircuitBreaker, ok: bool) -> None:
+    permit = breaker.acquire()
+    assert permit == "call"
+    breaker.record(permit, ok)
+
+
+def _open(breaker: CircuitBreaker) -> None:
+    for ok in (True, False, True, False):
+        _call(breaker, ok)
+    assert breaker.state == "open"
+
+
+def _elapse_open_period(breaker: CircuitBreaker) -> None:
+    breaker._opened_at -= settings.breaker_open_s
+
+
+def test_opens_at_error_rate_once_enough_calls_are_seen():
+    breaker = CircuitBreaker("model-a")
+    for ok in (False, False, False):
+        _call(breaker, ok)
+    # Below breaker_min_requests: still closed however bad the rate
+    assert breaker.state == "closed"
+    _call(breaker, False)
+    assert breaker.state == "open"
+    assert breaker.acquire() is None
+
+
+def test_stays_closed_below_error_rate():
+    breaker = CircuitBreaker("model-a")
+    for ok in (True, True, True, False, True, False):
+        _call(breaker, ok)
+    assert breaker.state == "closed"
+
+
+def test_half_open_probe_success_closes():
+    breaker = CircuitBreaker("model-a")
+    _open(breaker)
+    _elapse_open_period(breaker)
+
+    assert breaker.acquire() == "probe"
+    assert breaker.state == "half_open"
+    # Only breaker_half_open_probes probes at a time
+    assert breaker.acquire() is None
+    breaker.record("probe", True)
+    assert breaker.state == "closed"
+    assert breaker.acquire() == "call"
+
+
+def test_half_open_probe_failure_reopens():
+    breaker = CircuitBreaker("model-a")
+    _open(breaker)
+    _elapse_open_period(breaker)
+
+    assert breaker.acquire() == "probe"
+    breaker.record("probe", False)
+    assert breaker.state == "open"
+    assert breaker.acquire() is None
+
+
+def test_abandoned_probe_frees_its_slot():
+    breaker = CircuitBreaker("model-a")
+    _open(breaker)
+    _elapse_open_period(breaker)
+
+    assert breaker.acquire() == "probe"
+    breaker.record("probe", None)
+    assert breaker.state == "half_open"
+    assert breaker.acquire() == "probe"
+
+
+def test_needs_every_probe_to_succeed(monkeypatch):
+    monkeypatch.setattr(settings, "breaker_half_open_probes", 2)
+    breaker = CircuitBreaker("model-a")
+    _open(breaker)
+    _elapse_open_period(breaker)
+
+    assert breaker.acquire() == "probe"
+    assert breaker.acquire() == "probe"
+    breaker.record("probe", True)
+    assert breaker.state == "half_open"
+    breaker.record("probe", True)
+    assert breaker.state == "closed"
+
+
+def test_calls_started_before_opening_do_not_count_afterwards():
+    breaker = CircuitBreaker("model-a")
+    in_flight = breaker.acquire()
+    _open(breaker)
+    breaker.record(in_flight, True)
+    assert breaker.state == "open"
@@ -0,0 +1,125 @@
+from dataclasses import replace
+
+import pytest
+
+from app.config import settings
+from app.engine.response_cache import LRUCache, ResponseCache, normalize_message
+from app.services.claude_client import TokenUsageData
+from app.services.config_store import config_store
+from app.services.invalidation import invalidation_bus
+from app.services.resilience import fallback_served
+from app.services.turn_context import TurnContext, use_turn
+
+from tests.conftest import as_tenant
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(settings, "response_cache_enabled", True)
+
+
+def _turn(tenant: str = "default", **config) -> TurnContext:
+    return TurnContext(tenant=tenant, config=replace(config_store.current(), **config))
+
+
+class Call:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return {"response": f"answer {self.calls}"}, TokenUsageData(input_tokens=10, output_tokens=5)
+
+
+def test_lru_bound_and_ttl():
+    cache = LRUCache("faculty", max_entries=2, ttl_s=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None  # least recently used
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+    cache.ttl_s = -1
+    cache.put("d", 4)
+    assert cache.get("d") is None
+
+
+def test_invalidation_by_row_topic_and_tenant():
+    cache = LRUCache("faculty", max_entries=10, ttl_s=60)
+    cache.put("habit-1", 1, frozenset({("habits", "a", 1)}))
+    cache.put("habit-2", 2, frozenset({("habits", "a", 2), ("learnings", "a", 9)}))
+    cache.put("other-tenant", 3, frozenset({("habits", "b", 1)}))
+
+    cache.invalidate("habits", "a", 1)
+    assert cache.get("habit-1") is None and cache.get("habit-2") == 2
+    cache.invalidate("learnings", "a", None)
+    assert cache.get("habit-2") is None
+    assert cache.get("other-tenant") == 3
+    cache.invalidate("habits", None, None)
+    assert len(cache) == 0
+
+
+def test_keys_are_versioned_by_config_and_tenant():
+    cache = ResponseCache()
+
+    def key(turn: TurnContext, message: str = "What is love?") -> str:
+        with use_turn(turn):
+            return cache.faculty_key("manas", message, "context", "prompt", 300)
+
+    base = key(_turn())
+    assert key(_turn(), "  what is LOVE ") == base
+    assert normalize_message("  What is LOVE?! ") == "what is love"
+    assert key(_turn(temperature=0.123)) != base
+    assert key(_turn(faculty_model="other-model")) != base
+    assert key(_turn(tenant="someone-else")) != base
+    with use_turn(_turn()):
+        assert cache.faculty_key("manas", "What is love?", "changed context", "prompt", 300) != base
+
+
+async def test_faculty_results_are_reused_until_invalidated(enabled, tenant):
+    cache, call = ResponseCache(), Call()
+    deps = frozenset({("habits", tenant, 5)})
+    with as_tenant(tenant), use_turn(_turn(tenant)):
+        first, usage = await cache.faculty_json("manas", "k", deps, call)
+        again, cached_usage = await cache.faculty_json("manas", "k", deps, call)
+        assert again == first and call.calls == 1
+        assert (usage.input_tokens, cached_usage.input_tokens) == (10, 0)
+
+        await invalidation_bus.publish("habits", 5)
+        await cache.faculty_json("manas", "k", deps, call)
+        assert call.calls == 2
+
+
+async def test_disabled_or_fallback_results_are_not_cached(monkeypatch, enabled):
+    cache, call = ResponseCache(), Call()
+    with use_turn(_turn()):
+        async def fallback():
+            fallback_served.set(True)
+            return await call()
+
+        await cache.faculty_json("manas", "k", frozenset(), fallback)
+        await cache.faculty_json("manas", "k", frozenset(), call)
+        assert call.calls == 2
+
+        monkeypatch.setattr(settings, "response_cache_enabled", False)
+        await cache.faculty_json("buddhi", "k2", frozenset(), call)
+        await cache.faculty_json("buddhi", "k2", frozenset(), call)
+        assert call.calls == 4
+
+
+async def test_response_key_needs_every_faculty(enabled):
+    cache = ResponseCache()
+    with use_turn(_turn()):
+        cache.record("manas", "m", frozenset({("habits", "default", 1)}))
+        cache.record("buddhi", "b", frozenset())
+        assert cache.response_key("synthesis prompt") is None
+
+        cache.record("sanskaras", "s", frozenset({("learnings", "default", 2)}))
+        key, deps = cache.response_key("synthesis prompt")
+        assert deps == {("habits", "default", 1), ("learnings", "default", 2)}
+        assert cache.response_key("other prompt")[0] != key
+
+    with use_turn(_turn()):
+        cache.record("combined", "c", frozenset())
+        assert cache.response_key("synthesis prompt") is not None
@@ -0,0 +1,87 @@
+import json
+from dataclasses import replace
+
+from app.engine.sanskaras import MAX_CONFIDENCE, NO_MATCH_CONFIDENCE, local_output
+from app.engine.soul_engine import soul_engine
+from app.engine.streaming_engine import streaming_soul_engine
+from app.models.habit_model import Habit
+from app.services.claude_client import TokenUsageData, claude_client
+from app.services.config_store import config_store
+from app.services.habit_service import HabitMatch
+from app.services.turn_context import TurnContext, use_turn
+
+from tests.conftest import as_tenant, sse_frames
+
+
+def _match(name: str, score: float, valence: float = 0.0) -> HabitMatch:
+    habit = Habit(name=name, description=f"{name} description", category="test", base_weight=1.0,
+                  repetition_count=1, valence=valence)
+    return HabitMatch(habit, score, ["word"])
+
+
+def test_output_is_deterministic_and_ranked():
+    matches = [_match("steady_patience", 4.0, 0.5), _match("quiet_caution", 2.5), _match("faint_echo", 0.5)]
+    first, second = local_output(matches), local_output(list(matches))
+    assert first == second
+    assert first.response.startswith("The strongest impression here is steady patience")
+    assert "Quiet caution stirs as well." in first.response
+    assert "faint echo" not in first.response  # under half the top score
+    assert [h["name"] for h in first.activated_habits] == ["steady_patience", "quiet_caution", "faint_echo"]
+    assert first.metadata == {"mode": "deterministic"}
+
+
+def test_confidence_rises_with_score_and_drops_on_conflict():
+    assert local_output([]).confidence == NO_MATCH_CONFIDENCE
+    weak, strong = local_output([_match("a", 1.0)]), local_output([_match("a", 9.0)])
+    assert weak.confidence < strong.confidence < MAX_CONFIDENCE
+
+    conflicted = local_output([_match("hope", 9.0, 0.8), _match("dread", 8.0, -0.8)])
+    assert conflicted.confidence < strong.confidence
+    assert "Hope pulls one way while dread pulls the other." in conflicted.response
+
+
+class CombinedCall:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, system_prompt, user_message, model, max_tokens, **kwargs):
+        self.calls.append((system_prompt, max_tokens))
+        return {
+            "manas": {"response": "feel", "confidence": 0.8, "valence": 0.2},
+            "buddhi": {"response": "think", "confidence": 0.7},
+            "sanskaras": {"response": "model habits", "confidence": 1.0},
+        }, TokenUsageData(input_tokens=10, output_tokens=5)
+
+
+def _deterministic_turn(tenant: str) -> TurnContext:
+    return TurnContext(tenant=tenant, config=replace(config_store.current(), sanskaras_mode="deterministic"))
+
+
+async def test_combined_mode_leaves_sanskaras_out_of_the_call(tenant, monkeypatch):
+    call = CombinedCall()
+    monkeypatch.setattr(claude_client, "complete_json", call)
+    with as_tenant(tenant), use_turn(_deterministic_turn(tenant)):
+        manas, buddhi, sanskaras, _ = await soul_engine._process_combined("hello there")
+
+    prompt, max_tokens = call.calls[0]
+    assert "SANSKARAS" not in prompt and '"sanskaras"' not in prompt
+    assert max_tokens < 800
+    assert (manas.response, buddhi.response) == ("feel", "think")
+    assert sanskaras.metadata == {"mode": "deterministic"}
+    assert "SANSKARAS" in soul_engine.combined_prompt()
+
+
+async def test_streamed_combined_mode_leaves_sanskaras_out_of_the_call(tenant, monkeypatch):
+    call = CombinedCall()
+    monkeypatch.setattr(claude_client, "complete_json", call)
+    turn = _deterministic_turn(tenant)
+    with as_tenant(tenant), use_turn(turn):
+        frames = [
+            frame async for frame in streaming_soul_engine._stream_combined(
+                "hello there", 0.0, TokenUsageData(), turn,
+            )
+        ]
+
+    assert "SANSKARAS" not in call.calls[0][0]
+    sanskaras = next(f for f in sse_frames(b"".join(frames).decode()) if f["event"] == "sanskaras")
+    assert json.loads(sanskaras["data"])["response"] != "model habits"
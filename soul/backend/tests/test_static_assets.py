@@ -0,0 +1,110 @@
+import gzip
+import os
+
+import pytest
+from starlette.testclient import TestClient
+
+from app.config import settings
+from app.services.static_assets import IMMUTABLE, REVALIDATE, StaticAssets, _accepted, static_responses
+
+SCRIPT = b"console.log('soul');\n" * 200
+
+
+@pytest.fixture
+def dist(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_bytes(b"<!doctype html><title>soul</title>")
+    (tmp_path / "assets" / "index-BdX3k2_a.js").write_bytes(SCRIPT)
+    (tmp_path / "logo.png").write_bytes(os.urandom(4096))
+    return tmp_path
+
+
+def _client(directory, write_variants: bool = True) -> TestClient:
+    assets = StaticAssets(directory)
+    assets.prepare(write_variants=write_variants)
+    return TestClient(assets)
+
+
+def test_accept_encoding_parsing():
+    assert _accepted("gzip, br;q=0.5") == {"gzip", "br"}
+    assert _accepted("gzip;q=0, br") == {"br"}
+    assert _accepted("*, gzip;q=0") == {"*", "br"}
+    assert _accepted("") == {""}
+
+
+def test_gzip_variant_is_negotiated_and_written(dist):
+    client = _client(dist)
+    assert (dist / "assets" / "index-BdX3k2_a.js.gz").exists()
+
+    plain = client.get("/assets/index-BdX3k2_a.js", headers={"Accept-Encoding": "identity"})
+    zipped = client.get("/assets/index-BdX3k2_a.js", headers={"Accept-Encoding": "gzip"})
+    assert plain.content == SCRIPT and "content-encoding" not in plain.headers
+    assert zipped.headers["content-encoding"] == "gzip"
+    assert zipped.content == SCRIPT  # decoded by the client
+    assert zipped.headers["etag"] == plain.headers["etag"][:-1] + '-gz"'
+    assert plain.headers["vary"] == zipped.headers["vary"] == "Accept-Encoding"
+    assert zipped.headers["cache-control"] == IMMUTABLE
+
+
+def test_small_and_binary_files_are_sent_as_is(dist):
+    client = _client(dist)
+    page = client.get("/", headers={"Accept-Encoding": "gzip"})
+    assert page.content.startswith(b"<!doctype html>")
+    assert "content-encoding" not in page.headers
+    assert page.headers["cache-control"] == REVALIDATE
+
+    image = client.get("/logo.png", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in image.headers and "vary" not in image.headers
+    assert not (dist / "logo.png.gz").exists()
+
+
+def test_if_none_match_is_answered_with_304_per_encoding(dist):
+    client = _client(dist)
+    path = "/assets/index-BdX3k2_a.js"
+    etag = client.get(path, headers={"Accept-Encoding": "gzip"}).headers["etag"]
+
+    cached = client.get(path, headers={"Accept-Encoding": "gzip", "If-None-Match": f"W/{etag}"})
+    assert cached.status_code == 304 and cached.content == b""
+    # The gzip ETag never matches the identity bytes
+    assert client.get(path, headers={"Accept-Encoding": "identity", "If-None-Match": etag}).status_code == 200
+
+
+def test_existing_variant_is_reused_unless_older_than_the_file(dist):
+    script = dist / "assets" / "index-BdX3k2_a.js"
+    prebuilt = script.with_name(script.name + ".gz")
+    prebuilt.write_bytes(gzip.compress(b"prebuilt", mtime=0))
+    response = _client(dist).get("/assets/index-BdX3k2_a.js", headers={"Accept-Encoding": "gzip"})
+    assert response.content == b"prebuilt"
+
+    stale = script.stat().st_mtime - 60
+    os.utime(prebuilt, (stale, stale))
+    response = _client(dist).get("/assets/index-BdX3k2_a.js", headers={"Accept-Encoding": "gzip"})
+    assert response.content == SCRIPT
+
+
+def test_large_files_are_streamed_from_disk(dist, monkeypatch):
+    monkeypatch.setattr(settings, "static_memory_file_max_bytes", 50)
+    client = _client(dist, write_variants=False)
+    before = static_responses.value(encoding="identity", source="disk")
+    assert client.get("/assets/index-BdX3k2_a.js", headers={"Accept-Encoding": "identity"}).content == SCRIPT
+    assert static_responses.value(encoding="identity", source="disk") == before + 1
+    # A variant that could not be written and is too large to hold is simply not offered
+    response = client.get("/assets/index-BdX3k2_a.js", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+
+def test_unknown_paths_and_methods(dist):
+    client = _client(dist)
+    assert client.get("/missing.js").status_code == 404
+    (dist / "404.html").write_bytes(b"lost")
+    client = _client(dist)
+    missing = client.get("/missing.js")
+    assert (missing.status_code, missing.content) == (404, b"lost")
+    assert client.post("/").status_code == 405
+
+
+def test_brotli_is_preferred_when_available(dist):
+    pytest.importorskip("brotli")
+    response = _client(dist).get("/assets/index-BdX3k2_a.js", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["etag"].endswith('-br"')
@@ -0,0 +1,135 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import pytest
+
+from app.config import settings
+from app.models.database import current_tenant
+from app.services.admission import admission_controller
+from app.services.stream_replay import ReplayFull, StreamReplay, TurnStream, stream_replay
+
+from tests.conftest import sse_frames
+
+
+async def _collect(stream: TurnStream, after: int = 0) -> list[bytes]:
+    return [frame async for frame in stream.follow(after=after)]
+
+
+async def test_follow_replays_after_offset_then_continues_live():
+    stream = TurnStream("s1", "default")
+    stream.append(b"data: a\n\n")
+    stream.append(b"data: b\n\n")
+
+    reader = asyncio.create_task(_collect(stream, after=1))
+    await asyncio.sleep(0)
+    stream.append(b"data: c\n\n")
+    stream.finish()
+
+    assert await reader == [b"id: s1:2\ndata: b\n\n", b"id: s1:3\ndata: c\n\n"]
+    # A finished stream replays straight away
+    assert await _collect(stream) == [b"id: s1:1\ndata: a\n\n", b"id: s1:2\ndata: b\n\n", b"id: s1:3\ndata: c\n\n"]
+    assert await _collect(stream, after=3) == []
+
+
+async def test_wait_done_returns_when_turn_ends():
+    stream = TurnStream("s1", "default")
+    waiter = asyncio.create_task(stream.wait_done())
+    stream.append(b"data: a\n\n")
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    stream.finish()
+    await asyncio.wait_for(waiter, 1)
+
+
+async def test_buffer_is_dropped_after_ttl_and_scoped_to_tenant(monkeypatch):
+    monkeypatch.setattr(settings, "stream_replay_ttl_s", 0.05)
+    replay = StreamReplay()
+    finished = []
+
+    async def events():
+        yield b"data: a\n\n"
+
+    stream = replay.start(events(), on_done=lambda: finished.append(True))
+    await stream.wait_done()
+    assert finished == [True]
+    assert replay.get(stream.stream_id) is stream
+
+    token = current_tenant.set("other")
+    try:
+        assert replay.get(stream.stream_id) is None
+    finally:
+        current_tenant.reset(token)
+
+    await asyncio.sleep(0.1)
+    assert replay.get(stream.stream_id) is None
+
+
+def test_resume_with_last_event_id(client, fake_stream):
+    response = client.post("/api/v1/chat/stream", json={"message": "hello"})
+    assert response.status_code == 200
+    stream_id = response.headers["X-Soul-Stream-Id"]
+    assert [f["event"] for f in sse_frames(response.text)] == ["start", "synthesis", "done"]
+
+    resumed = client.post(
+        "/api/v1/chat/stream", json={"message": "hello"}, headers={"Last-Event-ID": f"{stream_id}:1"},
+    )
+    assert resumed.status_code == 200
+    assert [f["id"] for f in sse_frames(resumed.text)] == [f"{stream_id}:2", f"{stream_id}:3"]
+    assert fake_stream == ["hello"]
+
+
+def test_resume_of_expired_stream_is_gone(client, fake_stream, monkeypatch):
+    monkeypatch.setattr(settings, "stream_replay_ttl_s", 0.05)
+    stream_id = client.post("/api/v1/chat/stream", json={"message": "hello"}).headers["X-Soul-Stream-Id"]
+    time.sleep(0.2)
+
+    response = client.post(
+        "/api/v1/chat/stream", json={"message": "hello"}, headers={"Last-Event-ID": f"{stream_id}:1"},
+    )
+    assert response.status_code == 410
+
+    response = client.post(
+        "/api/v1/chat/stream", json={"message": "hello"}, headers={"Last-Event-ID": "not-an-id"},
+    )
+    assert response.status_code == 400
+
+
+async def test_full_replay_evicts_finished_streams_before_running_ones(monkeypatch):
+    monkeypatch.setattr(settings, "stream_replay_max_streams", 2)
+    replay = StreamReplay()
+    hold = asyncio.Event()
+
+    async def running():
+        yield b"data: a\n\n"
+        await hold.wait()
+
+    async def finished():
+        yield b"data: a\n\n"
+
+    live = replay.start(running(), on_done=lambda: None)
+    done = replay.start(finished(), on_done=lambda: None)
+    await done.wait_done()
+
+    newer = replay.start(running(), on_done=lambda: None)
+    assert replay.get(done.stream_id) is None
+    assert replay.get(live.stream_id) is live
+    assert replay.get(newer.stream_id) is newer
+
+    with pytest.raises(ReplayFull):
+        replay.start(finished(), on_done=lambda: None)
+    assert replay.get(live.stream_id) is live
+    hold.set()
+    await live.wait_done()
+    await newer.wait_done()
+
+
+def test_stream_is_shed_when_every_buffer_is_running(client, fake_stream, monkeypatch):
+    monkeypatch.setattr(settings, "stream_replay_max_streams", 1)
+    monkeypatch.setattr(stream_replay, "_streams", OrderedDict(running=TurnStream("running", "default")))
+
+    response = client.post("/api/v1/chat/stream", json={"message": "hello"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert fake_stream == []
+    assert admission_controller.in_flight == 0
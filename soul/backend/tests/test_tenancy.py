@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.config import settings
+from app.services.invalidation import invalidation_bus
+from app.services.tenancy import TenantStateCache, estimate_bytes
+
+from tests.conftest import as_tenant
+
+
+class Loader:
+    def __init__(self, text: str = "habit"):
+        self.text = text
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return [SimpleNamespace(id=self.calls, text=self.text)]
+
+
+async def test_state_is_cached_per_tenant():
+    cache = TenantStateCache()
+    first, second = Loader(), Loader()
+    with as_tenant("alpha"):
+        assert (await cache.get("habits", first))[0].id == 1
+        assert (await cache.get("habits", first))[0].id == 1
+    with as_tenant("beta"):
+        assert (await cache.get("habits", second))[0].id == 1
+    assert (first.calls, second.calls) == (1, 1)
+
+    cache.drop("alpha", "habits")
+    with as_tenant("beta"):
+        await cache.get("habits", second)
+    with as_tenant("alpha"):
+        await cache.get("habits", first)
+    assert (first.calls, second.calls) == (2, 1)
+
+
+async def test_lru_evicts_least_recent_tenant_under_the_byte_cap(monkeypatch):
+    cache = TenantStateCache()
+    evicted = []
+    cache.on_evict(evicted.append)
+    size = estimate_bytes(await Loader()())
+    monkeypatch.setattr(settings, "tenant_cache_max_bytes", size * 2)
+
+    loaders = {name: Loader() for name in ("a", "b", "c")}
+    for name in ("a", "b"):
+        with as_tenant(name):
+            await cache.get("habits", loaders[name])
+    with as_tenant("a"):
+        await cache.get("habits", loaders["a"])  # "b" is now least recent
+    with as_tenant("c"):
+        await cache.get("habits", loaders["c"])
+
+    assert evicted == ["b"]
+    assert len(cache) == 2 and cache.bytes == size * 2
+    with as_tenant("b"):
+        await cache.get("habits", loaders["b"])
+    assert loaders["b"].calls == 2
+
+
+async def test_state_larger_than_the_cap_reads_through(monkeypatch):
+    cache = TenantStateCache()
+    monkeypatch.setattr(settings, "tenant_cache_max_bytes", 10)
+    loader = Loader()
+    with as_tenant("alpha"):
+        await cache.get("habits", loader)
+        await cache.get("habits", loader)
+    assert loader.calls == 2 and len(cache) == 0
+
+
+async def test_change_published_during_a_slow_load_is_not_lost(tenant):
+    cache = TenantStateCache()
+    loading, release = asyncio.Event(), asyncio.Event()
+    loader = Loader()
+
+    async def slow():
+        loading.set()
+        await release.wait()
+        return await loader()
+
+    with as_tenant(tenant):
+        reader = asyncio.create_task(cache.get("habits", slow))
+        await loading.wait()
+        await invalidation_bus.publish("habits", 1)
+        release.set()
+        assert (await reader)[0].id == 1  # the caller still gets its rows
+
+        assert (await cache.get("habits", loader))[0].id == 2
+        assert (await cache.get("habits", loader))[0].id == 2
+
+
+async def test_drop_of_every_tenant_during_a_load_is_not_lost():
+    cache = TenantStateCache()
+    loader = Loader()
+
+    async def dropping():
+        cache.drop(None)
+        return await loader()
+
+    with as_tenant("alpha"):
+        await cache.get("learnings", dropping)
+        await cache.get("learnings", loader)
+        await cache.get("learnings", loader)
+    assert loader.calls == 2
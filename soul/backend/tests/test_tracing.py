@@ -0,0 +1,41 @@
+import json
+import threading
+
+from app.config import settings
+from app.services.tracing import JsonlSpanExporter, Span
+
+
+def _span(name: str) -> Span:
+    return Span(name=name, trace_id="0" * 32, span_id="1" * 16, end_ns=1)
+
+
+def test_write_error_is_counted_and_exporter_keeps_running(tmp_path):
+    exporter = JsonlSpanExporter(str(tmp_path))  # a directory: every open() fails
+    exporter.export([_span("lost")])
+    exporter.shutdown()
+    assert exporter.dropped == {"write_error": 1}
+
+    exporter.path = str(tmp_path / "traces.jsonl")
+    exporter.export([_span("kept")])
+    exporter.shutdown()
+    lines = (tmp_path / "traces.jsonl").read_text().splitlines()
+    assert [json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"][0]["name"] for line in lines] == ["kept"]
+
+
+def test_full_queue_drops_traces(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "trace_export_queue_size", 2)
+    exporter = JsonlSpanExporter(str(tmp_path / "traces.jsonl"))
+    writing, blocked = threading.Event(), threading.Event()
+    write = exporter._write
+    monkeypatch.setattr(exporter, "_write", lambda spans: (writing.set(), blocked.wait(5), write(spans)))
+
+    exporter.export([_span("span-0")])
+    assert writing.wait(5)
+    for i in range(1, 5):
+        exporter.export([_span(f"span-{i}")])
+    # One trace is being written, two wait; the rest are dropped
+    assert exporter.dropped == {"queue_full": 2}
+
+    blocked.set()
+    exporter.shutdown()
+    assert len((tmp_path / "traces.jsonl").read_text().splitlines()) == 3
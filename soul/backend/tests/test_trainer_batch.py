@@ -0,0 +1,48 @@
+import pytest
+
+from app.models.schemas import TrainerBatchItem
+from app.services.learning_service import BatchRejected, learning_service
+
+
+async def _pending(question: str):
+    return await learning_service.create_pending(question, f"How to answer: {question}", "batch,test")
+
+
+async def test_rejected_batch_applies_nothing(db):
+    pending = await _pending("first question")
+    other = await _pending("second question")
+    active = await learning_service.create_active("q", "t", "k", "old guidance", "old note")
+
+    items = [
+        TrainerBatchItem(id=pending.id, action="activate", guidance="g", application_note="n"),
+        TrainerBatchItem(id=other.id, action="supersede"),
+        TrainerBatchItem(id=active.id, action="activate", guidance="g", application_note="n"),
+        TrainerBatchItem(id=10_000_000, action="update", guidance="g"),
+    ]
+    with pytest.raises(BatchRejected) as rejected:
+        await learning_service.apply_batch(items)
+    assert {error["id"] for error in rejected.value.errors} == {active.id, 10_000_000}
+
+    assert (await learning_service.get_by_id(pending.id)).status == "pending"
+    assert (await learning_service.get_by_id(other.id)).status == "pending"
+    unchanged = await learning_service.get_by_id(active.id)
+    assert (unchanged.status, unchanged.guidance) == ("active", "old guidance")
+
+
+async def test_batch_applies_every_item(db):
+    pending = await _pending("first question")
+    other = await _pending("second question")
+    active = await learning_service.create_active("q", "t", "k", "old guidance", "old note", confidence_boost=0.3)
+
+    applied = await learning_service.apply_batch([
+        TrainerBatchItem(id=active.id, action="update", guidance="new guidance"),
+        TrainerBatchItem(id=pending.id, action="activate", guidance="g", application_note="n", modules_informed="manas"),
+        TrainerBatchItem(id=other.id, action="supersede"),
+    ])
+    assert [l.id for l in applied] == [active.id, pending.id, other.id]
+
+    updated = await learning_service.get_by_id(active.id)
+    assert (updated.guidance, updated.application_note, updated.confidence_boost) == ("new guidance", "old note", 0.3)
+    activated = await learning_service.get_by_id(pending.id)
+    assert (activated.status, activated.modules_informed, activated.confidence_boost) == ("active", "manas", 0.5)
+    assert (await learning_service.get_by_id(other.id)).status == "superseded"
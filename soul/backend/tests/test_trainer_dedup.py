@@ -0,0 +1,49 @@
+from app.config import settings
+from app.services.learning_service import learning_service, similarity
+
+from tests.conftest import as_tenant
+
+
+def test_similarity_ignores_case_punctuation_and_spacing():
+    assert similarity("What is your NAME?", "what   is your name") == 1.0
+    assert similarity("what is your name", "what is your name friend") > 0.6
+    assert similarity("what is your name", "how do I bake bread") < 0.2
+
+
+async def test_similar_message_joins_the_closest_pending_learning(tenant):
+    with as_tenant(tenant):
+        name = await learning_service.create_pending("what is your name", "t", "k")
+        await learning_service.create_pending("how do I bake sourdough bread", "t", "k")
+
+        joined = await learning_service.attach_to_similar_pending("What is your name?")
+        assert joined.id == name.id
+        # Later messages also match against those already attached
+        joined = await learning_service.attach_to_similar_pending("what is your name please")
+        assert joined.id == name.id
+        assert await learning_service.mention_counts([name.id]) == {name.id: 2}
+
+        assert await learning_service.attach_to_similar_pending("tell me about the weather") is None
+
+
+async def test_only_pending_learnings_are_candidates(tenant):
+    with as_tenant(tenant):
+        learning = await learning_service.create_pending("what is your name", "t", "k")
+        await learning_service.activate_learning(learning.id, "g", "n")
+        assert await learning_service.attach_to_similar_pending("what is your name") is None
+
+
+async def test_threshold_and_candidate_limit(tenant, monkeypatch):
+    with as_tenant(tenant):
+        old = await learning_service.create_pending("what is your name", "t", "k")
+        for i in range(3):
+            await learning_service.create_pending(f"unrelated question number {i} about cooking", "t", "k")
+
+        monkeypatch.setattr(settings, "trainer_dedup_candidates", 3)
+        # Only the three newest pending learnings are compared
+        assert await learning_service.attach_to_similar_pending("what is your name") is None
+
+        monkeypatch.setattr(settings, "trainer_dedup_candidates", 10)
+        assert (await learning_service.attach_to_similar_pending("what is your name")).id == old.id
+
+        monkeypatch.setattr(settings, "trainer_dedup_threshold", 0)
+        assert await learning_service.attach_to_similar_pending("what is your name") is None
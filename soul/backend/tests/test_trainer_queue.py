@@ -0,0 +1,130 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pydantic import ValidationError
+
+from app.config import Settings, settings
+from app.services.claude_client import TokenUsageData, claude_client
+from app.services.learning_service import learning_service
+from app.services.trainer_queue import TrainerQuestionQueue, provisional_summary
+from app.services.turn_context import TurnContext
+
+from tests.conftest import as_tenant
+
+
+class FakeQuestions:
+    """Stands in for `claude_client.complete_json`; fails the first `failures` calls."""
+
+    def __init__(self, failures: int = 0, delay: float = 0.0):
+        self.failures = failures
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, system_prompt, user_message, max_tokens, temperature):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.calls <= self.failures:
+            raise RuntimeError("overloaded")
+        return {"trigger_summary": "What should I say about names?", "keywords": "name,identity"}, TokenUsageData()
+
+
+@pytest.fixture
+def questions(monkeypatch):
+    monkeypatch.setattr(settings, "trainer_queue_retry_backoff_s", 0)
+    fake = FakeQuestions()
+    monkeypatch.setattr(claude_client, "complete_json", fake)
+    return fake
+
+
+@pytest.fixture
+async def queue(monkeypatch):
+    queue = TrainerQuestionQueue()
+
+    async def no_recovery(tenant, created=False):
+        pass
+
+    # Start without re-enqueueing the shared default tenant's leftovers
+    monkeypatch.setattr(queue, "recover", no_recovery)
+    await queue.start()
+    yield queue
+    await queue.stop()
+
+
+def _outputs():
+    return [SimpleNamespace(response=text, metadata={}) for text in ("warm", "unsure", "none")]
+
+
+async def test_consultation_returns_provisional_learning_then_enriches(tenant, queue, questions):
+    with as_tenant(tenant):
+        learning = await queue.open_consultation("what is your name", *_outputs(), TurnContext(tenant=tenant))
+    assert learning.trigger_summary == provisional_summary("what is your name")
+    assert learning.keywords == "what,is,your,name"
+
+    await queue.stop()  # drains the queued job
+    with as_tenant(tenant):
+        enriched = await learning_service.get_by_id(learning.id)
+    assert (enriched.trigger_summary, enriched.keywords) == ("What should I say about names?", "name,identity")
+    assert questions.calls == 1
+
+
+async def test_retries_then_keeps_provisional_text(tenant, queue, questions, monkeypatch):
+    questions.failures = 1
+    with as_tenant(tenant):
+        retried = await queue.open_consultation("first question", *_outputs(), TurnContext(tenant=tenant))
+    await queue.stop()
+    assert questions.calls == 2
+
+    monkeypatch.setattr(settings, "trainer_queue_max_attempts", 2)
+    questions.calls, questions.failures = 0, 10
+    await queue.start()
+    with as_tenant(tenant):
+        failed = await queue.open_consultation("second question", *_outputs(), TurnContext(tenant=tenant))
+    await queue.stop()
+    assert questions.calls == 2
+
+    with as_tenant(tenant):
+        assert (await learning_service.get_by_id(retried.id)).trigger_summary == "What should I say about names?"
+        assert (await learning_service.get_by_id(failed.id)).trigger_summary == provisional_summary("second question")
+
+
+async def test_answered_learning_is_not_overwritten(tenant, queue, questions):
+    questions.delay = 0.05
+    with as_tenant(tenant):
+        learning = await queue.open_consultation("what is your name", *_outputs(), TurnContext(tenant=tenant))
+        await learning_service.activate_learning(learning.id, "Say Soul.", "names")
+    await queue.stop()
+    with as_tenant(tenant):
+        assert (await learning_service.get_by_id(learning.id)).trigger_summary == provisional_summary("what is your name")
+
+
+async def test_recover_requeues_only_provisional_learnings(tenant, questions):
+    with as_tenant(tenant):
+        provisional = await learning_service.create_pending(
+            "lost in a restart", provisional_summary("lost in a restart"), "lost",
+        )
+        await learning_service.create_pending("already asked", "What about this?", "asked")
+
+    queue = TrainerQuestionQueue()
+    queue._queue = asyncio.Queue()
+    await queue.recover(tenant)
+    assert queue.depth == 1
+    assert queue._queue.get_nowait().learning_id == provisional.id
+    # A brand-new tenant has nothing to recover
+    await queue.recover(tenant, created=True)
+    assert queue.depth == 0
+
+
+async def test_stop_gives_up_after_drain_timeout(tenant, queue, questions, monkeypatch):
+    monkeypatch.setattr(settings, "trainer_queue_drain_s", 0.05)
+    questions.delay = 10
+    with as_tenant(tenant):
+        learning = await queue.open_consultation("slow question", *_outputs(), TurnContext(tenant=tenant))
+    await asyncio.wait_for(queue.stop(), 1)
+    with as_tenant(tenant):
+        assert (await learning_service.get_by_id(learning.id)).trigger_summary == provisional_summary("slow question")
+
+
+def test_max_attempts_must_be_positive():
+    with pytest.raises(ValidationError):
+        Settings(trainer_queue_max_attempts=0)
@@ -0,0 +1,146 @@
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+from app.config import settings
+from app.models.database import DEFAULT_TENANT, tenant_databases
+from app.services.usage_ledger import UsageLedger, utc_today
+
+
+def _usage(input_tokens: int, output_tokens: int, cache_read: int = 0):
+    return SimpleNamespace(
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        cache_read_input_tokens=cache_read,
+        cache_creation_input_tokens=0,
+    )
+
+
+def _client_key() -> str:
+    # Tests share one database; a fresh key keeps each test's totals its own
+    return f"client-{uuid.uuid4().hex[:8]}"
+
+
+async def test_flush_persists_usage_and_keeps_totals(db):
+    ledger = UsageLedger()
+    alice, bob = _client_key(), _client_key()
+    ledger.record("model-a", "manas", _usage(10, 5, cache_read=3), alice)
+    ledger.record("model-a", "manas", _usage(20, 5), alice)
+    ledger.record("model-b", "atman", _usage(1, 1), bob)
+    assert ledger.spent_today(alice) == 40
+
+    await ledger.flush()
+    assert ledger.spent_today(alice) == 40
+    assert ledger.spent_today(bob) == 2
+
+    entries = {(e.client_key, e.model, e.stage): e for e in await ledger.entries() if e.client_key in (alice, bob)}
+    row = entries[(alice, "model-a", "manas")]
+    assert (row.calls, row.input_tokens, row.output_tokens, row.cache_read_input_tokens) == (2, 30, 10, 3)
+    assert entries[(bob, "model-b", "atman")].calls == 1
+
+
+async def test_flush_adds_to_rows_written_by_another_worker(db):
+    key = _client_key()
+    other_worker = UsageLedger()
+    other_worker.record("model-a", "manas", _usage(7, 3), key)
+    await other_worker.flush()
+
+    ledger = UsageLedger()
+    ledger.record("model-a", "manas", _usage(5, 5), key)
+    await ledger.flush()
+    assert ledger.spent_today(key) == 20
+    row = next(e for e in await ledger.entries() if e.client_key == key)
+    assert row.calls == 2
+
+
+async def test_overlapping_flushes_never_undercount(db):
+    ledger = UsageLedger()
+    key = _client_key()
+    ledger.record("model-a", "manas", _usage(10, 5), key)
+    first = asyncio.create_task(ledger.flush())
+    await asyncio.sleep(0)
+    ledger.record("model-a", "buddhi", _usage(10, 5), key)
+    second = asyncio.create_task(ledger.flush())
+
+    seen = set()
+    while not (first.done() and second.done()):
+        seen.add(ledger.spent_today(key))
+        await asyncio.sleep(0)
+    seen.add(ledger.spent_today(key))
+    assert seen == {30}
+
+
+async def test_failed_reread_does_not_double_count(db, monkeypatch):
+    ledger = UsageLedger()
+    key = _client_key()
+    ledger.record("model-a", "manas", _usage(10, 5), key)
+    load_totals = ledger._load_totals
+
+    async def fail():
+        raise OSError("database is locked")
+
+    monkeypatch.setattr(ledger, "_load_totals", fail)
+    await ledger.flush()
+    assert ledger.spent_today(key) == 15
+
+    monkeypatch.setattr(ledger, "_load_totals", load_totals)
+    await ledger.flush()
+    assert ledger.spent_today(key) == 15
+    assert ledger._flushing == {}
+
+
+async def test_partial_failure_keeps_committed_and_requeues_the_rest(db, monkeypatch):
+    await tenant_databases.ensure("broken")
+    ledger = UsageLedger()
+    key = _client_key()
+    ledger.record("model-a", "manas", _usage(10, 5), key)
+    ledger.record("model-a", "manas", _usage(1, 1), key, tenant="broken")
+    sessionmaker = tenant_databases.sessionmaker
+
+    def broken(tenant):
+        if tenant == "broken":
+            raise OSError("disk full")
+        return sessionmaker(tenant)
+
+    monkeypatch.setattr(tenant_databases, "sessionmaker", broken)
+    await ledger.flush()
+    # The default tenant's rows were committed but not re-read; they still count
+    assert ledger.spent_today(key, tenant=DEFAULT_TENANT) == 15
+    assert ledger.spent_today(key, tenant="broken") == 2
+    assert list(ledger._pending) == [(utc_today(), "broken", key, "model-a", "manas")]
+
+    monkeypatch.setattr(tenant_databases, "sessionmaker", sessionmaker)
+    await ledger.flush()
+    assert ledger.spent_today(key, tenant=DEFAULT_TENANT) == 15
+    assert ledger.spent_today(key, tenant="broken") == 2
+    assert ledger._pending == {} and ledger._flushing == {}
+
+
+async def test_periodic_flush_survives_errors(monkeypatch):
+    monkeypatch.setattr(settings, "usage_flush_interval_s", 0.001)
+    ledger = UsageLedger()
+    calls = []
+
+    async def flush():
+        calls.append(True)
+        raise OSError("database is locked")
+
+    monkeypatch.setattr(ledger, "flush", flush)
+    task = asyncio.create_task(ledger._flush_periodically())
+    await asyncio.sleep(0.05)
+    assert not task.done()
+    assert len(calls) > 1
+    task.cancel()
+
+
+async def test_measurement_stage_is_recorded_but_not_billed(db):
+    ledger = UsageLedger()
+    key = _client_key()
+    ledger.record("model-a", "synthesis", _usage(10, 5), key)
+    ledger.record("model-a", "synthesis_shadow", _usage(100, 50), key)
+    assert ledger.spent_today(key) == 15
+
+    await ledger.flush()
+    assert ledger.spent_today(key) == 15
+    stages = {e.stage: e.input_tokens for e in await ledger.entries() if e.client_key == key}
+    assert stages == {"synthesis": 10, "synthesis_shadow": 100}